@@ -22,13 +22,11 @@ class BasicShaderScript(Script):
         self.canvas_ref.surface.fill("black")
         self.mouse_click1 = [0.0,0.0]
         self.mouse_click2 = [0.0,0.0]
-        self.mouse_turn = 1
+        self.mouse_turn = 0
         self.engine_ref = self.canvas_ref.designer_ref.engine_ref
-        self.mouse_ref = self.canvas_ref.designer_ref.engine_ref.mouse
         self.targ_path = os.path.abspath(os.path.join(os.path.dirname(__file__), "_output", "imgs"))
         self.recorder = Recorder(self.targ_path)
         print("Targ Path:", self.targ_path)
-        self.once = 0
         self.get_mouse_click()
     
         # self.print_count = 0
@@ -55,22 +53,15 @@ class BasicShaderScript(Script):
             Works such that each mouse click for the two points
             has its own turn -- binary
 
-            self.once is to ensure the code in it runs once.
+            The turn changes on the frame the button is released.
         """
+        snapshot = self.engine_ref.input
 
-
-        if self.mouse_ref.get_pressed()[0]:
-            value = self.engine_ref.get_mouse_pos()
-            self.mouse_turn = self.mouse_turn
-            self.once = 0
+        if snapshot.is_button_down(0):
+            value = snapshot.mouse_pos
         else:
-            # pressed = False
             value = (0, 0)
 
-            if self.once <= 0:
-                self.mouse_turn = not self.mouse_turn
-                self.once += 1
-
         if value[0] > 0 and value[1] > 0:
             if self.mouse_turn == 0 :
                 self.mouse_click1 = value
@@ -80,9 +71,12 @@ class BasicShaderScript(Script):
                 self.mouse_click2 = value
                 # print(f"Point 2 Clicked, Turn: {self.mouse_turn}")
                 # print(f"Point: {value}")
+
+        if snapshot.was_button_released(0):
+            self.mouse_turn = int(not self.mouse_turn)
  
     def get_click_event(self):
-        if (self.engine_ref.get_pressed_key(pg.K_s)):
+        if (self.engine_ref.input.was_key_pressed(pg.K_s)):
             print("Called")
             self.recorder.save_image_pil_impl(self.canvas_ref.ctx_ref)
 
@@ -7,7 +7,7 @@
 """
 
 from core.Engine import Engine
-from core.scripts_core.Scripts import Script
+from core.scripts_core.Scripts import Script, excluded
 from core.entities_core.ShaderEntities import MglSurfaceEntity
 from core.Recorder import Recorder
 import os
@@ -22,14 +22,13 @@ class BasicShaderScript(Script):
         self.fragShaderName = fragShaderName
         # self.texturePath = os.path.join(os.path.dirname(__file__), "resources", "Rhododendron.jpg")
 
-        self.excluded_methods.append("_oninit")
-
         self.output_image_path = os.path.join(os.path.dirname(__file__), "outputs", "imgs")
         self.recorder = Recorder(self.output_image_path)
         self.engine_ref = self.canvas_ref.designer_ref.engine_ref
 
         self._oninit()
 
+    @excluded
     def _oninit(self):
         #   Create the Render Surface
         #   format has two 2fs, one for vertex coordinates; the other for texture
@@ -58,7 +57,7 @@ class BasicShaderScript(Script):
         self.gl_surface.render()
     
     def get_click_event(self):
-        if (self.engine_ref.get_pressed_key(pg.K_s)):
+        if (self.engine_ref.input.was_key_pressed(pg.K_s)):
             # print("Called")
             # print("Canvas Ref Object:", self.canvas_ref)
             # print("Canvas Ref Context:", self.canvas_ref.ctx_ref)
@@ -7,7 +7,7 @@
 """
 
 from core.Engine import Engine
-from core.scripts_core.Scripts import Script
+from core.scripts_core.Scripts import Script, excluded
 from core.entities_core.ShaderEntities import MglSurfaceEntity
 from core.Recorder import Recorder
 import os
@@ -22,14 +22,13 @@ class BasicShaderScript(Script):
         self.fragShaderName = fragShaderName
         # self.texturePath = os.path.join(os.path.dirname(__file__), "resources", "Rhododendron.jpg")
 
-        self.excluded_methods.append("_oninit")
-
         self.output_image_path = os.path.join(os.path.dirname(__file__), "outputs", "imgs")
         self.recorder = Recorder(self.output_image_path)
         self.engine_ref = self.canvas_ref.designer_ref.engine_ref
 
         self._oninit()
 
+    @excluded
     def _oninit(self):
         #   Create the Render Surface
         #   format has two 2fs, one for vertex coordinates; the other for texture
@@ -59,14 +58,14 @@ class BasicShaderScript(Script):
         self.gl_surface.render()
     
     def get_click_event(self):
-        if (self.engine_ref.get_pressed_key(pg.K_s)):
+        if (self.engine_ref.input.was_key_pressed(pg.K_s)):
             # print("Called")
             # print("Canvas Ref Object:", self.canvas_ref)
             # print("Canvas Ref Context:", self.canvas_ref.ctx_ref)
             # print("Context Screen Pixels:", self.canvas_ref.ctx_ref.screen.read(attachment=1,components=4, dtype="f1"))
             self.recorder.save_image_pil_impl(self.canvas_ref.ctx_ref, format=".jpg")
 
-        if (self.engine_ref.get_pressed_key(pg.K_r)):
+        if (self.engine_ref.input.was_key_pressed(pg.K_r)):
             self.gl_surface.reload_shader(self.vertShaderName, self.fragShaderName)
 
 def RunApp():
@@ -96,6 +95,8 @@ def RunApp():
                                   vertShaderName="norm", fragShaderName=projects_scripts[3])
 
     my_engine.designer.canvas_ref.scene.add_script("TheArtOfCode", my_script)
+    #   Saving this file swaps in the edited BasicShaderScript without restarting
+    my_engine.designer.canvas_ref.scene.enable_hot_reload()
     my_engine.run()
 
 
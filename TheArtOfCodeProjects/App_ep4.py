@@ -6,7 +6,7 @@
     is reserved
 """
 from core.Engine import Engine
-from core.scripts_core.Scripts import Script
+from core.scripts_core.Scripts import Script, excluded
 from core.entities_core.ShaderEntities import MglCubeEntity, MglAdvancedSkyBox
 from core.Recorder import Recorder
 import os
@@ -20,9 +20,13 @@ FAR = 100
 SPEED = 0.01
 SENSITIVITY = 0.07
 class Camera:
-    def __init__(self, win_size=(0, 0), position=(0, 0, 4), yaw=-90, pitch=0):
+    def __init__(self, engineRef, win_size=(0, 0), position=(0, 0, 4), yaw=-90, pitch=0):
+        #   The camera reads the Engine's per-frame input snapshot
+        self.engine_ref = engineRef
         self.aspect_ratio = win_size[0] / win_size[1]
         self.position = glm.vec3(position)
+        #   Where the last fixed update moved it from; the view is drawn in between
+        self.previous_position = glm.vec3(position)
         self.up = glm.vec3(0, 1, 0)
         self.right = glm.vec3(1, 0, 0)
         self.forward = glm.vec3(0, 0, -1)
@@ -35,17 +39,29 @@ class Camera:
         #   Projection Matrix
         self.m_proj = self.get_projection_matrix()
         self.delta_time = 0
+        #   Every program that includes frame_globals.glsl sees the camera through the Engine
+        self.engine_ref.frame_globals.set_camera(self.m_view, self.m_proj, self.position)
 
     def update(self, dt):
         self.delta_time = dt
+        self.previous_position = glm.vec3(self.position)
         self.move()
+
+    def update_view(self, updateAlpha):
+        """
+            Once per frame, from where the camera is between its last two fixed updates.
+            It turns here, not in the fixed update, so every frame's mouse motion is used
+            however many fixed updates the frame had, none included.
+        """
         self.rotate()
         self.update_camera_vectors()
+        position = glm.mix(self.previous_position, self.position, updateAlpha)
         ##  To update view matrix after moving
-        self.m_view = self.get_view_matrix()
+        self.m_view = self.get_view_matrix(position)
+        self.engine_ref.frame_globals.set_camera(self.m_view, self.m_proj, position)
 
     def rotate(self):
-        rel_x, rel_y = pg.mouse.get_rel()
+        rel_x, rel_y = self.engine_ref.input.mouse_rel
         self.yaw += rel_x * SENSITIVITY
         self.pitch -= rel_y * SENSITIVITY
         ##  Limiting pitch movement to prevent unnatural movements up and down
@@ -66,21 +82,21 @@ class Camera:
 
     def move(self):
         velocity = SPEED * self.delta_time
-        keys = pg.key.get_pressed()
-        if keys[pg.K_w]:
+        keys = self.engine_ref.input
+        if keys.is_key_down(pg.K_w):
             self.position += self.forward * velocity
-        if keys[pg.K_s]:
+        if keys.is_key_down(pg.K_s):
             self.position -= self.forward * velocity
-        if keys[pg.K_a]:
+        if keys.is_key_down(pg.K_a):
             self.position -= self.right * velocity
-        if keys[pg.K_d]:
+        if keys.is_key_down(pg.K_d):
             self.position += self.right * velocity
-        if keys[pg.K_q]:
+        if keys.is_key_down(pg.K_q):
             self.position += self.up * velocity
-        if keys[pg.K_e]:
+        if keys.is_key_down(pg.K_e):
             self.position -= self.up * velocity
 
-    def get_view_matrix(self):
+    def get_view_matrix(self, position=None):
         ##  glm.lookAt(eye, center, up) -> glm.mat4
         ##  eye - camera position
         ##  center - position of where camera is looking atexit
@@ -90,7 +106,8 @@ class Camera:
         #   The above was changed after camera controls were added because pf the fact that the camera was always looking...
         #   at the model's centre, its movement was being affected because its orientation was...
         #   fixed to the camera's centre
-        return glm.lookAt(self.position, self.position + self.forward, self.up)
+        position = self.position if position is None else position
+        return glm.lookAt(position, position + self.forward, self.up)
 
     def get_projection_matrix(self):
         return glm.perspective(glm.radians(FOV), self.aspect_ratio, NEAR, FAR)
@@ -107,29 +124,27 @@ class BasicShaderScript(Script):
         self.skyboxFragmentShaderName = skyboxFragShaderName
         # self.texturePath = os.path.join(os.path.dirname(__file__), "resources", "Rhododendron.jpg")
 
-        self.excluded_methods.append("_oninit")
-        self.excluded_methods.append("_get_model_matrix")
-        self.excluded_methods.append("_set_camera")
-        self.excluded_methods.append("_move")
-
         self.output_image_path = os.path.join(os.path.dirname(__file__), "outputs", "imgs")
         self.recorder = Recorder(self.output_image_path)
         self.engine_ref = self.canvas_ref.designer_ref.engine_ref
         self.camera = None
 
         self.pos=glm.vec3(0, 0, 0)
+        self.previous_pos = glm.vec3(self.pos)
         self.rot = glm.vec3([glm.radians(a) for a in (0, 0, 0)])
         self.scale=glm.vec3(1, 1, 1)
 
         self._oninit()
     
+    @excluded
     def _set_camera(self, cameraObj: Camera):
         self.camera = cameraObj
 
+    @excluded
     def _get_model_matrix(self):
         m_model = glm.mat4()
         #   Translate
-        m_model = glm.translate(m_model, self.pos)
+        m_model = glm.translate(m_model, glm.mix(self.previous_pos, self.pos, self.engine_ref.update_alpha))
         #   Rotate
         m_model = glm.rotate(m_model, self.rot.x, glm.vec3(0, 0, 1))
         m_model = glm.rotate(m_model, self.rot.y, glm.vec3(0, 1, 0))
@@ -139,19 +154,22 @@ class BasicShaderScript(Script):
 
         return m_model
 
+    @excluded
     def _move(self, dt):
         velocity = SPEED * dt
-        keys = pg.key.get_pressed()
-        if keys[pg.K_UP]:
+        self.previous_pos = glm.vec3(self.pos)
+        keys = self.engine_ref.input
+        if keys.is_key_down(pg.K_UP):
             self.pos.y += velocity
-        if keys[pg.K_DOWN]:
+        if keys.is_key_down(pg.K_DOWN):
             self.pos.y -= velocity
             # self.position -= self.forward * velocity
-        if keys[pg.K_LEFT]:
+        if keys.is_key_down(pg.K_LEFT):
             self.pos.x -= velocity
-        if keys[pg.K_RIGHT]:
+        if keys.is_key_down(pg.K_RIGHT):
             self.pos.x += velocity
 
+    @excluded
     def _oninit(self):
         #   Create the Render Surface
         #   format has two 2fs, one for vertex coordinates; the other for texture
@@ -204,19 +222,14 @@ class BasicShaderScript(Script):
     
     #   By adding a here, this is run first
     def a_run_render(self):
-        self.gl_surface.set_complex_uniform('u_CameraPosition', self.camera.position)
+        #   The camera's position and matrices come from the Engine's FrameGlobals block
         self.gl_surface.set_complex_uniform('u_ModelMat', self._get_model_matrix())
-        self.gl_surface.set_complex_uniform('u_ViewMat', self.camera.m_view)
-        self.gl_surface.set_complex_uniform('u_ProjMat', self.camera.m_proj)
-        self.gl_surface.set_complex_uniform('u_InvProjViewMat', glm.inverse(self.camera.m_proj * self.camera.m_view))
         # self.gl_surface.set_complex_uniform('u_MVP', self.camera.m_proj * self.camera.m_view * self._get_model_matrix())
 
         # self.gl_surface.set_uniform('u_resolution', self.canvas_ref.designer_ref.engine_ref.win_dimensions)
         # self.gl_surface.set_uniform('u_time', float(self.canvas_ref.designer_ref.engine_ref.time))
         # self.gl_surface.set_uniform('u_mouse', self.canvas_ref.designer_ref.engine_ref.get_mouse_pos())
-        
-        self.skybox.set_complex_uniform('u_InvProjViewMat', glm.inverse(self.camera.m_proj * self.camera.m_view))
-        
+
         """
             All I had to do was render the skybox first before the
             Cube.
@@ -250,8 +263,8 @@ class BasicShaderScript(Script):
 
         # skyboxRenderTexture.release()
 
-        self.camera.update(self.canvas_ref.designer_ref.engine_ref.delta_time)
-        self._move(self.canvas_ref.designer_ref.engine_ref.delta_time)
+        #   The camera and model movement are not updated here anymore;
+        #   they are fixed updates, see RunApp
 
     
     def get_click_event(self):
@@ -262,7 +275,7 @@ class BasicShaderScript(Script):
             # print("Context Screen Pixels:", self.canvas_ref.ctx_ref.screen.read(attachment=1,components=4, dtype="f1"))
             # self.recorder.save_image_pil_impl(self.canvas_ref.ctx_ref, format=".jpg")
 
-        if (self.engine_ref.get_pressed_key(pg.K_r)):
+        if (self.engine_ref.input.was_key_pressed(pg.K_r)):
             self.gl_surface.reload_shader(self.vertShaderName, self.fragShaderName)
 
 def RunApp():
@@ -287,8 +300,13 @@ def RunApp():
     #   setup mouse effects for camera
     pg.event.set_grab(True)
     pg.mouse.set_visible(False)
-    camera = Camera(win_size=my_engine.win_dimensions)
+    camera = Camera(my_engine, win_size=my_engine.win_dimensions)
     my_script._set_camera(camera)
+    #   Moves at the same speed however fast the frames render
+    my_engine.add_fixed_update(camera.update)
+    my_engine.add_fixed_update(my_script._move)
+    #   Drawn between the fixed updates, so the movement does not judder
+    my_engine.add_frame_update(camera.update_view)
 
     my_engine.designer.canvas_ref.scene.add_script("TheArtOfCode", my_script)
     my_engine.run()
@@ -13,7 +13,7 @@ in mat4 v_VP;    //  Is not unique from MVP
  
 
 // uniform vec2 u_resolution;
-uniform vec3 u_CameraPosition;  //  used for ray origin
+#include "frame_globals.glsl"    //  frame.camera_position is used for ray origin
 uniform mat4 u_ModelMat;  //  used for ray origin
 // uniform sampler2D u_SkyRenderTexture;
 // uniform mat4 u_InvProjViewMat;
@@ -215,13 +215,13 @@ void BoxWith3DTorusComplete1()
     //  However, the results are still bert good!
     //  camera pos is in world space
     //  v_HitPos is in world space (pure face vertices of cube. Not transformed by mvp matrix)
-    // vec3 ro = u_CameraPosition; //  ray origin should be camera position!
+    // vec3 ro = frame.camera_position.xyz; //  ray origin should be camera position!
     // vec3 rd = normalize(v_HitPos - ro);  //  where object is hit - camera position!
 
     //  Note! HitPos is already in World Space
     //  But by transforming it by the inverse of model view projection matrix)
     //  Doing the below makes the Torus only be visible on one face! Like looking at a TV
-    // vec3 ro  = u_CameraPosition;
+    // vec3 ro  = frame.camera_position.xyz;
     // vec3 rd = normalize((inverse(v_MVP) * vec4(v_HitPos, 1.0)).xyz - ro);
 
     //  Now, consider effects when camera position
@@ -231,17 +231,17 @@ void BoxWith3DTorusComplete1()
 
     //  Using inverse(MVP) makes the torus move and rotate in opposite direction
     //  to camera
-    // vec3 ro = (inverse(v_MVP) * vec4(u_CameraPosition, 1.0)).xyz;
+    // vec3 ro = (inverse(v_MVP) * vec4(frame.camera_position.xyz, 1.0)).xyz;
 
     //  By using MVP on CameraPosition, you effectively move the camera to the center
     //  of the model's origin. Hence Torus can only be viewed as though looking from the camera
     //  at the Torus's (and Box's) Center 
-    // vec3 ro = (v_MVP * vec4(u_CameraPosition, 1.0)).xyz;
+    // vec3 ro = (v_MVP * vec4(frame.camera_position.xyz, 1.0)).xyz;
     //  Object is now in view space
     // vec3 rd = normalize(v_HitPos - ro);  //  where object is hit - camera position!
 
     //  Moving Obhect from World space to Object Space!
-    // vec3 ro  = u_CameraPosition;
+    // vec3 ro  = frame.camera_position.xyz;
     // vec3 rd = normalize((u_ModelMat * vec4(v_HitPos, 1.0)).xyz - ro);  //  where object is hit - camera position!
 
     //  This is the solution of moving the Camera Properly to Object Space!
@@ -251,10 +251,10 @@ void BoxWith3DTorusComplete1()
     //  to the Cube and the torus, making it function properly
     //  Object is now in view space
 
-    // vec3 ro = (inverse(u_ModelMat) * vec4(u_CameraPosition, 1.0)).xyz;
+    // vec3 ro = (inverse(u_ModelMat) * vec4(frame.camera_position.xyz, 1.0)).xyz;
     // vec3 rd = normalize(v_HitPos - ro);  //  where object is hit - camera position!
     
-    vec3 ro = (inverse(u_ModelMat) * vec4(u_CameraPosition, 1.0)).xyz;
+    vec3 ro = (inverse(u_ModelMat) * vec4(frame.camera_position.xyz, 1.0)).xyz;
     vec3 rd = normalize(v_HitPos_md - ro);  //  where object is hit - camera position!
 
     float d = RayMarch(ro, rd);
@@ -307,12 +307,12 @@ void BoxWithTextureAnd3DTorusComplete2()
 
     //  When using just the camera in world space
     //  as ray origin!
-    vec3 ro = u_CameraPosition; //  ray origin should be camera position!
-    vec3 ro = vec4(u_CameraPosition, 1.0).xyz;
+    vec3 ro = frame.camera_position.xyz; //  ray origin should be camera position!
+    vec3 ro = vec4(frame.camera_position.xyz, 1.0).xyz;
     vec3 rd = normalize(v_HitPos - ro);  //  where object is hit - camera position!
 
     //  for proper working! 
-    vec3 ro = (inverse(u_Model) * vec4(u_CameraPosition, 1.0)).xyz; 
+    vec3 ro = (inverse(u_Model) * vec4(frame.camera_position.xyz, 1.0)).xyz; 
     vec3 rd = normalize(v_HitPos_md - ro);  //  where object is hit - camera position!
 
     float d = RayMarch(ro, rd);
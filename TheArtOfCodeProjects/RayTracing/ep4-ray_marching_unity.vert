@@ -10,8 +10,8 @@ layout(location = 0) in vec3 a_VertexPosition;
 layout(location = 2) in vec2 a_TexturePosition;
 
 uniform mat4 u_ModelMat;
-uniform mat4 u_ViewMat;
-uniform mat4 u_ProjMat;
+//  The view and projection matrices are frame.view and frame.proj
+#include "frame_globals.glsl"
 
 
 /**
@@ -62,7 +62,7 @@ out mat4 v_VP;  //  only view projection
 void main()
 {
     //  Modify Vertex Coords
-    mat4 mvp = u_ProjMat * u_ViewMat * u_ModelMat;
+    mat4 mvp = frame.proj * frame.view * u_ModelMat;
     vec4 nm_pos = (mvp * vec4(a_VertexPosition, 1.0));
     v_MVP = mvp;
     // v_VP = u_ProjMat * u_ViewMat;
@@ -6,11 +6,11 @@ in vec4 v_ClipCoords;
 
 uniform samplerCube u_TextureSkybox;
 
-uniform mat4 u_InvProjViewMat;
+#include "frame_globals.glsl"
 
 void main()
 {
-    vec4 worldCoords = u_InvProjViewMat * v_ClipCoords;
+    vec4 worldCoords = frame.inv_proj_view * v_ClipCoords;
 
     vec3 texCubeCoord = normalize(worldCoords.xyz / worldCoords.w);
     gl_FragColor = texture(u_TextureSkybox, texCubeCoord);
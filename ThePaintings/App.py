@@ -7,7 +7,7 @@
 """
 
 from core.Engine import Engine
-from core.scripts_core.Scripts import Script
+from core.scripts_core.Scripts import Script, excluded
 from core.entities_core.ShaderEntities import MglSurfaceEntity
 from core.Recorder import Recorder
 import os
@@ -33,14 +33,13 @@ class BasicShaderScript(Script):
         # self.texturePath = os.path.join(os.path.dirname(__file__), "resources", "spider_3d_image1a.jpg")
         self.texturePath = os.path.join(os.path.dirname(__file__), "resources", "Rhododendron.jpg")
 
-        self.excluded_methods.append("_oninit")
-
         self.output_image_path = os.path.join(os.path.dirname(__file__), "outputs", "imgs")
         self.recorder = Recorder(self.output_image_path)
         self.engine_ref = self.canvas_ref.designer_ref.engine_ref
 
         self._oninit()
 
+    @excluded
     def _oninit(self):
         #   Create the Render Surface
         #   format has two 2fs, one for vertex coordinates; the other for texture
@@ -60,9 +59,15 @@ class BasicShaderScript(Script):
         #     ["vertexPosition"], self.vertShaderName, self.fragShaderName, withTextures=False
         # )
 
-        #   Adds texture just once
-        self.gl_surface.add_texture("texture1", self.texturePath, False)
-        self.gl_surface.set_uniform("u_image_size", pg.image.load(self.texturePath).get_size())
+        if self.canvas_ref.textures_manager.exceeds_texture_limit(self.texturePath):
+            #   Only the tiles the window needs are uploaded; see VirtualTexture
+            self.gl_surface.set_variant(defines={'VIRTUAL_TEXTURE': True})
+            virtual_texture = self.gl_surface.add_virtual_texture("texture1", self.texturePath, vFlip=False)
+            self.gl_surface.set_uniform("u_image_size", virtual_texture.size)
+        else:
+            #   Adds texture just once; the big photos decode while the first frames render
+            texture_handle = self.gl_surface.add_texture_async("texture1", self.texturePath, vFlip=False)
+            texture_handle.on_ready(lambda handle: self.gl_surface.set_uniform("u_image_size", handle.texture.size))
 
         # self.canvas_ref.surface.fill("black")
 
@@ -75,7 +80,7 @@ class BasicShaderScript(Script):
         self.gl_surface.render()
     
     def get_click_event(self):
-        if (self.engine_ref.get_pressed_key(pg.K_s)):
+        if (self.engine_ref.input.was_key_pressed(pg.K_s)):
             # print("Called")
             # print("Canvas Ref Object:", self.canvas_ref)
             # print("Canvas Ref Context:", self.canvas_ref.ctx_ref)
@@ -85,6 +90,8 @@ class BasicShaderScript(Script):
 
 def RunPaintingsApp():
     my_engine = Engine(winDimensions=(3000, 2400))
+    #   The photos are decoded once; later launches map them from the disk cache
+    my_engine.designer.canvas_ref.textures_manager.enable_disk_cache()
     #   Must initialize the script with a canvas
     file_path = os.path.dirname(__file__)
     my_engine.designer.canvas_ref.vao_manager.shader_programs.shader_scripts_dir = os.path.join(file_path, "shaders")
@@ -94,6 +101,8 @@ def RunPaintingsApp():
                                   vertShaderName="shader1", fragShaderName="shader2b")
 
     my_engine.designer.canvas_ref.scene.add_script("ThePaintings", my_script)
+    #   Saving this file swaps in the edited BasicShaderScript without restarting
+    my_engine.designer.canvas_ref.scene.enable_hot_reload()
     my_engine.run()
 
 
@@ -7,6 +7,14 @@ precision mediump float;
 */
 
 uniform sampler2D texture1;
+//  Photos too large for one texture are drawn from a virtual texture; see App.py
+#ifdef VIRTUAL_TEXTURE
+#include "virtual_texture.glsl"
+uniform sampler2D texture1_indirection;
+#define SAMPLE_IMAGE(uv) vt_texture(texture1, texture1_indirection, uv)
+#else
+#define SAMPLE_IMAGE(uv) texture(texture1, uv)
+#endif
 uniform vec2 u_resolution;
 uniform vec2 u_image_size;
 uniform float u_time;
@@ -79,7 +87,7 @@ float sobelEdge(vec2 uv) {
     for (int i = -1; i <= 1; i++) {
         for (int j = -1; j <= 1; j++) {
             vec2 offset = vec2(float(i) * dx, float(j) * dy);
-            float luminance = dot(texture(texture1, uv + offset).rgb, vec3(0.299, 0.587, 0.114));
+            float luminance = dot(SAMPLE_IMAGE(uv + offset).rgb, vec3(0.299, 0.587, 0.114));
             edgeX += luminance * Gx[j+1][i+1];
             edgeY += luminance * Gy[j+1][i+1];
         }
@@ -101,7 +109,7 @@ vec3 directionalBlur(vec2 uv, vec2 direction, float mag) {
     for (float i = -mag; i <= mag; i++) {
         float weight = 1.0 - abs(i) / 4.0;
         vec2 offset = direction * i / u_resolution;
-        color += texture(texture1, uv + offset).rgb * weight;
+        color += SAMPLE_IMAGE(uv + offset).rgb * weight;
         totalWeight += weight;
     }
     return color / totalWeight;
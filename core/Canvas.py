@@ -14,6 +14,9 @@ from .Scene import Scene
 from .scripts_core.shader_core.ShaderPrograms import ShaderProgramsManager
 from .Texture import TextureManager
 from .scripts_core.shader_core.VertexArray import VertexArrayObjectsManager
+from .scripts_core.shader_core.ShaderWatcher import ShaderWatcher
+from .RenderGraph import RenderGraph
+from contextlib import contextmanager
 
 
 
@@ -36,19 +39,52 @@ class Canvas:
         self.dimensions = self.designer_ref.engine_ref.win_dimensions
         self.vao_manager = VertexArrayObjectsManager(self.ctx_ref)
         self.textures_manager = TextureManager(self.ctx_ref)
+        #   Recompiles programs when their shader files are saved; set `enabled` to turn it off
+        self.shader_watcher = ShaderWatcher(self.vao_manager)
 
         self.surface = pg.Surface(self.dimensions)
         self.scene: Scene = Scene(self)
         self.clear_color = (0.0, 0.0, 0.0)
+        self.render_graphs: list[RenderGraph] = []
     
+    @contextmanager
+    def retaining_resources(self):
+        """
+            While in this, Entities made with names that already exist take up
+            the existing VBOs and VAOs, when their data is the same, instead of creating new ones.
+            It is used when Scripts are hot reloaded.
+        """
+        #   Programs and textures need not be here: the ShaderProgramsManager never recompiles
+        #   unchanged sources, and the TextureManager never loads a cached image again
+        managers = [self.vao_manager, self.vao_manager.vbo_manager]
+        for manager in managers:
+            manager.retain_existing = True
+        try:
+            yield
+        finally:
+            for manager in managers:
+                manager.retain_existing = False
+
     def release_memory(self):
+        self.scene.release()
+        self.shader_watcher.release()
+        [render_graph.release() for render_graph in self.render_graphs]
         self.vao_manager.destroy_all()
+        self.textures_manager.release_all()
     
+    def update(self, deltaTime: float):
+        """Called by the Engine once per frame, before `render`"""
+        self.scene.update(deltaTime)
+
     def render(self):
         # self.ctx_ref.screen.use()
+        self.shader_watcher.poll()
+        self.textures_manager.process_pending()
+        self.textures_manager.update_virtual_textures()
         self.ctx_ref.clear(color = self.clear_color)
         self.scene.render()
 
-        if self.designer_ref.engine_ref.GL_MODE:
+        #   A headless Engine has no window to show the surface on
+        if self.designer_ref.engine_ref.GL_MODE and not self.designer_ref.engine_ref.headless:
             self.designer_ref.engine_ref.window.blit(self.surface, (0, 0))
         
\ No newline at end of file
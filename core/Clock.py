@@ -0,0 +1,68 @@
+"""
+    These are the Clocks the Engine can keep time with.
+    
+    The RealTimeClock is the usual wall-clock time, taken from pygame.
+    The FixedStepClock takes time from the frame index instead, so that
+    frame N always happens at N / fps seconds no matter how long it took to render.
+    This makes offline renders reproducible and lets them run as fast as the GPU can go.
+
+    Both give `delta_time` in milliseconds, like pg.time.Clock.tick does.
+"""
+
+from . import pg
+
+
+class RealTimeClock:
+    """
+        A thin wrapper over pg.time.Clock; this is how the Engine always kept time.
+    """
+    fixed_step = False
+
+    def __init__(self):
+        self.pg_clock = pg.time.Clock()
+
+    def tick(self, framerate=0) -> float:
+        """Waits to keep to `framerate` and returns the milliseconds since the last tick"""
+        return self.pg_clock.tick(framerate)
+
+    def get_fps(self) -> float:
+        return self.pg_clock.get_fps()
+
+    def get_frame_ms(self) -> int:
+        """How long the last frame really took, in milliseconds"""
+        return self.pg_clock.get_time()
+
+    def get_time(self, frameIndex: int) -> float:
+        """The time in seconds; the frame index is not needed in real time"""
+        return pg.time.get_ticks() * 0.001
+
+
+class FixedStepClock:
+    """
+        Time advances by exactly 1/fps seconds each frame.
+        It never waits, so the frame loop runs uncapped.
+        `get_fps` still reports the real throughput.
+    """
+    fixed_step = True
+
+    def __init__(self, fps: float):
+        self.fps = fps
+        self.step_ms = 1000.0 / fps
+        self.pg_clock = pg.time.Clock()
+
+    def tick(self, framerate=0) -> float:
+        """
+            `framerate` is ignored; it is only there so the FixedStepClock
+            can be swapped in for the RealTimeClock.
+        """
+        self.pg_clock.tick()
+        return self.step_ms
+
+    def get_fps(self) -> float:
+        return self.pg_clock.get_fps()
+
+    def get_frame_ms(self) -> int:
+        return self.pg_clock.get_time()
+
+    def get_time(self, frameIndex: int) -> float:
+        return frameIndex / self.fps
@@ -114,6 +114,7 @@ class Designer:
         #                               (self.WIDTH//2, self.HEIGHT//2), (255, 63, 32), font_size = 50)
         # self.sky_lights = SkyLights(self)
         # self.light_cores = TheLights(self, 50)
+        #   It adds its movement to the Engine's fixed updates itself
         # self.heavenly_lights = HeavenlyLights(self)
         # self.spinning_lights = SpinningLights(self)
 
@@ -2,11 +2,42 @@ from . import pg
 from . import sys
 from . import mgl
 from .Designer import Designer
+from .Clock import RealTimeClock, FixedStepClock
+from .Scheduler import FrameScheduler
+from .Profiler import Profiler, ProfilerHud
+from .TextureUnits import TextureUnits
+from .Input import InputSystem, InputSnapshot
+from .scripts_core.shader_core.FrameGlobals import FrameGlobals
+import os
 
 
 
 class Engine:
-    def __init__(self, winDimensions=(1200, 675)):
+    def __init__(self, winDimensions=(1200, 675), headless=False, fixedFps=0, targetFps=60, vsync=False, updateRate=60, profile=False, profileTracePath=""):
+        """
+            `headless` makes the Engine run without a window:
+            a standalone moderngl context (EGL, e.g. llvmpipe on render boxes) is created
+            and everything is rendered into an offscreen framebuffer of `winDimensions`.
+            The Designer, Canvas, Scene and Entities work the same on top of it.
+
+            `fixedFps` switches to a FixedStepClock: `time` and `delta_time` then come
+            from the frame index at that fps and the frame loop runs uncapped.
+            Use it for reproducible offline renders.
+
+            `targetFps` caps the frame rate; 0 runs uncapped. `vsync` asks the driver
+            to sync buffer swaps to the display (it has no effect when headless).
+            `updateRate` is the rate, per second, of the fixed update step;
+            see `add_fixed_update`.
+
+            `profile` turns the Profiler on and draws its HUD over the frame in place
+            of the fps caption. With `profileTracePath` the Chrome trace is saved there on quit.
+        """
+        self.headless = headless
+        if self.headless:
+            #   pygame still needs a video mode for Surface.convert() and the event queue,
+            #   so it is given the dummy driver; it never opens a window.
+            os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+
         pg.init()
         self.win_dimensions = winDimensions
         pg.display.gl_set_attribute(pg.GL_CONTEXT_MAJOR_VERSION, 3)
@@ -15,9 +46,16 @@ class Engine:
 
         self.GL_MODE = True
 
-        self.window = pg.display.set_mode(self.win_dimensions, flags=pg.OPENGL | pg.DOUBLEBUF) if self.GL_MODE else pg.display.set_mode(self.win_dimensions)
-
-        self.ctx = mgl.create_context() if self.GL_MODE else None
+        if self.headless:
+            self.window = pg.display.set_mode(self.win_dimensions)
+            self.ctx = self.create_headless_context()
+            self.offscreen_fbo = self.create_offscreen_framebuffer()
+            #   Everything that would go to the screen now goes here
+            self.offscreen_fbo.use()
+        else:
+            self.window = pg.display.set_mode(self.win_dimensions, flags=pg.OPENGL | pg.DOUBLEBUF, vsync=int(vsync)) if self.GL_MODE else pg.display.set_mode(self.win_dimensions)
+            self.ctx = mgl.create_context() if self.GL_MODE else None
+            self.offscreen_fbo = None
 
         self.ctx.enable(flags= mgl.DEPTH_TEST | mgl.CULL_FACE | mgl.BLEND)
         # self.ctx.blend_equation = mgl.FUNC_ADD
@@ -26,62 +64,153 @@ class Engine:
         # pg.event.set_grab(True)
         # pg.mouse.set_visible(False)
 
-        self.clock = pg.time.Clock()
+        self.clock = FixedStepClock(fixedFps) if fixedFps > 0 else RealTimeClock()
+        #   A FixedStepClock never waits, so capping it would only slow the render down
+        self.fps = 0 if self.clock.fixed_step else targetFps
+        self.scheduler = FrameScheduler(self.clock, targetFps=self.fps, updateRate=updateRate)
+        self.caption_interval = 0.5
+        self.last_caption_time = 0.0
+
+        self.profiler = Profiler(self.ctx, enabled=profile)
+        self.profile_trace_path = profileTracePath
+        #   Every texture is bound to its unit through this; see TextureUnits
+        self.texture_units = TextureUnits(self.ctx)
+        self.profiler_hud = ProfilerHud(self.ctx, self.profiler, self.texture_units, self.win_dimensions) if profile else None
+        self.frame_index = 0
         self.time = 0
-        self.delta_time = 0
+        self.delta_time = self.clock.step_ms if self.clock.fixed_step else 0
+        #   See `add_frame_update`
+        self.update_alpha = 0.0
         self.mouse = pg.mouse
+        #   Scripts should read the input from here; it is captured once per frame
+        self.input_system = InputSystem()
+        self.input: InputSnapshot = self.input_system.snapshot
+        #   The time, resolution, mouse and camera shared by every program; see FrameGlobals
+        self.frame_globals = FrameGlobals(self.ctx)
 
         # self.light = Light()
         # self.camera = Camera(self)
         # self.mesh = Mesh(self)
         # self.scene = Scene(self)
-        self.fps = 60
         self.designer = Designer(self)
 
+    def create_headless_context(self) -> mgl.Context:
+        """
+            Prefers EGL since it needs no X server; falls back to whatever
+            standalone backend glcontext picks for this platform.
+        """
+        try:
+            return mgl.create_context(standalone=True, require=330, backend="egl")
+        except Exception as e:
+            print("EGL context unavailable, using default standalone backend: ", str(e))
+            return mgl.create_context(standalone=True, require=330)
+
+    def create_offscreen_framebuffer(self) -> mgl.Framebuffer:
+        return self.ctx.framebuffer(
+            color_attachments=[self.ctx.texture(self.win_dimensions, 4)],
+            depth_attachment=self.ctx.depth_renderbuffer(self.win_dimensions)
+        )
+
+    def add_fixed_update(self, callback) -> None:
+        """
+            `callback(deltaTimeMs)` is then called at the fixed `updateRate`
+            rather than once per rendered frame. Use it for movement and simulation.
+        """
+        self.scheduler.add_fixed_update(callback)
+
+    def add_frame_update(self, callback) -> None:
+        """
+            `callback(updateAlpha)` is then called once per frame, after the fixed updates
+            and before the render. `updateAlpha`, from 0 to 1, is how far the frame is
+            between the last fixed update and the next; interpolate what they move by it.
+        """
+        self.scheduler.add_frame_update(callback)
+
+    def get_frame_stats(self) -> dict[str, float]:
+        return self.scheduler.get_stats()
+
     def get_pressed_key(self, keyTarget):
-        pressed_key = pg.key.get_pressed()
-        if pressed_key[keyTarget]:
-            return True
-        return False
+        """True while the key is held; see `input.was_key_pressed` for just the frame it went down"""
+        return self.input.is_key_down(keyTarget)
 
     def engine_quit(self):
+        if self.profiler.enabled and self.profile_trace_path:
+            self.profiler.export_chrome_trace(self.profile_trace_path)
+        self.profiler.release()
+        if self.profiler_hud is not None:
+            self.profiler_hud.release()
         self.designer.release_memory()
+        self.frame_globals.release()
+        self.texture_units.release()
+        if self.offscreen_fbo is not None:
+            self.offscreen_fbo.release()
         pg.quit()
         sys.exit()
     
     def check_events(self):
-        for e in pg.event.get():
+        events = pg.event.get()
+        self.input = self.input_system.capture(events, self.frame_index)
+        for e in events:
             if e.type == pg.QUIT or (e.type==pg.KEYDOWN and e.key==pg.K_ESCAPE):
                 self.engine_quit()
 
+    def update_frame_globals(self):
+        self.frame_globals.update(self.time, self.frame_index, self.win_dimensions, self.input.mouse_pos)
+
     def render(self):
         self.designer.render()
-        pg.display.flip()
-        self.clock.tick(60)
+        if self.profiler_hud is not None:
+            self.profiler_hud.render(self.time)
+        if not self.headless:
+            pg.display.flip()
 
     def get_current_time(self):
-        self.time = pg.time.get_ticks() * 0.001
+        self.time = self.clock.get_time(self.frame_index)
     
     def get_mouse_pos(self) -> tuple:
-        return pg.mouse.get_pos()
+        return self.input.mouse_pos
         
     def get_mouse_clicked_pos(self, mouseButton: str="left") -> tuple:
         if mouseButton == "left":
-            if (pg.mouse.get_pressed()[0] == True):
+            if self.input.is_button_down(0):
                 return self.get_mouse_pos()
             else:
                 return (0, 0)
         else:   #   If Right.
-            if (pg.mouse.get_pressed()[2] == True):
+            if self.input.is_button_down(2):
                 return self.get_mouse_pos()
             else:
                 return (0, 0)
             
 
-    def run(self):
+    def update_caption(self):
+        """Shows the frame stats, but only every `caption_interval` seconds"""
+        if self.headless or self.profiler_hud is not None or self.time - self.last_caption_time < self.caption_interval:
+            return
+        self.last_caption_time = self.time
+        stats = self.scheduler.get_stats()
+        pg.display.set_caption("{:.1f} fps | {:.2f} ms avg | {:.2f} ms p95".format(
+            stats['fps'], stats['mean_ms'], stats['p95_ms']))
+
+    def run(self, frameCount=0):
+        """
+            `frameCount` stops the Engine after that many frames;
+            0 runs until the window is closed. Useful for batch headless renders.
+        """
         while True:
+            self.delta_time = self.scheduler.tick()
+            self.profiler.begin_frame(self.frame_index)
             self.get_current_time()
             self.check_events()
+            self.scheduler.run_fixed_updates()
+            self.update_alpha = self.scheduler.run_frame_updates()
+            self.update_frame_globals()
+            #   The Scripts' update phase runs once per frame, apart from the fixed updates
+            self.designer.canvas_ref.update(self.delta_time)
             self.render()
-            self.delta_time = self.clock.tick(self.fps)
-            pg.display.set_caption(str(self.clock.get_fps()))
\ No newline at end of file
+            self.update_caption()
+            self.profiler.end_frame()
+
+            self.frame_index += 1
+            if frameCount > 0 and self.frame_index >= frameCount:
+                self.engine_quit()
\ No newline at end of file
@@ -0,0 +1,98 @@
+"""
+    This is the Input system.
+    Once per frame, the Engine captures the keyboard and the mouse into an
+    InputSnapshot: which keys and buttons are down, which went down or up this frame,
+    the mouse position, its relative motion and the wheel.
+    
+    Scripts read the snapshot, `engine.input`, rather than asking pygame themselves.
+    So SDL is only asked once per frame, and every Script sees the same input.
+"""
+
+from . import pg
+from dataclasses import dataclass
+
+
+@dataclass(frozen=True, slots=True)
+class InputSnapshot:
+    """
+        The state of the input for one frame. It cannot be changed,
+        so it is safe to hand to any Script, on any thread.
+    """
+    frame_index: int = -1
+    #   pg.key.get_pressed() is already an immutable sequence
+    keys_down: tuple = ()
+    keys_pressed: frozenset = frozenset()
+    keys_released: frozenset = frozenset()
+    mouse_pos: tuple[int, int] = (0, 0)
+    #   The motion since the last frame; use it once per frame, not in fixed updates,
+    #   which a frame can have several of, or none
+    mouse_rel: tuple[int, int] = (0, 0)
+    mouse_buttons: tuple[bool, bool, bool] = (False, False, False)
+    buttons_pressed: frozenset = frozenset()
+    buttons_released: frozenset = frozenset()
+    mouse_wheel: tuple[int, int] = (0, 0)
+
+    def is_key_down(self, key: int) -> bool:
+        """True for as long as the key is held"""
+        return bool(self.keys_down[key]) if self.keys_down else False
+
+    def was_key_pressed(self, key: int) -> bool:
+        """True only on the frame the key went down"""
+        return key in self.keys_pressed
+
+    def was_key_released(self, key: int) -> bool:
+        return key in self.keys_released
+
+    def is_button_down(self, button: int = 0) -> bool:
+        """`button` is 0 for left, 1 for middle, 2 for right; like pg.mouse.get_pressed()"""
+        return self.mouse_buttons[button]
+
+    def was_button_pressed(self, button: int = 0) -> bool:
+        return button in self.buttons_pressed
+
+    def was_button_released(self, button: int = 0) -> bool:
+        return button in self.buttons_released
+
+
+class InputSystem:
+    def __init__(self):
+        self.snapshot = InputSnapshot()
+
+    def capture(self, events: list, frameIndex: int) -> InputSnapshot:
+        """
+            Builds this frame's snapshot from the frame's events
+            and one query each of the keyboard and mouse state.
+        """
+        keys_pressed = set()
+        keys_released = set()
+        buttons_pressed = set()
+        buttons_released = set()
+        wheel_x, wheel_y = 0, 0
+
+        for e in events:
+            if e.type == pg.KEYDOWN:
+                keys_pressed.add(e.key)
+            elif e.type == pg.KEYUP:
+                keys_released.add(e.key)
+            #   pygame numbers the buttons from 1; the snapshot from 0, like get_pressed()
+            elif e.type == pg.MOUSEBUTTONDOWN and e.button <= 3:
+                buttons_pressed.add(e.button - 1)
+            elif e.type == pg.MOUSEBUTTONUP and e.button <= 3:
+                buttons_released.add(e.button - 1)
+            elif e.type == pg.MOUSEWHEEL:
+                wheel_x += e.x
+                wheel_y += e.y
+
+        self.snapshot = InputSnapshot(
+            frame_index=frameIndex,
+            keys_down=pg.key.get_pressed(),
+            keys_pressed=frozenset(keys_pressed),
+            keys_released=frozenset(keys_released),
+            mouse_pos=pg.mouse.get_pos(),
+            mouse_rel=pg.mouse.get_rel(),
+            mouse_buttons=tuple(pg.mouse.get_pressed()),
+            buttons_pressed=frozenset(buttons_pressed),
+            buttons_released=frozenset(buttons_released),
+            mouse_wheel=(wheel_x, wheel_y),
+        )
+        return self.snapshot
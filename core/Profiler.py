@@ -0,0 +1,310 @@
+"""
+    This is the Profiler; it tells where the time of a frame goes.
+
+    It records:
+    1.  The CPU time of every Script method call.
+       Script updates run on the Scene's thread pool, so each thread gets its own row.
+    2.  The GPU time of every ShaderEntity draw, measured with moderngl time queries.
+    3.  Per-frame counters of texture uploads, buffer writes and draw calls.
+
+    Everything can be exported as a Chrome trace (open it in chrome://tracing or Perfetto)
+    and the latest numbers are drawn on screen by the ProfilerHud.
+
+    It is a Singleton, created by the Engine, and does nothing when it is disabled;
+    so the calls to it can stay in the hot paths.
+"""
+
+from . import singleton
+from . import mgl
+from . import np
+from . import pg
+from collections import deque
+import json
+import threading
+import time
+
+from . import TYPE_CHECKING
+if TYPE_CHECKING:
+    from .TextureUnits import TextureUnits
+
+
+class _NullScope:
+    """What is returned when the Profiler is disabled"""
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        return False
+
+_NULL_SCOPE = _NullScope()
+
+
+class _CpuScope:
+    def __init__(self, profilerRef: 'Profiler', name: str, category: str):
+        self.profiler_ref = profilerRef
+        self.name = name
+        self.category = category
+
+    def __enter__(self):
+        self.start_ns = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *args):
+        end_ns = time.perf_counter_ns()
+        self.profiler_ref.add_cpu_event(self.name, self.category, self.start_ns, end_ns)
+        return False
+
+
+class _GpuScope:
+    def __init__(self, profilerRef: 'Profiler', name: str):
+        self.profiler_ref = profilerRef
+        self.name = name
+
+    def __enter__(self):
+        self.start_ns = time.perf_counter_ns()
+        self.query = self.profiler_ref.get_query()
+        self.query.__enter__()
+        return self
+
+    def __exit__(self, *args):
+        self.query.__exit__(*args)
+        self.profiler_ref.add_gpu_query(self.name, self.start_ns, self.query)
+        return False
+
+
+@singleton
+class Profiler:
+    """
+        GPU query results are only read `gpu_latency_frames` frames later,
+        so reading them never stalls the pipeline.
+    """
+    def __init__(self, ctxRef: mgl.Context, enabled=False, maxEvents=200000, gpuLatencyFrames=2):
+        self.ctx_ref = ctxRef
+        self.enabled = enabled
+        self.gpu_latency_frames = gpuLatencyFrames
+        self.origin_ns = time.perf_counter_ns()
+
+        self.trace_events: deque = deque(maxlen=maxEvents)
+        self.counters: dict[str, int] = {}
+        self.frame_index = 0
+        self.frame_start_ns = 0
+
+        #   Queries waiting to be read, per frame; and the ones free to reuse
+        self.pending_queries: deque[list[tuple[str, int, mgl.Query]]] = deque()
+        self.current_queries: list[tuple[str, int, mgl.Query]] = []
+        self.free_queries: list[mgl.Query] = []
+
+        #   The latest results; these are what the HUD shows
+        self.last_cpu_ms: dict[str, float] = {}
+        self.last_gpu_ms: dict[str, float] = {}
+        self.last_counters: dict[str, int] = {}
+        self.last_frame_ms = 0.0
+
+        #   CPU events are added from the Scene's update threads too
+        self.lock = threading.Lock()
+        #   Thread ident -> its row in the trace; the main thread is 0 and the GPU 1
+        self.thread_ids: dict[int, int] = {threading.main_thread().ident: 0}
+
+    def to_us(self, ns: int) -> float:
+        return (ns - self.origin_ns) * 0.001
+
+    def begin_frame(self, frameIndex: int) -> None:
+        if not self.enabled:
+            return
+        self.frame_index = frameIndex
+        self.frame_start_ns = time.perf_counter_ns()
+        self.counters = {'texture_uploads': 0, 'texture_binds': 0, 'buffer_writes': 0, 'draw_calls': 0}
+        with self.lock:
+            self.last_cpu_ms = {}
+
+    def end_frame(self) -> None:
+        if not self.enabled:
+            return
+        end_ns = time.perf_counter_ns()
+        self.last_frame_ms = (end_ns - self.frame_start_ns) * 1e-6
+        self.trace_events.append({
+            'name': 'Frame {}'.format(self.frame_index), 'cat': 'frame', 'ph': 'X',
+            'ts': self.to_us(self.frame_start_ns), 'dur': (end_ns - self.frame_start_ns) * 0.001,
+            'pid': 0, 'tid': 0
+        })
+        self.trace_events.append({
+            'name': 'counters', 'ph': 'C', 'ts': self.to_us(self.frame_start_ns),
+            'pid': 0, 'args': dict(self.counters)
+        })
+        self.last_counters = dict(self.counters)
+
+        self.pending_queries.append(self.current_queries)
+        self.current_queries = []
+        while len(self.pending_queries) > self.gpu_latency_frames:
+            self.collect_queries(self.pending_queries.popleft())
+
+    def cpu_scope(self, name: str, category: str = 'script'):
+        """Use as `with profiler.cpu_scope(name):`"""
+        if not self.enabled:
+            return _NULL_SCOPE
+        return _CpuScope(self, name, category)
+
+    def gpu_scope(self, name: str):
+        """Use as `with profiler.gpu_scope(name):` around moderngl draw calls"""
+        if not self.enabled:
+            return _NULL_SCOPE
+        return _GpuScope(self, name)
+
+    def count(self, counterName: str, amount: int = 1) -> None:
+        if not self.enabled:
+            return
+        self.counters[counterName] = self.counters.get(counterName, 0) + amount
+
+    def get_thread_id(self) -> int:
+        """The trace row of the calling thread; the lock must be held"""
+        ident = threading.get_ident()
+        tid = self.thread_ids.get(ident)
+        if tid is None:
+            tid = len(self.thread_ids) + 1
+            self.thread_ids[ident] = tid
+        return tid
+
+    def add_cpu_event(self, name: str, category: str, startNs: int, endNs: int) -> None:
+        with self.lock:
+            self.trace_events.append({
+                'name': name, 'cat': category, 'ph': 'X',
+                'ts': self.to_us(startNs), 'dur': (endNs - startNs) * 0.001,
+                'pid': 0, 'tid': self.get_thread_id()
+            })
+            self.last_cpu_ms[name] = self.last_cpu_ms.get(name, 0.0) + (endNs - startNs) * 1e-6
+
+    def get_query(self) -> mgl.Query:
+        if self.free_queries:
+            return self.free_queries.pop()
+        return self.ctx_ref.query(time=True)
+
+    def add_gpu_query(self, name: str, startNs: int, query: mgl.Query) -> None:
+        self.current_queries.append((name, startNs, query))
+
+    def collect_queries(self, frameQueries: list[tuple[str, int, mgl.Query]]) -> None:
+        gpu_ms = {}
+        for name, start_ns, query in frameQueries:
+            elapsed_ns = query.elapsed
+            gpu_ms[name] = gpu_ms.get(name, 0.0) + elapsed_ns * 1e-6
+            #   The GPU track has its own thread id so it shows as a separate row
+            self.trace_events.append({
+                'name': name, 'cat': 'gpu', 'ph': 'X',
+                'ts': self.to_us(start_ns), 'dur': elapsed_ns * 0.001,
+                'pid': 0, 'tid': 1
+            })
+            self.free_queries.append(query)
+        self.last_gpu_ms = gpu_ms
+
+    def export_chrome_trace(self, filePath: str) -> None:
+        metadata = [
+            {'name': 'thread_name', 'ph': 'M', 'pid': 0, 'tid': 0, 'args': {'name': 'CPU'}},
+            {'name': 'thread_name', 'ph': 'M', 'pid': 0, 'tid': 1, 'args': {'name': 'GPU'}},
+        ]
+        metadata += [
+            {'name': 'thread_name', 'ph': 'M', 'pid': 0, 'tid': tid, 'args': {'name': 'CPU {}'.format(tid - 1)}}
+            for tid in self.thread_ids.values() if tid > 0
+        ]
+        with open(filePath, 'w') as f_stream:
+            json.dump({'traceEvents': metadata + list(self.trace_events)}, f_stream)
+        print("Saved Chrome Trace at: {}".format(filePath))
+
+    def get_summary_lines(self, maxLines=8) -> list[str]:
+        lines = ["frame {:.2f} ms".format(self.last_frame_ms)]
+        lines.append("draws {draw_calls}  tex uploads {texture_uploads}  tex binds {texture_binds}  buf writes {buffer_writes}".format(
+            **{'draw_calls': 0, 'texture_uploads': 0, 'texture_binds': 0, 'buffer_writes': 0, **self.last_counters}))
+        for name, ms in sorted(self.last_gpu_ms.items(), key=lambda item: -item[1])[:maxLines // 2]:
+            lines.append("gpu {:.3f} ms  {}".format(ms, name))
+        for name, ms in sorted(self.last_cpu_ms.items(), key=lambda item: -item[1])[:maxLines // 2]:
+            lines.append("cpu {:.3f} ms  {}".format(ms, name))
+        return lines
+
+    def release(self) -> None:
+        for frame_queries in self.pending_queries:
+            self.free_queries.extend(query for _, _, query in frame_queries)
+        self.free_queries.extend(query for _, _, query in self.current_queries)
+        [query.release() for query in self.free_queries]
+        self.free_queries.clear()
+        self.pending_queries.clear()
+        self.current_queries.clear()
+
+
+class ProfilerHud:
+    """
+        Draws the Profiler's summary in the top-left corner.
+        The text is drawn with pygame into a small surface which is uploaded
+        to one reused texture, only every `refresh_interval` seconds,
+        and drawn with a single quad. It replaces the fps caption.
+    """
+    vertex_shader = """
+        #version 330 core
+        in vec2 a_VertexPosition;
+        out vec2 v_uv;
+        uniform vec4 u_rect;
+        void main() {
+            v_uv = vec2(a_VertexPosition.x, 1.0 - a_VertexPosition.y);
+            gl_Position = vec4(u_rect.xy + a_VertexPosition * u_rect.zw, 0.0, 1.0);
+        }
+    """
+    fragment_shader = """
+        #version 330 core
+        in vec2 v_uv;
+        out vec4 fragColor;
+        uniform sampler2D u_hud;
+        void main() {
+            fragColor = texture(u_hud, v_uv);
+        }
+    """
+
+    def __init__(self, ctxRef: mgl.Context, profilerRef: Profiler, textureUnitsRef: 'TextureUnits', winDimensions: tuple[int, int], fontSize=16, refreshInterval=0.25):
+        self.ctx_ref = ctxRef
+        self.profiler_ref = profilerRef
+        self.texture_units_ref = textureUnitsRef
+        self.win_dimensions = winDimensions
+        self.refresh_interval = refreshInterval
+        self.last_refresh_time = -refreshInterval
+        self.font = pg.font.SysFont("monospace", fontSize)
+        self.line_height = self.font.get_linesize()
+
+        self.program = self.ctx_ref.program(vertex_shader=self.vertex_shader, fragment_shader=self.fragment_shader)
+        quad = np.array([(0, 0), (1, 0), (1, 1), (0, 0), (1, 1), (0, 1)], dtype='f4')
+        self.vbo = self.ctx_ref.buffer(quad)
+        self.vao = self.ctx_ref.vertex_array(self.program, [(self.vbo, '2f', 'a_VertexPosition')])
+        self.texture: mgl.Texture | None = None
+
+    def refresh(self) -> None:
+        lines = self.profiler_ref.get_summary_lines()
+        width = max(self.font.size(line)[0] for line in lines) + 8
+        height = self.line_height * len(lines) + 8
+
+        surface = pg.Surface((width, height), pg.SRCALPHA)
+        surface.fill((0, 0, 0, 170))
+        for i, line in enumerate(lines):
+            surface.blit(self.font.render(line, True, (230, 230, 230)), (4, 4 + i * self.line_height))
+
+        if self.texture is None or self.texture.size != (width, height):
+            if self.texture is not None:
+                self.texture.release()
+            self.texture = self.ctx_ref.texture((width, height), 4)
+            self.texture.filter = (mgl.NEAREST, mgl.NEAREST)
+        self.texture.write(pg.image.tostring(surface, "RGBA"))
+
+        #   From pixels to clip space, anchored at the top-left corner
+        w, h = self.win_dimensions
+        self.program['u_rect'] = (-1.0, 1.0 - 2.0 * height / h, 2.0 * width / w, 2.0 * height / h)
+
+    def render(self, currentTime: float) -> None:
+        if currentTime - self.last_refresh_time >= self.refresh_interval:
+            self.last_refresh_time = currentTime
+            self.refresh()
+
+        self.ctx_ref.disable(mgl.DEPTH_TEST)
+        self.program['u_hud'] = self.texture_units_ref.bind("ProfilerHud", self.texture)
+        self.vao.render()
+        self.ctx_ref.enable(mgl.DEPTH_TEST)
+
+    def release(self) -> None:
+        self.vao.release()
+        self.vbo.release()
+        self.program.release()
+        if self.texture is not None:
+            self.texture.release()
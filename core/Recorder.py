@@ -40,13 +40,21 @@ class Recorder:
             print("Cancelled. Not Saving")
             return
 
+        self.save_frame(glContext, imageName, format)
+
+    def save_frame(self, glContext: 'moderngl.Context', imageName: str, format:str = ".png"):
+        """
+            Saves what is currently rendered without asking for a name.
+            It reads the bound framebuffer, `glContext.fbo`, which is the screen
+            when there is a window and the offscreen framebuffer when the Engine is headless.
+        """
         ftp = os.path.join(self.output_dir, imageName + format)
         
         if format == ".jpg":
-            raw_img_data = glContext.screen.read(components=3)
+            raw_img_data = glContext.fbo.read(components=3)
             image = Image.frombytes('RGB', glContext.fbo.size, raw_img_data)
         else:
-            raw_img_data = glContext.screen.read(components=4)
+            raw_img_data = glContext.fbo.read(components=4)
             image = Image.frombytes('RGBA', glContext.fbo.size, raw_img_data)
 
         image = image.transpose(Image.FLIP_TOP_BOTTOM)
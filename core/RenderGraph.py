@@ -0,0 +1,215 @@
+"""
+    This is the RenderGraph; it renders a frame in several passes,
+    like Shadertoy's BufferA-D and Image tabs.
+
+    1.  RenderTargets are named offscreen framebuffers, half-float by default,
+        so intermediate results keep their precision.
+        A target made with `feedback=True` is double-buffered (ping-pong):
+        passes can read what it held on the previous frame while writing this frame.
+    2.  RenderPasses draw a ShaderEntity (usually an MglSurfaceEntity) into a target.
+        They declare which targets they read; the graph works out the order from that.
+    3.  The pass without a target is the final composite; it draws to the screen
+        (or the Engine's offscreen framebuffer when headless).
+
+    Expensive results can then be computed once per frame, or built up over frames,
+    and reused by every pass that needs them.
+"""
+
+from . import mgl
+from . import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from .Canvas import Canvas
+    from .entities_core.ShaderEntities import ShaderEntity
+
+
+class RenderTarget:
+    def __init__(self, ctxRef: mgl.Context, name: str, size: tuple[int, int], components=4, dtype='f2', feedback=False, filter=mgl.LINEAR):
+        self.ctx_ref = ctxRef
+        self.name = name
+        self.size = size
+        self.feedback = feedback
+        self.textures: list[mgl.Texture] = []
+        self.framebuffers: list[mgl.Framebuffer] = []
+        for _ in range(2 if feedback else 1):
+            texture = self.ctx_ref.texture(size, components, dtype=dtype)
+            texture.filter = (filter, filter)
+            texture.repeat_x = False
+            texture.repeat_y = False
+            self.textures.append(texture)
+            self.framebuffers.append(self.ctx_ref.framebuffer(color_attachments=[texture]))
+        self.write_index = 0
+        self.clear()
+
+    @property
+    def framebuffer(self) -> mgl.Framebuffer:
+        """Where this frame is written"""
+        return self.framebuffers[self.write_index]
+
+    @property
+    def texture(self) -> mgl.Texture:
+        """What was written this frame"""
+        return self.textures[self.write_index]
+
+    @property
+    def previous_texture(self) -> mgl.Texture:
+        """What was written on the previous frame; the same as `texture` without feedback"""
+        return self.textures[1 - self.write_index] if self.feedback else self.textures[0]
+
+    def swap(self) -> None:
+        if self.feedback:
+            self.write_index = 1 - self.write_index
+
+    def clear(self, color=(0.0, 0.0, 0.0, 0.0)) -> None:
+        for framebuffer in self.framebuffers:
+            framebuffer.clear(*color)
+
+    def release(self) -> None:
+        [framebuffer.release() for framebuffer in self.framebuffers]
+        [texture.release() for texture in self.textures]
+        self.framebuffers.clear()
+        self.textures.clear()
+
+
+class RenderPass:
+    def __init__(self, name: str, entity: 'ShaderEntity', target: str | None = None, inputs: dict[str, str] = None, feedbackInputs: dict[str, str] = None, clear=False):
+        """
+            `inputs` maps a sampler uniform of the entity's shader to the target whose
+            result of this frame it reads; `feedbackInputs` to the target whose result
+            of the previous frame it reads.
+            `target` of None makes this the final composite to the screen.
+        """
+        self.name = name
+        self.entity = entity
+        self.target = target
+        self.inputs = inputs if inputs else {}
+        self.feedback_inputs = feedbackInputs if feedbackInputs else {}
+        self.clear = clear
+
+
+class RenderGraph:
+    def __init__(self, canvasRef: 'Canvas'):
+        self.canvas_ref = canvasRef
+        self.ctx_ref = canvasRef.ctx_ref
+        #   The inputs get their units from the Engine's TextureUnits, like every texture
+        self.texture_units_ref = canvasRef.designer_ref.engine_ref.texture_units
+        self.targets: dict[str, RenderTarget] = {}
+        self.passes: dict[str, RenderPass] = {}
+        self.ordered_passes: list[RenderPass] = []
+        self.needs_compile = True
+        #   So the Canvas releases it with everything else
+        self.canvas_ref.render_graphs.append(self)
+
+    def add_target(self, name: str, size: tuple[int, int] = None, components=4, dtype='f2', feedback=False, filter=mgl.LINEAR) -> RenderTarget:
+        """`size` defaults to the Canvas's; `dtype` 'f2' is half-float, 'f4' float, 'f1' bytes"""
+        if name in self.targets:
+            self.targets[name].release()
+        target = RenderTarget(self.ctx_ref, name, size if size else self.canvas_ref.dimensions, components, dtype, feedback, filter)
+        self.targets[name] = target
+        self.needs_compile = True
+        return target
+
+    def add_pass(self, name: str, entity: 'ShaderEntity', target: str | None = None, inputs: dict[str, str] = None, feedbackInputs: dict[str, str] = None, clear=False) -> RenderPass:
+        render_pass = RenderPass(name, entity, target, inputs, feedbackInputs, clear)
+        self.passes[name] = render_pass
+        self.needs_compile = True
+        return render_pass
+
+    def remove_pass(self, name: str) -> None:
+        self.passes.pop(name)
+        self.needs_compile = True
+
+    def compile(self) -> None:
+        """
+            Orders the passes so every pass comes after the passes writing the targets it reads.
+            Feedback inputs are last frame's results, so they add no ordering.
+        """
+        writers: dict[str, str] = {}
+        for render_pass in self.passes.values():
+            if render_pass.target is None:
+                continue
+            if render_pass.target not in self.targets:
+                raise KeyError("Render Pass '{}' writes to unknown target '{}'".format(render_pass.name, render_pass.target))
+            if render_pass.target in writers:
+                raise ValueError("Target '{}' is written by both '{}' and '{}'".format(
+                    render_pass.target, writers[render_pass.target], render_pass.name))
+            writers[render_pass.target] = render_pass.name
+
+        ordered: list[RenderPass] = []
+        state: dict[str, int] = {}  # 1 visiting, 2 done
+
+        def visit(render_pass: RenderPass):
+            if state.get(render_pass.name) == 2:
+                return
+            if state.get(render_pass.name) == 1:
+                raise ValueError("Render Graph has a cycle through pass '{}'; use feedbackInputs to read the previous frame instead".format(render_pass.name))
+            state[render_pass.name] = 1
+            for target_name in render_pass.inputs.values():
+                if target_name not in self.targets:
+                    raise KeyError("Render Pass '{}' reads unknown target '{}'".format(render_pass.name, target_name))
+                if target_name in writers:
+                    visit(self.passes[writers[target_name]])
+            state[render_pass.name] = 2
+            ordered.append(render_pass)
+
+        for render_pass in self.passes.values():
+            visit(render_pass)
+
+        #   The composite always comes last
+        self.ordered_passes = [p for p in ordered if p.target is not None] + [p for p in ordered if p.target is None]
+        self.needs_compile = False
+
+    def get_output_framebuffer(self) -> mgl.Framebuffer:
+        engine = self.canvas_ref.designer_ref.engine_ref
+        return engine.offscreen_fbo if engine.offscreen_fbo is not None else self.ctx_ref.screen
+
+    def bind_inputs(self, render_pass: RenderPass) -> None:
+        for sampler_name, target_name in render_pass.inputs.items():
+            unit = self.texture_units_ref.bind(self.get_unit_key(target_name), self.targets[target_name].texture)
+            render_pass.entity.set_uniform(sampler_name, unit)
+        for sampler_name, target_name in render_pass.feedback_inputs.items():
+            unit = self.texture_units_ref.bind(self.get_unit_key(target_name, previous=True), self.targets[target_name].previous_texture)
+            render_pass.entity.set_uniform(sampler_name, unit)
+
+    def get_unit_key(self, targetName: str, previous=False) -> str:
+        """Kept apart from texture names, and from the targets of other graphs"""
+        return "RenderGraph{}:{}{}".format(id(self), targetName, ":previous" if previous else "")
+
+    def render(self) -> None:
+        if self.needs_compile:
+            self.compile()
+
+        #   Offscreen passes write data, not a picture to be blended over
+        self.ctx_ref.disable(mgl.BLEND | mgl.DEPTH_TEST)
+        for render_pass in self.ordered_passes:
+            if render_pass.target is None:
+                continue
+            target = self.targets[render_pass.target]
+            target.framebuffer.use()
+            if render_pass.clear:
+                target.framebuffer.clear()
+            self.bind_inputs(render_pass)
+            if 'u_resolution' in render_pass.entity.program_uniforms.handles:
+                render_pass.entity.set_uniform('u_resolution', target.size)
+            render_pass.entity.render()
+        self.ctx_ref.enable(mgl.BLEND | mgl.DEPTH_TEST)
+
+        output = self.get_output_framebuffer()
+        output.use()
+        for render_pass in self.ordered_passes:
+            if render_pass.target is not None:
+                continue
+            self.bind_inputs(render_pass)
+            render_pass.entity.render()
+
+        for target in self.targets.values():
+            target.swap()
+
+    def release(self) -> None:
+        for target_name in self.targets:
+            self.texture_units_ref.free(self.get_unit_key(target_name))
+            self.texture_units_ref.free(self.get_unit_key(target_name, previous=True))
+        [target.release() for target in self.targets.values()]
+        self.targets.clear()
+        self.passes.clear()
+        self.ordered_passes.clear()
@@ -2,26 +2,108 @@
     A Scene is a beautiful collection of Scripts that together
     paint on the Canvas.
     The Scene gives the Scripts access to the Canvas. 
+
+    Each frame is split in two:
+    1.  The update phase, the Scripts' `on_update` methods. It is CPU work only,
+        so the Scripts' updates are run at the same time on a pool of threads.
+        Numpy, PIL and glm release the GIL for their heavy work, so a frame then waits
+        for the slowest Script's update rather than for all of them, one after the other.
+    2.  The render phase, all the moderngl calls. It is run on the main thread,
+        after every update has finished, one Script after the other.
+
+    Update methods must not call moderngl. What they can read of the frame is in the
+    Script's `frame_state`, which is immutable; what they compute, the render phase uploads.
 """
 
 from .scripts_core.custom_scripts.circle_field import *
 from .scripts_core.Scripts import Script
+from .scripts_core.ScriptReloader import ScriptReloader
 from . import TYPE_CHECKING
-# from . import threading
+from .Input import InputSnapshot
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+import os
 
 if TYPE_CHECKING:
     from .Canvas import Canvas
 
+
+@dataclass(frozen=True, slots=True)
+class FrameState:
+    """What the update phase is allowed to know about the frame"""
+    frame_index: int
+    time: float
+    #   In milliseconds, the frame's delta time
+    delta_time: float
+    win_dimensions: tuple[int, int]
+    input: InputSnapshot
+
+
 class Scene:
-    def __init__(self, canvasRef: 'Canvas'):
+    def __init__(self, canvasRef: 'Canvas', maxWorkers=None):
         self.canvas_ref = canvasRef
         self.scripts: dict[str, Script] = {}
+        self.max_workers = maxWorkers if maxWorkers else min(8, os.cpu_count() or 1)
+        self.executor: ThreadPoolExecutor | None = None
+        self.script_reloader: ScriptReloader | None = None
         # self.scripts['circleField'] = CircleFieldScript(canvasRef)
     
     def add_script(self, scriptName, scriptRef):
         self.scripts[scriptName] = scriptRef
         self.scripts[scriptName].canvas_ref = self.canvas_ref
+
+    def enable_hot_reload(self, pollInterval=0.5):
+        """Scripts are then reloaded whenever their module's source file is saved"""
+        self.script_reloader = ScriptReloader(self, pollInterval)
+
+    def get_frame_state(self, deltaTime: float) -> FrameState:
+        engine = self.canvas_ref.designer_ref.engine_ref
+        return FrameState(
+            frame_index=engine.frame_index,
+            time=engine.time,
+            delta_time=deltaTime,
+            win_dimensions=engine.win_dimensions,
+            input=engine.input,
+        )
+
+    def update(self, deltaTime: float = 0.0):
+        """
+            The update phase, run once per frame by the Engine before the render;
+            `deltaTime` is the frame's delta time in milliseconds.
+        """
+        #   Init methods may create moderngl objects, so they are run here, on the main thread
+        for script in self.scripts.values():
+            script.run_init()
+
+        updating = [script for script in self.scripts.values() if script.get_dispatch_table()['update']]
+        if not updating:
+            return
+
+        frame_state = self.get_frame_state(deltaTime)
+        for script in updating:
+            script.frame_state = frame_state
+
+        if len(updating) == 1 or self.max_workers <= 1:
+            for script in updating:
+                script.run_phase('update')
+            return
+
+        if self.executor is None:
+            self.executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="SceneUpdate")
+        futures = [self.executor.submit(script.run_phase, 'update') for script in updating]
+        #   Waits for every update; re-raises the first error in any of them
+        for future in futures:
+            future.result()
     
     def render(self):
+        if self.script_reloader is not None:
+            self.script_reloader.poll()
         for script in self.scripts.values():
-            script.run_all()
\ No newline at end of file
+            script.run_init()
+            script.run_phase('render')
+            script.run_phase('post_render')
+
+    def release(self):
+        if self.executor is not None:
+            self.executor.shutdown(wait=True)
+            self.executor = None
@@ -0,0 +1,114 @@
+"""
+    This is the FrameScheduler; it decides when frames happen.
+
+    It ticks the Engine's clock exactly once per frame, either capped at a
+    target fps or uncapped, and keeps a rolling record of the frame times.
+
+    It also runs the fixed-rate update step: callbacks registered with
+    `add_fixed_update` (camera movement, simulation movers and such) are called
+    a whole number of times per frame so that they always advance in equal steps,
+    however fast or slow the frames are rendered.
+
+    Callbacks registered with `add_frame_update` are called once per frame after them,
+    with how far the frame is between the last fixed update and the next, so what moves
+    in fixed steps can be drawn in between them rather than judder.
+"""
+
+from . import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from .Clock import RealTimeClock, FixedStepClock
+
+
+class FrameScheduler:
+    def __init__(self, clockRef: 'RealTimeClock | FixedStepClock', targetFps=60, updateRate=60, maxUpdatesPerFrame=5, statsWindow=120):
+        """
+            `targetFps` of 0 runs the frames uncapped.
+            `updateRate` is how many fixed updates happen per second.
+            `maxUpdatesPerFrame` stops a slow frame from making the next one slower
+            by catching up on too many updates at once.
+        """
+        self.clock_ref = clockRef
+        self.target_fps = targetFps
+        self.update_step_ms = 1000.0 / updateRate
+        self.max_updates_per_frame = maxUpdatesPerFrame
+        self.stats_window = statsWindow
+
+        self.fixed_updates: list = []
+        self.frame_updates: list = []
+        self.accumulator_ms = 0.0
+        self.frame_times_ms: list[float] = []
+        self.started = False
+
+    def add_fixed_update(self, callback) -> None:
+        """`callback` is called with the fixed step, in milliseconds"""
+        self.fixed_updates.append(callback)
+
+    def remove_fixed_update(self, callback) -> None:
+        self.fixed_updates.remove(callback)
+
+    def add_frame_update(self, callback) -> None:
+        """`callback` is called once per frame with the update alpha; see `get_update_alpha`"""
+        self.frame_updates.append(callback)
+
+    def remove_frame_update(self, callback) -> None:
+        self.frame_updates.remove(callback)
+
+    def tick(self) -> float:
+        """
+            Ticks the clock, the only place where it is ticked,
+            and returns the frame's delta time in milliseconds.
+        """
+        delta_ms = self.clock_ref.tick(self.target_fps)
+        if not self.started:
+            #   The first tick measures the time since the clock was created, not a frame
+            self.started = True
+            delta_ms = 0.0 if not self.clock_ref.fixed_step else delta_ms
+        else:
+            #   The real frame time, which differs from delta_ms for a FixedStepClock
+            self.frame_times_ms.append(self.clock_ref.get_frame_ms())
+            if len(self.frame_times_ms) > self.stats_window:
+                self.frame_times_ms.pop(0)
+
+        self.accumulator_ms += delta_ms
+        return delta_ms
+
+    def run_fixed_updates(self) -> int:
+        """Returns how many fixed updates were run this frame"""
+        steps = 0
+        while self.accumulator_ms >= self.update_step_ms and steps < self.max_updates_per_frame:
+            for callback in self.fixed_updates:
+                callback(self.update_step_ms)
+            self.accumulator_ms -= self.update_step_ms
+            steps += 1
+
+        if steps == self.max_updates_per_frame:
+            #   Drop the time that could not be caught up on
+            self.accumulator_ms = min(self.accumulator_ms, self.update_step_ms)
+        return steps
+
+    def get_update_alpha(self) -> float:
+        """How far, from 0 to 1, the render is between the last fixed update and the next"""
+        return min(self.accumulator_ms / self.update_step_ms, 1.0)
+
+    def run_frame_updates(self) -> float:
+        """Called after `run_fixed_updates`; returns the update alpha it gave the callbacks"""
+        alpha = self.get_update_alpha()
+        for callback in self.frame_updates:
+            callback(alpha)
+        return alpha
+
+    def get_stats(self) -> dict[str, float]:
+        """Frame time statistics, in milliseconds, over the last `statsWindow` frames"""
+        if not self.frame_times_ms:
+            return {'fps': 0.0, 'mean_ms': 0.0, 'min_ms': 0.0, 'max_ms': 0.0, 'p95_ms': 0.0}
+
+        ordered = sorted(self.frame_times_ms)
+        mean_ms = sum(ordered) / len(ordered)
+        return {
+            'fps': self.clock_ref.get_fps(),
+            'mean_ms': mean_ms,
+            'min_ms': ordered[0],
+            'max_ms': ordered[-1],
+            'p95_ms': ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))],
+        }
@@ -13,18 +13,152 @@
     It effectively keeps track of every texture created
     at runtime and provides access to them and methods to
     destroy them when no longer in use.
+
+    Surfaces drawn on every frame should use a StreamingTexture;
+    it is allocated once and written through pixel buffers.
+
+    Textures loaded from files are cached by (path, mtime, flip, mode): loading the
+    same image again costs nothing. The cache keeps to a VRAM budget by releasing the
+    least recently used textures that no name refers to and that are not pinned.
+
+    Images can also be loaded asynchronously: they are decoded on a thread pool while a
+    placeholder texture stands in, and uploaded on the main thread once decoded.
+
+    With `enable_disk_cache`, decoded images are also kept on disk (see TextureDiskCache),
+    so the next launch maps them instead of decoding them.
+
+    Many small images can share one texture in an atlas (see TextureAtlas); the atlas is
+    named like a texture, and its lookup table is the texture "<atlas name>_lookup".
+
+    Images too large to upload whole are loaded as VirtualTextures: only the tiles in view
+    are uploaded, into a page cache named like a texture, with "<name>_indirection" beside it.
 """
 
 from . import singleton
 from . import pg
 from . import mgl
+from . import np
+from .Profiler import Profiler
+from .TextureDiskCache import TextureDiskCache
+from .TextureAtlas import TextureAtlas, AtlasRegion
+from .VirtualTexture import VirtualTexture, get_levels
 from PIL import Image
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, Future
+from dataclasses import dataclass
 import os
 # from . import TYPE_CHECKING
 # if TYPE_CHECKING:
 #     from .Engine import Engine
 
 
+@dataclass(frozen=True, slots=True)
+class DecodedImage:
+    size: tuple[int, int]
+    components: int
+    data: bytes
+
+
+def decode_image(path: str, pilMode: str = None, flipX=False, flipY=True) -> DecodedImage:
+    """
+        Decodes an image into raw pixels with PIL, which lets go of the GIL while decoding,
+        so it can run on any thread. `pilMode` None keeps RGB images RGB and makes the rest RGBA.
+    """
+    with Image.open(path) as img:
+        if pilMode is None:
+            pilMode = "RGB" if img.mode == "RGB" else "RGBA"
+        img = img.convert(pilMode) if img.mode != pilMode else img
+        img = img.transpose(Image.FLIP_LEFT_RIGHT) if flipX else img
+        # Flip image vertically (OpenGL uses bottom-left origin)
+        img = img.transpose(Image.FLIP_TOP_BOTTOM) if flipY else img
+        return DecodedImage(img.size, len(pilMode), img.tobytes())
+
+
+class TextureHandle:
+    """
+        What an asynchronous load gives back right away.
+        Until the image is decoded and uploaded, `texture` is the placeholder;
+        then it is the loaded texture, `ready` is True and the `on_ready` callbacks are called.
+    """
+    def __init__(self, textureName: str, texture: mgl.Texture | mgl.TextureCube, ready=False):
+        self.name = textureName
+        self.texture = texture
+        self.ready = ready
+        self.failed = False
+        self.callbacks = []
+
+    def on_ready(self, callback) -> None:
+        """`callback(handle)` is called on the main thread; right away if already loaded"""
+        if self.ready:
+            callback(self)
+        else:
+            self.callbacks.append(callback)
+
+    def set_ready(self, texture: mgl.Texture | mgl.TextureCube) -> None:
+        self.texture = texture
+        self.ready = True
+        [callback(self) for callback in self.callbacks]
+        self.callbacks.clear()
+
+
+class StreamingTexture:
+    """
+        A texture that is written every frame from a pygame Surface.
+        The GPU storage is allocated once. Each write goes into one of the pixel buffers (PBOs),
+        taking turns, and the texture is filled from it by the driver, so the copy
+        does not wait on the GPU still reading the previous frame's buffer.
+    """
+    def __init__(self, ctxRef: mgl.Context, size: tuple[int, int], components=4, bufferCount=2):
+        self.ctx_ref = ctxRef
+        self.size = size
+        self.components = components
+        self.texture = self.ctx_ref.texture(size, components)
+        self.texture.filter = (mgl.NEAREST, mgl.NEAREST)
+        #   This is the format in which Moderngl reads pygame's color channels
+        self.texture.swizzle = 'BGRA'
+        self.pixel_buffers = [self.ctx_ref.buffer(reserve=size[0] * size[1] * components, dynamic=True)
+                              for _ in range(bufferCount)]
+        self.buffer_index = 0
+
+    def get_pixels(self, surface: pg.Surface) -> np.ndarray:
+        """The surface's pixels as rows of bytes, without the padding at the end of each row"""
+        width, height = surface.get_size()
+        pixels = np.frombuffer(surface.get_view('1'), dtype=np.uint8)
+        return pixels.reshape(height, -1)[:, :width * self.components]
+
+    def write_surface(self, surface: pg.Surface, dirtyRects: list[pg.Rect] = None) -> None:
+        """
+            `dirtyRects` are the parts of the surface drawn on since the last write;
+            only the rectangle bounding them all is uploaded. None uploads everything.
+        """
+        if surface.get_size() != self.size:
+            raise ValueError("A surface of {} cannot be written to a streaming texture of {}".format(surface.get_size(), self.size))
+        if dirtyRects is not None:
+            if len(dirtyRects) == 0:
+                return
+            rect = pg.Rect(dirtyRects[0]).unionall(dirtyRects[1:]).clip(pg.Rect((0, 0), self.size))
+            if rect.width == 0 or rect.height == 0:
+                return
+        else:
+            rect = pg.Rect((0, 0), self.size)
+
+        pixels = self.get_pixels(surface)
+        region = pixels[rect.top:rect.bottom, rect.left * self.components:rect.right * self.components]
+        pixel_buffer = self.pixel_buffers[self.buffer_index]
+        self.buffer_index = (self.buffer_index + 1) % len(self.pixel_buffers)
+        pixel_buffer.write(np.ascontiguousarray(region))
+        #   Rows of the texture are the surface's rows from the top, as with `pg_surface_to_mg_texture`
+        self.texture.write(pixel_buffer, viewport=(rect.left, rect.top, rect.width, rect.height))
+        Profiler().count('texture_uploads')
+
+    def use(self, location=0) -> None:
+        self.texture.use(location=location)
+
+    def release(self) -> None:
+        self.texture.release()
+        [pixel_buffer.release() for pixel_buffer in self.pixel_buffers]
+
+
 @singleton
 class TextureManager:
     """
@@ -34,24 +168,252 @@ class TextureManager:
         Hence every texture is added through this texture manager.
     """
     textures: dict[str, mgl.Texture | mgl.TextureCube] = {}
+    #   Textures written every frame; their textures are in `textures` too
+    streaming_textures: dict[str, StreamingTexture] = {}
+    #   Atlases by name; their textures and lookup textures are in `textures` too
+    atlases: dict[str, TextureAtlas] = {}
+    #   Virtual textures by name; their page caches and indirections are in `textures` too
+    virtual_textures: dict[str, VirtualTexture] = {}
+    #   The cache of loaded textures, least recently used first, and the bytes each takes
+    cache: OrderedDict[tuple, mgl.Texture | mgl.TextureCube] = OrderedDict()
+    cache_bytes: dict[tuple, int] = {}
+    cached_bytes: int = 0
+    #   Cache keys that must not be evicted even when no name refers to them
+    pin_counts: dict[tuple, int] = {}
+    #   texture name -> the cache key of its texture, for cached textures
+    texture_keys: dict[str, tuple] = {}
+    #   Bytes of VRAM the cached textures may take; see `set_vram_budget`
+    vram_budget: int = 512 * 1024 * 1024
+    cube_faces: list[str] = ['right', 'left', 'top', 'bottom'] + ['front', 'back'][::-1]
+    #   Faces flipped on the x-axis; the others are flipped on the y-axis
+    cube_horizontal_faces: list[str] = ['right', 'left', 'front', 'back']
 
     def __init__(self, ctxRef: mgl.Context):
         self.ctx_ref = ctxRef
         self.var1 = None
+        #   Made on first use
+        self.decode_executor: ThreadPoolExecutor | None = None
+        self.placeholder_texture: mgl.Texture | None = None
+        #   (handle, decoding futures, cache key, mode) of loads not uploaded yet
+        self.pending_loads: list[tuple[TextureHandle, list[Future], tuple, int | str]] = []
+        #   See `enable_disk_cache`
+        self.disk_cache: TextureDiskCache | None = None
+
+    def enable_disk_cache(self, cacheDir="", maxBytes=2 * 1024 ** 3) -> None:
+        """
+            Keeps decoded images in `cacheDir` across launches, up to `maxBytes` of them.
+            The default directory is ~/.cache/DejiArts/textures.
+            Mode 1 images are then decoded with PIL rather than pygame; the pixels are the same.
+        """
+        self.disk_cache = TextureDiskCache(cacheDir, maxBytes)
 
     def add_texture(self, textureName: str, texturePath: str, mode=1, vFlip=True) -> None:
         """
             Note that if the texture with that name already exists, it updates its value
+            An image that is already cached is not loaded again.
         """
-        match mode:
-            case 1:
-                self.textures[textureName] = self.get_texture(path=texturePath, vFlip=vFlip)
-            case 2:
-                self.textures[textureName] = self.get_texture_pil_impl(path=texturePath, vFlip=vFlip)
+        cache_key = (os.path.abspath(texturePath), os.path.getmtime(texturePath), vFlip, mode)
+        texture = self.get_cached(cache_key)
+        if texture is None:
+            match mode:
+                case 1 if self.disk_cache is not None:
+                    texture = self.upload_image(self.read_image(texturePath, "RGBA", False, vFlip), anisotropy=32.0)
+                case 1:
+                    texture = self.get_texture(path=texturePath, vFlip=vFlip)
+                case 2:
+                    texture = self.get_texture_pil_impl(path=texturePath, vFlip=vFlip)
+                case _:
+                    raise ValueError("Unknown texture mode {}; it is 1 (pygame) or 2 (PIL)".format(mode))
+            self.add_to_cache(cache_key, texture, self.get_texture_bytes(texture, withMipmaps=True))
+        self.set_texture(textureName, texture, cache_key)
+        self.evict()
 
 
     def add_texture_cube(self, textureCubeName: str, texturesPath: str, texturesExt: str = "png") -> None:
-        self.textures[textureCubeName] = self.get_texture_cube(texturesPath, texturesExt)
+        face_mtimes = tuple(os.path.getmtime(os.path.join(texturesPath, f'{face}.{texturesExt}')) for face in self.cube_faces)
+        cache_key = (os.path.abspath(texturesPath), face_mtimes, texturesExt, 'cube')
+        texture_cube = self.get_cached(cache_key)
+        if texture_cube is None:
+            texture_cube = self.get_texture_cube(texturesPath, texturesExt)
+            self.add_to_cache(cache_key, texture_cube, self.get_texture_bytes(texture_cube, faces=6))
+        self.set_texture(textureCubeName, texture_cube, cache_key)
+        self.evict()
+
+    def load_texture_async(self, textureName: str, texturePath: str, mode=1, vFlip=True) -> TextureHandle:
+        """
+            Like `add_texture`, but the image is decoded on a thread pool and the name refers to
+            a placeholder until `process_pending` uploads it. `mode` 1 loads RGBA like `get_texture`,
+            2 keeps RGB images RGB like `get_texture_pil_impl`.
+        """
+        if mode not in (1, 2):
+            raise ValueError("Unknown texture mode {}; it is 1 (pygame) or 2 (PIL)".format(mode))
+        cache_key = (os.path.abspath(texturePath), os.path.getmtime(texturePath), vFlip, mode)
+        texture = self.get_cached(cache_key)
+        if texture is not None:
+            self.set_texture(textureName, texture, cache_key)
+            return TextureHandle(textureName, texture, ready=True)
+
+        handle = TextureHandle(textureName, self.get_placeholder())
+        self.set_texture(textureName, handle.texture)
+        future = self.get_decode_executor().submit(self.read_image, texturePath, "RGBA" if mode == 1 else None, False, vFlip)
+        self.pending_loads.append((handle, [future], cache_key, mode))
+        return handle
+
+    def load_texture_cube_async(self, textureCubeName: str, texturesPath: str, texturesExt: str = "png") -> TextureHandle:
+        """Like `add_texture_cube`; the six faces are decoded in parallel"""
+        face_mtimes = tuple(os.path.getmtime(os.path.join(texturesPath, f'{face}.{texturesExt}')) for face in self.cube_faces)
+        cache_key = (os.path.abspath(texturesPath), face_mtimes, texturesExt, 'cube')
+        texture_cube = self.get_cached(cache_key)
+        if texture_cube is not None:
+            self.set_texture(textureCubeName, texture_cube, cache_key)
+            return TextureHandle(textureCubeName, texture_cube, ready=True)
+
+        #   A 2D placeholder; a samplerCube should only be bound to the cube map once it is ready
+        handle = TextureHandle(textureCubeName, self.get_placeholder())
+        self.set_texture(textureCubeName, handle.texture)
+        futures = [self.get_decode_executor().submit(*self.get_cube_face_job(texturesPath, face, texturesExt))
+                   for face in self.cube_faces]
+        self.pending_loads.append((handle, futures, cache_key, 'cube'))
+        return handle
+
+    def process_pending(self) -> None:
+        """
+            Uploads the images decoded since the last call, and swaps them in for the placeholders.
+            It is GL work, so it runs on the main thread; the Canvas calls it every frame.
+        """
+        if not self.pending_loads:
+            return
+        still_pending = []
+        for pending in self.pending_loads:
+            handle, futures, cache_key, mode = pending
+            if not all(future.done() for future in futures):
+                still_pending.append(pending)
+                continue
+            try:
+                decoded = [future.result() for future in futures]
+            except Exception as e:
+                handle.failed = True
+                print("Texture Error: could not load '{}': {}".format(handle.name, str(e)))
+                continue
+
+            #   Another load of the same image may have finished first
+            texture = self.get_cached(cache_key)
+            if texture is None:
+                if mode == 'cube':
+                    texture = self.upload_cube(decoded)
+                    self.add_to_cache(cache_key, texture, self.get_texture_bytes(texture, faces=6))
+                else:
+                    texture = self.upload_image(decoded[0], anisotropy=32.0 if mode == 1 else 0.0)
+                    self.add_to_cache(cache_key, texture, self.get_texture_bytes(texture, withMipmaps=True))
+            #   Unless the name was given another texture meanwhile
+            if self.textures.get(handle.name) is handle.texture:
+                self.set_texture(handle.name, texture, cache_key)
+            handle.set_ready(texture)
+        self.pending_loads = still_pending
+        self.evict()
+
+    def get_decode_executor(self) -> ThreadPoolExecutor:
+        if self.decode_executor is None:
+            self.decode_executor = ThreadPoolExecutor(thread_name_prefix="TextureDecode")
+        return self.decode_executor
+
+    def get_placeholder(self) -> mgl.Texture:
+        """One opaque black texel, shared by every texture still loading"""
+        if self.placeholder_texture is None:
+            self.placeholder_texture = self.ctx_ref.texture((1, 1), 4, bytes((0, 0, 0, 255)))
+        return self.placeholder_texture
+
+    def get_cube_face_job(self, texturesPath: str, face: str, texturesExt: str) -> tuple:
+        ##  To fix the mirror effect that makes the text not appear correctly, which show that the image is mirrored
+        is_horizontal = face in self.cube_horizontal_faces
+        return self.read_image, os.path.join(texturesPath, f'{face}.{texturesExt}'), "RGB", is_horizontal, not is_horizontal, False
+
+    def read_image(self, path: str, pilMode: str = None, flipX=False, flipY=True) -> DecodedImage:
+        """`decode_image`, through the disk cache when it is enabled; it can run on any thread"""
+        if self.disk_cache is None:
+            return decode_image(path, pilMode, flipX, flipY)
+        flags = "{}:{}:{}".format(pilMode, flipX, flipY)
+        return self.disk_cache.get_or_decode(path, flags, lambda: decode_image(path, pilMode, flipX, flipY))
+
+    def upload_image(self, decoded: DecodedImage, anisotropy=0.0) -> mgl.Texture:
+        texture = self.ctx_ref.texture(decoded.size, decoded.components, decoded.data)
+        Profiler().count('texture_uploads')
+        texture.filter = (mgl.LINEAR_MIPMAP_NEAREST, mgl.LINEAR_MIPMAP_NEAREST)
+        #   Moderngl can only allocate mip levels by generating them (writing a level past the last
+        #   one built is an error), so they are always built here and never uploaded from the CPU
+        texture.build_mipmaps()
+        if anisotropy > 0:
+            #   improves texture quality
+            texture.anisotropy = anisotropy
+        return texture
+
+    def upload_cube(self, faces: list[DecodedImage]) -> mgl.TextureCube:
+        ##  Empty cube texture
+        texture_cube = self.ctx_ref.texture_cube(size=faces[0].size, components=3, data=None)
+        for i, face in enumerate(faces):
+            ##  Use write method to write texture data for corresponding face of cube texture
+            texture_cube.write(face=i, data=face.data)
+            Profiler().count('texture_uploads')
+        return texture_cube
+
+    def set_texture(self, textureName: str, texture: mgl.Texture | mgl.TextureCube, cacheKey: tuple = None) -> None:
+        """Names the texture; what the name had before is released, unless it is cached"""
+        if textureName in self.textures and self.textures[textureName] is not texture:
+            self.release(textureName)
+        self.textures[textureName] = texture
+        if cacheKey is not None:
+            self.texture_keys[textureName] = cacheKey
+
+    def get_cached(self, cacheKey: tuple) -> mgl.Texture | mgl.TextureCube | None:
+        texture = self.cache.get(cacheKey)
+        if texture is not None:
+            self.cache.move_to_end(cacheKey)
+        return texture
+
+    def add_to_cache(self, cacheKey: tuple, texture: mgl.Texture | mgl.TextureCube, textureBytes: int) -> None:
+        self.cache[cacheKey] = texture
+        self.cache_bytes[cacheKey] = textureBytes
+        self.cached_bytes += textureBytes
+
+    @staticmethod
+    def get_texture_bytes(texture: mgl.Texture | mgl.TextureCube, withMipmaps=False, faces=1) -> int:
+        """The VRAM the texture takes, with every mip level when it has them"""
+        width, height = texture.size
+        texel_bytes = texture.components * int(texture.dtype[1:])
+        total = width * height * texel_bytes
+        while withMipmaps and (width > 1 or height > 1):
+            width, height = max(1, width // 2), max(1, height // 2)
+            total += width * height * texel_bytes
+        return total * faces
+
+    def set_vram_budget(self, budgetBytes: int) -> None:
+        self.vram_budget = budgetBytes
+        self.evict()
+
+    def evict(self) -> None:
+        """Releases least recently used textures until the cache is within the budget"""
+        if self.cached_bytes <= self.vram_budget:
+            return
+        in_use = set(self.texture_keys.values())
+        for cache_key in list(self.cache):
+            if self.cached_bytes <= self.vram_budget:
+                break
+            if cache_key in in_use or self.pin_counts.get(cache_key, 0) > 0:
+                continue
+            self.cache.pop(cache_key).release()
+            self.cached_bytes -= self.cache_bytes.pop(cache_key)
+
+    def pin(self, textureName: str) -> None:
+        """Keeps the named texture cached, even once no name refers to it, until `unpin`"""
+        cache_key = self.texture_keys[textureName]
+        self.pin_counts[cache_key] = self.pin_counts.get(cache_key, 0) + 1
+
+    def unpin(self, textureName: str) -> None:
+        cache_key = self.texture_keys[textureName]
+        self.pin_counts[cache_key] -= 1
+        if self.pin_counts[cache_key] <= 0:
+            self.pin_counts.pop(cache_key)
+        self.evict()
  
 
     # def get_texture_from_render_vao(self, )
@@ -66,22 +428,15 @@ class TextureManager:
             OR:
                 pg.image.tostring(Surface, "RGBA", True | False) 
         """
-        imageName = os.path.basename(path)
-
-        #   JPG images only have rgb so use .convert() to ensure loading in rgb
-        image_surf = pg.image.load(path).convert()
-        if ".jpg" in imageName:
-            #   But can add fake alpha which sets to opaque:
-            image_surf = image_surf.convert_alpha()
-            image_data = pg.image.tostring(image_surf, "RGBA", vFlip)
-            
-        else:
-            #   Use `.convert_alpha` for .png to ensure the image is in 32-bit RGBA
-            image_surf = pg.image.load(path).convert_alpha()
-            image_data = pg.image.tostring(image_surf, "RGBA", vFlip)
+        #   Use `.convert_alpha` to ensure the image is in 32-bit RGBA;
+        #   JPG images only have rgb, so they get a fake alpha which is opaque.
+        #   The image is only decoded once.
+        image_surf = pg.image.load(path).convert_alpha()
+        image_data = pg.image.tostring(image_surf, "RGBA", vFlip)
 
         texture = self.ctx_ref.texture(size=image_surf.get_size(), components=4,
                                     data=image_data)
+        Profiler().count('texture_uploads')
         texture.filter = (mgl.LINEAR_MIPMAP_NEAREST, mgl.LINEAR_MIPMAP_NEAREST)
         # texture.filter = (mgl.LINEAR_MIPMAP_LINEAR, mgl.LINEAR)
         # texture.filter = (mgl.NEAREST, mgl.NEAREST)
@@ -92,32 +447,70 @@ class TextureManager:
         return texture
     
     def get_texture_pil_impl(self, path: str, vFlip=True):
-        # Load image with PIL and auto-convert format
-        img = Image.open(path)
+        # Load image with PIL and auto-convert format; RGB stays RGB, the rest get alpha
+        return self.upload_image(self.read_image(path, flipY=vFlip))
+    
+    # def add_texture(self, textureName, surface: pg.Surface) -> None:
+    #     self.pg_surface_to_mg_texture(textureName, surface)
 
-        if img.mode == "RGB":
-            components = 3
-        else:
-            img = img.convert("RGBA")  # force alpha if needed
-            components = 4
+    def create_atlas(self, atlasName: str, size: tuple[int, int] = (2048, 2048), padding=4, isArray=False) -> TextureAtlas:
+        """
+            An atlas packs images into one 2D texture, which grows as they are added;
+            with `isArray` they go into the layers of a texture array (a sampler2DArray) instead.
+        """
+        if atlasName in self.textures:
+            self.release(atlasName)
+        atlas = TextureAtlas(self.ctx_ref, size, padding, isArray)
+        self.atlases[atlasName] = atlas
+        self.update_atlas_textures(atlasName)
+        return atlas
 
-        # Flip image vertically (OpenGL uses bottom-left origin)
-        img = img.transpose(Image.FLIP_TOP_BOTTOM) if vFlip else img
-        # img = img.rotate(Image.CLOCKWI)
+    def add_to_atlas(self, atlasName: str, imageName: str, texturePath: str, vFlip=True) -> AtlasRegion:
+        """
+            Adds the image to the atlas, which is made with the defaults the first time.
+            Shaders read it at the region's index; see texture_atlas.glsl.
+        """
+        atlas = self.atlases.get(atlasName) or self.create_atlas(atlasName)
+        decoded = self.read_image(texturePath, "RGBA", False, vFlip)
+        width, height = decoded.size
+        pixels = np.frombuffer(decoded.data, dtype=np.uint8).reshape(height, width, 4)
+        region = atlas.add(imageName, pixels)
+        self.update_atlas_textures(atlasName)
+        return region
 
-        # Convert to raw byte data
-        image_data = img.tobytes()
-        
-        texture = self.ctx_ref.texture(img.size, components, image_data)
+    def remove_from_atlas(self, atlasName: str, imageName: str) -> None:
+        self.atlases[atlasName].remove(imageName)
+        self.update_atlas_textures(atlasName)
 
-        texture.filter = (mgl.LINEAR_MIPMAP_NEAREST, mgl.LINEAR_MIPMAP_NEAREST)
-        
-        texture.build_mipmaps()
+    def update_atlas_textures(self, atlasName: str) -> None:
+        """Names the atlas's textures again; they are new when it grew. The atlas released the old ones."""
+        atlas = self.atlases[atlasName]
+        self.textures[atlasName] = atlas.texture
+        self.textures[atlasName + "_lookup"] = atlas.lookup_texture
 
-        return texture
-    
-    # def add_texture(self, textureName, surface: pg.Surface) -> None:
-    #     self.pg_surface_to_mg_texture(textureName, surface)
+    def add_virtual_texture(self, textureName: str, texturePath: str, outputSize: tuple[int, int], vFlip=True, tileSize=256) -> VirtualTexture:
+        """
+            Loads the image as a VirtualTexture drawn over `outputSize` pixels; see its `set_view`.
+            Its tiles are uploaded by `update_virtual_textures` as they come into view.
+        """
+        if textureName in self.textures:
+            self.release(textureName)
+        decoded = self.read_image(texturePath, "RGBA", False, vFlip)
+        virtual_texture = VirtualTexture(self.ctx_ref, get_levels(decoded, tileSize), tileSize)
+        virtual_texture.set_view(outputSize)
+        self.virtual_textures[textureName] = virtual_texture
+        self.textures[textureName] = virtual_texture.cache_texture
+        self.textures[textureName + "_indirection"] = virtual_texture.indirection_texture
+        return virtual_texture
+
+    def update_virtual_textures(self) -> None:
+        """The Canvas calls it every frame"""
+        [virtual_texture.update() for virtual_texture in self.virtual_textures.values()]
+
+    def exceeds_texture_limit(self, texturePath: str) -> bool:
+        """Whether the image is too large for one texture; only its header is read"""
+        with Image.open(texturePath) as img:
+            return max(img.size) > self.ctx_ref.info['GL_MAX_TEXTURE_SIZE']
 
     def pg_surface_to_mg_texture(self, textureName: str, surface: pg.Surface) -> None:
         """
@@ -125,61 +518,96 @@ class TextureManager:
             It is not like the other textures because of this.
 
             Note that if that texture already exists, this updates its value.
+            It makes a new texture every call; for surfaces that change every frame
+            use `write_streaming_texture`.
         """
         texture = self.ctx_ref.texture(surface.get_size(), 4)
         texture.filter = (mgl.NEAREST, mgl.NEAREST)
         #   This is the format in which Moderngl reads the color channels
         texture.swizzle = 'BGRA'
         texture.write(surface.get_view('1'))
+        Profiler().count('texture_uploads')
 
         ##
-        self.textures[textureName] = texture
+        self.set_texture(textureName, texture)
         
 
+    def write_streaming_texture(self, textureName: str, surface: pg.Surface, dirtyRects: list[pg.Rect] = None) -> bool:
+        """
+            Writes the surface into the streaming texture of that name, which is made
+            the first time (or when the surface's size changes) and then uploaded whole.
+            After that only the rectangle bounding `dirtyRects` is uploaded, or all of it
+            when they are None; see StreamingTexture.write_surface. Returns whether it was made.
+        """
+        streaming_texture = self.streaming_textures.get(textureName)
+        created = streaming_texture is None or streaming_texture.size != surface.get_size()
+        if created:
+            streaming_texture = StreamingTexture(self.ctx_ref, surface.get_size())
+            self.set_texture(textureName, streaming_texture.texture)
+            self.streaming_textures[textureName] = streaming_texture
+            dirtyRects = None
+        streaming_texture.write_surface(surface, dirtyRects)
+        return created
+
     def get_texture_cube(self, dir_path, ext='png'):
         ##  Order to load texture
         ##  -1 means start from the last item, 'back', thereby returning ['back', 'front']
-        faces = ['right', 'left', 'top', 'bottom'] + ['front', 'back'][::-1]
-        ##textures = [pg.image.load(dir_path + f'{face}.{ext}').convert() for face in faces]
-        textures = []
-        ##  To fix the mirror effect that makes the text not appear correctly, which show that the image is mirrored
-        for face in faces:
-            texture = pg.image.load(os.path.join(dir_path, f'{face}.{ext}')).convert()
-            if face in ['right', 'left','front', 'back']:
-                ##  Flip the horizontal textures on the x-axis
-                texture = pg.transform.flip(texture, flip_x=True, flip_y=False)
-            else:
-                texture = pg.transform.flip(texture, flip_x=False, flip_y=True)
-            textures.append(texture)
-
-        size = textures[0].get_size()
-        ##  Empty cube texture
-        texture_cube = self.ctx_ref.texture_cube(size=size, components=3, data=None)
-
-        for i in range(6):
-            ##  Translate textures into a byte string
-            texture_data = pg.image.tostring(textures[i], 'RGB')
-            ##  Use write method to write texture data for corresponding face of cube texture
-            texture_cube.write(face=i, data=texture_data)
-
-        return texture_cube
+        ##  The six faces are decoded in parallel
+        futures = [self.get_decode_executor().submit(*self.get_cube_face_job(dir_path, face, ext))
+                   for face in self.cube_faces]
+        return self.upload_cube([future.result() for future in futures])
 
 
     """
         Note that the texture data is autamatically destroyed when the vbo is destroyed
     """
     def release_all(self):
-        [tex.release() for tex in self.textures.values()]
+        [tex.release() for name, tex in self.textures.items()
+         if name not in self.texture_keys and tex is not self.placeholder_texture]
+        [tex.release() for tex in self.cache.values()]
+        [[pixel_buffer.release() for pixel_buffer in streaming.pixel_buffers] for streaming in self.streaming_textures.values()]
         self.textures.clear()
+        self.streaming_textures.clear()
+        self.atlases.clear()
+        self.virtual_textures.clear()
+        self.texture_keys.clear()
+        self.cache.clear()
+        self.cache_bytes.clear()
+        self.pin_counts.clear()
+        self.cached_bytes = 0
+        self.pending_loads.clear()
+        if self.placeholder_texture is not None:
+            self.placeholder_texture.release()
+            self.placeholder_texture = None
+        if self.decode_executor is not None:
+            self.decode_executor.shutdown(wait=False, cancel_futures=True)
+            self.decode_executor = None
         # self.texture_uniform_count = 0
         print("Textures Destroyed")
 
     def release(self, textureName):
-        self.textures.pop(textureName).release()
+        """A cached texture stays cached, for the next load of it, until it is evicted"""
+        if textureName in self.atlases:
+            self.atlases.pop(textureName).release()
+            self.textures.pop(textureName)
+            self.textures.pop(textureName + "_lookup")
+            return
+        if textureName in self.virtual_textures:
+            self.virtual_textures.pop(textureName).release()
+            self.textures.pop(textureName)
+            self.textures.pop(textureName + "_indirection")
+            return
+        texture = self.textures.pop(textureName)
+        streaming_texture = self.streaming_textures.pop(textureName, None)
+        if self.texture_keys.pop(textureName, None) is None:
+            if texture is not self.placeholder_texture:
+                (streaming_texture or texture).release()
+        else:
+            self.evict()
         # self.texture_uniform_count -= 1
 
     def release_these(self, textureNames):
         # [value.release() for texture_name, value  in self.textures.items() for name in textureNames if texture_name != name]
-        [self.textures.pop(texture_name).release() for texture_name in textureNames]
+        [self.release(texture_name) for texture_name in textureNames]
         # for _ in range(len(textureNames)):
             # self.texture_uniform_count -= 1
\ No newline at end of file
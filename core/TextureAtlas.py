@@ -0,0 +1,276 @@
+"""
+    This packs many small images into one texture, so a scene binds one texture
+    however many images it draws.
+
+    The images go into a 2D atlas, or into the layers of a texture array, by a shelf packer.
+    Each image is surrounded by `padding` texels copied from its edges, and only the mip levels
+    that padding covers are built, so neither filtering nor mipmapping bleeds neighbours into it.
+
+    Shaders find an image by the index it was given, in a small lookup texture:
+    row 0 is its uv offset and scale, row 1 its layer and size in texels.
+    `texture_atlas.glsl` has the functions that read it.
+
+    Adding an image writes only its own rectangle. When it does not fit, the 2D atlas
+    doubles and repacks every image, and the texture array gets another layer.
+    Either way the texture is replaced, but the indices stay the same.
+"""
+
+from . import mgl
+from . import np
+from .Profiler import Profiler
+from dataclasses import dataclass
+
+
+@dataclass(frozen=True, slots=True)
+class AtlasRegion:
+    #   The image's row in the lookup texture
+    index: int
+    layer: int
+    #   x, y, width, height in texels, without the padding
+    rect: tuple[int, int, int, int]
+    #   u, v offset and u, v scale
+    uv_rect: tuple[float, float, float, float]
+
+
+class ShelfPacker:
+    """
+        Packs rectangles in rows ('shelves') from the bottom up.
+        A rectangle goes on the lowest shelf it fits, or on a new one above the last.
+    """
+    def __init__(self, size: tuple[int, int]):
+        self.size = size
+        #   [y, height, next free x] of each shelf
+        self.shelves: list[list[int]] = []
+        self.top = 0
+
+    def insert(self, width: int, height: int) -> tuple[int, int] | None:
+        """The position of the rectangle, or None when it does not fit"""
+        best = None
+        for shelf in self.shelves:
+            if height <= shelf[1] and shelf[2] + width <= self.size[0]:
+                if best is None or shelf[1] < best[1]:
+                    best = shelf
+        if best is None:
+            if self.top + height > self.size[1] or width > self.size[0]:
+                return None
+            best = [self.top, height, 0]
+            self.shelves.append(best)
+            self.top += height
+        position = (best[2], best[0])
+        best[2] += width
+        return position
+
+
+class TextureAtlas:
+    def __init__(self, ctxRef: mgl.Context, size: tuple[int, int] = (2048, 2048), padding=4, isArray=False):
+        self.ctx_ref = ctxRef
+        self.size = size
+        self.padding = padding
+        self.is_array = isArray
+        #   Mip levels past this would average texels from beyond the padding
+        self.max_level = max(padding, 1).bit_length() - 1
+        #   Rectangles start on multiples of this, so each texel of those levels covers one image only
+        self.alignment = 1 << self.max_level
+        self.max_size = ctxRef.info['GL_MAX_TEXTURE_SIZE']
+
+        #   image name -> its pixels with the padding, (height, width, 4)
+        self.images: dict[str, np.ndarray] = {}
+        #   image name -> its width and height without the padding
+        self.image_sizes: dict[str, tuple[int, int]] = {}
+        self.indices: dict[str, int] = {}
+        self.next_index = 0
+        self.regions: dict[str, AtlasRegion] = {}
+        self.packers: list[ShelfPacker] = [ShelfPacker(size)]
+        #   The atlas's texels, one (height, width, 4) page per layer
+        self.pixels = np.zeros((1, size[1], size[0], 4), dtype=np.uint8)
+        self.texture = self.create_texture()
+        self.lookup = np.zeros((2, 64, 4), dtype=np.float32)
+        self.lookup_texture = self.create_lookup_texture()
+
+    def create_texture(self) -> mgl.Texture | mgl.TextureArray:
+        if self.is_array:
+            texture = self.ctx_ref.texture_array((*self.size, len(self.packers)), 4, self.pixels.tobytes())
+        else:
+            texture = self.ctx_ref.texture(self.size, 4, self.pixels.tobytes())
+        Profiler().count('texture_uploads')
+        texture.filter = (mgl.LINEAR_MIPMAP_LINEAR, mgl.LINEAR)
+        texture.build_mipmaps(0, self.max_level)
+        return texture
+
+    def create_lookup_texture(self) -> mgl.Texture:
+        lookup_texture = self.ctx_ref.texture((self.lookup.shape[1], 2), 4, self.lookup.tobytes(), dtype='f4')
+        lookup_texture.filter = (mgl.NEAREST, mgl.NEAREST)
+        return lookup_texture
+
+    def get_padded(self, pixels: np.ndarray) -> np.ndarray:
+        """The pixels with the padding, widened on the right and top to a multiple of the alignment"""
+        height, width = pixels.shape[:2]
+        align = self.alignment
+        padded_width = -(-(width + 2 * self.padding) // align) * align
+        padded_height = -(-(height + 2 * self.padding) // align) * align
+        return np.pad(pixels, ((self.padding, padded_height - height - self.padding),
+                               (self.padding, padded_width - width - self.padding), (0, 0)), mode='edge')
+
+    def add(self, imageName: str, pixels: np.ndarray) -> AtlasRegion:
+        """
+            `pixels` is (height, width, 4) uint8, its first row the bottom of the image.
+            Adding a name again replaces its image and keeps its index.
+        """
+        padded = self.get_padded(np.ascontiguousarray(pixels, dtype=np.uint8))
+        limit = self.size if self.is_array else (self.max_size, self.max_size)
+        if padded.shape[1] > limit[0] or padded.shape[0] > limit[1]:
+            raise ValueError("The image '{}' of {} does not fit in the atlas".format(imageName, pixels.shape[1::-1]))
+
+        old_padded = self.images.get(imageName)
+        self.images[imageName] = padded
+        self.image_sizes[imageName] = (pixels.shape[1], pixels.shape[0])
+        if imageName not in self.indices:
+            self.indices[imageName] = self.next_index
+            self.next_index += 1
+
+        if old_padded is not None and old_padded.shape == padded.shape:
+            #   Same room as before, so it is written where it was
+            region = self.regions[imageName]
+            self.place(imageName, region.layer, (region.rect[0] - self.padding, region.rect[1] - self.padding))
+            self.write_region(imageName)
+            return self.regions[imageName]
+        #   A replaced image of another size leaves its old room until the next repack
+        self.regions.pop(imageName, None)
+
+        layer, position = self.insert(padded)
+        if position is None:
+            self.grow(imageName)
+        else:
+            self.place(imageName, layer, position)
+            self.write_region(imageName)
+        self.write_lookup()
+        return self.regions[imageName]
+
+    def insert(self, padded: np.ndarray) -> tuple[int, tuple[int, int] | None]:
+        """Into the first layer with room; the 2D atlas has one layer"""
+        for layer, packer in enumerate(self.packers):
+            position = packer.insert(padded.shape[1], padded.shape[0])
+            if position is not None:
+                return layer, position
+        return 0, None
+
+    def place(self, imageName: str, layer: int, position: tuple[int, int]) -> None:
+        """Copies the image into `pixels` at `position` and records its region"""
+        padded = self.images[imageName]
+        x, y = position
+        self.pixels[layer, y:y + padded.shape[0], x:x + padded.shape[1]] = padded
+        width, height = self.image_sizes[imageName]
+        rect = (x + self.padding, y + self.padding, width, height)
+        uv_rect = (rect[0] / self.size[0], rect[1] / self.size[1], width / self.size[0], height / self.size[1])
+        self.regions[imageName] = AtlasRegion(self.indices[imageName], layer, rect, uv_rect)
+
+    def write_region(self, imageName: str) -> None:
+        """Uploads only the image's rectangle, with its padding"""
+        region = self.regions[imageName]
+        self.write_rect(region.layer, (region.rect[0] - self.padding, region.rect[1] - self.padding), self.images[imageName])
+
+    def write_rect(self, layer: int, position: tuple[int, int], pixels: np.ndarray) -> None:
+        x, y = position
+        if self.is_array:
+            self.texture.write(pixels, viewport=(x, y, layer, pixels.shape[1], pixels.shape[0], 1))
+        else:
+            self.texture.write(pixels, viewport=(x, y, pixels.shape[1], pixels.shape[0]))
+        Profiler().count('texture_uploads')
+        self.texture.build_mipmaps(0, self.max_level)
+
+    def grow(self, imageName: str) -> None:
+        """Gives the array another layer for the image, or the 2D atlas twice the room and repacks it"""
+        if self.is_array:
+            padded = self.images[imageName]
+            self.packers.append(ShelfPacker(self.size))
+            self.pixels = np.concatenate([self.pixels, np.zeros((1, self.size[1], self.size[0], 4), dtype=np.uint8)])
+            #   The layers before keep their images where they are
+            self.place(imageName, len(self.packers) - 1, self.packers[-1].insert(padded.shape[1], padded.shape[0]))
+        else:
+            width, height = self.size
+            while True:
+                if width <= height:
+                    width *= 2
+                else:
+                    height *= 2
+                if max(width, height) > self.max_size:
+                    raise ValueError("The atlas cannot grow past {} texels".format(self.max_size))
+                self.size = (width, height)
+                if self.repack():
+                    break
+        self.replace_texture()
+
+    def repack(self) -> bool:
+        """
+            Packs every image again, tallest first, which also frees the room of removed ones.
+            Returns whether they all fit; the array adds layers until they do.
+        """
+        packers = [ShelfPacker(self.size)]
+        positions: dict[str, tuple[int, tuple[int, int]]] = {}
+        for image_name in sorted(self.images, key=lambda name: -self.images[name].shape[0]):
+            height, width = self.images[image_name].shape[:2]
+            for layer, packer in enumerate(packers):
+                position = packer.insert(width, height)
+                if position is not None:
+                    break
+            else:
+                if not self.is_array:
+                    return False
+                packers.append(ShelfPacker(self.size))
+                layer, position = len(packers) - 1, packers[-1].insert(width, height)
+            positions[image_name] = (layer, position)
+
+        self.packers = packers
+        self.pixels = np.zeros((len(packers), self.size[1], self.size[0], 4), dtype=np.uint8)
+        self.regions.clear()
+        for image_name, (layer, position) in positions.items():
+            self.place(image_name, layer, position)
+        return True
+
+    def remove(self, imageName: str) -> None:
+        """
+            Frees the image's room by repacking the rest; its index is not given to another image.
+            When the rest no longer fit packed anew, they stay where they are and only the image's
+            rectangle is cleared; its room is freed by the next repack that fits.
+        """
+        padded = self.images.pop(imageName)
+        self.image_sizes.pop(imageName)
+        self.indices.pop(imageName)
+        region = self.regions.pop(imageName)
+        if self.repack():
+            self.replace_texture()
+        else:
+            cleared = np.zeros_like(padded)
+            position = (region.rect[0] - self.padding, region.rect[1] - self.padding)
+            self.pixels[region.layer, position[1]:position[1] + padded.shape[0], position[0]:position[0] + padded.shape[1]] = cleared
+            self.write_rect(region.layer, position, cleared)
+        self.write_lookup()
+
+    def replace_texture(self) -> None:
+        self.texture.release()
+        self.texture = self.create_texture()
+
+    def write_lookup(self) -> None:
+        """Rewrites the lookup table; it is a few texels per image"""
+        capacity = self.lookup.shape[1]
+        if self.next_index > capacity:
+            while self.next_index > capacity:
+                capacity *= 2
+            self.lookup = np.zeros((2, capacity, 4), dtype=np.float32)
+            self.lookup_texture.release()
+            self.lookup_texture = self.create_lookup_texture()
+        self.lookup.fill(0.0)
+        for region in self.regions.values():
+            self.lookup[0, region.index] = region.uv_rect
+            self.lookup[1, region.index] = (region.layer, region.rect[2], region.rect[3], 0.0)
+        self.lookup_texture.write(self.lookup.tobytes())
+
+    def get_region(self, imageName: str) -> AtlasRegion:
+        return self.regions[imageName]
+
+    def use(self, location=0) -> None:
+        self.texture.use(location=location)
+
+    def release(self) -> None:
+        self.texture.release()
+        self.lookup_texture.release()
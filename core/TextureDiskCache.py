@@ -0,0 +1,146 @@
+"""
+    This is the on-disk cache of decoded textures.
+    The first load of an image decodes it and flips it, then stores its raw pixels in a `.npy` file
+    with a small `.json` beside it. Later loads memory-map that file, so nothing is decoded and the
+    GPU upload reads straight from the mapped pages. Mip levels are not stored: uploads build theirs
+    on the GPU, and VirtualTexture makes its own.
+
+    Entries are keyed by the image's path, mtime and load flags; an edited image gets a new entry
+    and the entries of its older versions are removed. The cache keeps to a byte budget by removing
+    the least recently loaded entries; loading an entry marks it used by touching its file.
+"""
+
+from . import np
+from dataclasses import dataclass
+import hashlib
+import json
+import os
+import threading
+
+from . import TYPE_CHECKING
+if TYPE_CHECKING:
+    from .Texture import DecodedImage
+
+
+@dataclass(frozen=True, slots=True)
+class CacheEntry:
+    """Where an image's entry is and the flags it was made with"""
+    name: str
+    source: str
+    mtime: float
+    flags: str
+
+
+class TextureDiskCache:
+    def __init__(self, cacheDir="", maxBytes=2 * 1024 ** 3):
+        self.cache_dir = cacheDir or os.path.join(os.path.expanduser("~"), ".cache", "DejiArts", "textures")
+        os.makedirs(self.cache_dir, exist_ok=True)
+        #   See `prune`
+        self.max_bytes = maxBytes
+        #   Entries are stored from the decode threads
+        self.prune_lock = threading.Lock()
+
+    def get_entry(self, path: str, flags: str) -> CacheEntry:
+        source = os.path.abspath(path)
+        mtime = os.path.getmtime(path)
+        name = hashlib.sha1("{}\0{}\0{}".format(source, mtime, flags).encode()).hexdigest()
+        return CacheEntry(name, source, mtime, flags)
+
+    def get_paths(self, entryName: str) -> tuple[str, str]:
+        base = os.path.join(self.cache_dir, entryName)
+        return base + ".npy", base + ".json"
+
+    def load(self, entry: CacheEntry) -> 'DecodedImage | None':
+        """The cached image, mapped from disk; None when there is no valid entry"""
+        from .Texture import DecodedImage
+        data_path, meta_path = self.get_paths(entry.name)
+        try:
+            with open(meta_path) as f_stream:
+                meta = json.load(f_stream)
+            if meta['source'] != entry.source or meta['mtime'] != entry.mtime or meta['flags'] != entry.flags:
+                return None
+            mapped = np.load(data_path, mmap_mode='r')
+            #   Its mtime is when it was last used; see `prune`
+            os.utime(data_path)
+        except (OSError, ValueError, KeyError):
+            return None
+
+        width, height = meta['size']
+        components = meta['components']
+        if mapped.size != width * height * components:
+            return None
+        return DecodedImage((width, height), components, mapped)
+
+    def store(self, entry: CacheEntry, decoded: 'DecodedImage') -> 'DecodedImage':
+        """Writes the entry and returns the image"""
+        data_path, meta_path = self.get_paths(entry.name)
+        #   Written aside then moved in place, so a reader never maps half a file
+        suffix = ".{}-{}.tmp".format(os.getpid(), threading.get_ident())
+        with open(data_path + suffix, "wb") as f_stream:
+            np.save(f_stream, np.frombuffer(decoded.data, dtype=np.uint8))
+        with open(meta_path + suffix, "w") as f_stream:
+            json.dump({'source': entry.source, 'mtime': entry.mtime, 'flags': entry.flags,
+                       'size': list(decoded.size), 'components': decoded.components}, f_stream)
+        os.replace(data_path + suffix, data_path)
+        os.replace(meta_path + suffix, meta_path)
+        self.prune(entry)
+
+        return decoded
+
+    def get_or_decode(self, path: str, flags: str, decode) -> 'DecodedImage':
+        """`decode()` makes the DecodedImage when the entry is missing; it can run on any thread"""
+        entry = self.get_entry(path, flags)
+        cached = self.load(entry)
+        if cached is not None:
+            return cached
+        return self.store(entry, decode())
+
+    def prune(self, keptEntry: CacheEntry) -> None:
+        """
+            Removes the entries of older versions of the kept entry's image, then the least
+            recently used entries until the cache takes at most `max_bytes`. The kept entry,
+            just stored, is never removed.
+        """
+        with self.prune_lock:
+            entries: list[tuple[float, int, str]] = []
+            total_bytes = 0
+            for file_name in os.listdir(self.cache_dir):
+                if not file_name.endswith(".json"):
+                    continue
+                entry_name = file_name[:-len(".json")]
+                data_path, meta_path = self.get_paths(entry_name)
+                try:
+                    with open(meta_path) as f_stream:
+                        meta = json.load(f_stream)
+                    last_used = os.path.getmtime(data_path)
+                    entry_bytes = os.path.getsize(data_path) + os.path.getsize(meta_path)
+                except (OSError, ValueError):
+                    #   Removed meanwhile, or being replaced
+                    continue
+                if entry_name == keptEntry.name:
+                    total_bytes += entry_bytes
+                elif meta.get('source') == keptEntry.source and meta.get('mtime') != keptEntry.mtime:
+                    self.remove(entry_name)
+                else:
+                    entries.append((last_used, entry_bytes, entry_name))
+                    total_bytes += entry_bytes
+
+            entries.sort()
+            for _, entry_bytes, entry_name in entries:
+                if total_bytes <= self.max_bytes:
+                    break
+                self.remove(entry_name)
+                total_bytes -= entry_bytes
+
+    def remove(self, entryName: str) -> None:
+        for path in self.get_paths(entryName):
+            try:
+                os.remove(path)
+            except OSError:
+                #   Already removed, or mapped by a process that forbids it
+                pass
+
+    def clear(self) -> None:
+        for file_name in os.listdir(self.cache_dir):
+            if file_name.endswith((".npy", ".json")):
+                os.remove(os.path.join(self.cache_dir, file_name))
@@ -0,0 +1,64 @@
+"""
+    This hands out the texture units of a context and remembers what is bound to each.
+
+    Every texture name (or other key) keeps the unit it was given, so samplers in different
+    Entities no longer share a unit by accident, and a texture already bound to its unit
+    is not bound again. When every unit is taken, the least recently bound key gives its unit up.
+
+    Anything that binds textures should do it through here; a `.use()` made elsewhere
+    must be followed by `invalidate`, or the bindings remembered here are wrong.
+"""
+
+from . import mgl
+from .Profiler import Profiler
+from collections import OrderedDict
+
+
+class TextureUnits:
+    def __init__(self, ctxRef: mgl.Context):
+        self.ctx_ref = ctxRef
+        #   Moderngl binds textures to its default unit (the last one) to write them and build
+        #   their mipmaps, so that one is never handed out
+        self.unit_count = ctxRef.info['GL_MAX_COMBINED_TEXTURE_IMAGE_UNITS'] - 1
+        #   key -> unit, the least recently bound first
+        self.units: OrderedDict[str, int] = OrderedDict()
+        self.free_units: list[int] = list(range(self.unit_count - 1, -1, -1))
+        #   What is bound to each unit, as far as it is known
+        self.bound: list[mgl.Texture | None] = [None] * self.unit_count
+
+    def get_unit(self, key: str) -> int:
+        """The key's unit; the same one every call while the key holds it"""
+        unit = self.units.get(key)
+        if unit is not None:
+            self.units.move_to_end(key)
+            return unit
+        if self.free_units:
+            unit = self.free_units.pop()
+        else:
+            _, unit = self.units.popitem(last=False)
+        self.units[key] = unit
+        return unit
+
+    def bind(self, key: str, texture: mgl.Texture) -> int:
+        """Binds the texture to the key's unit, unless it is bound there already, and returns the unit"""
+        unit = self.get_unit(key)
+        if self.bound[unit] is not texture:
+            texture.use(location=unit)
+            self.bound[unit] = texture
+            Profiler().count('texture_binds')
+        return unit
+
+    def free(self, key: str) -> None:
+        unit = self.units.pop(key, None)
+        if unit is not None:
+            self.bound[unit] = None
+            self.free_units.append(unit)
+
+    def invalidate(self) -> None:
+        """Forgets the bindings, so every texture is bound again on its next `bind`"""
+        self.bound = [None] * self.unit_count
+
+    def release(self) -> None:
+        self.units.clear()
+        self.free_units = list(range(self.unit_count - 1, -1, -1))
+        self.invalidate()
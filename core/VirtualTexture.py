@@ -0,0 +1,198 @@
+"""
+    This is the virtual texture, for images too large to upload whole, or too wasteful to:
+    photos past GL_MAX_TEXTURE_SIZE, or of many more texels than the window has pixels.
+
+    The image and its mip levels, made when it is loaded, stay on the CPU (the image is mapped
+    from the disk cache when it is enabled) cut into square tiles.
+    Only the tiles in view, at the mip level the output resolution needs,
+    are uploaded into slots of a fixed-size page cache texture, so the VRAM it takes is bounded
+    whatever the image's size. Tiles out of view are evicted, least recently used first.
+
+    Shaders find each tile through the indirection texture: one texel per tile of the full image,
+    naming the cache slot and level of the finest tile resident there. Tiles still to be uploaded
+    show a coarser one meanwhile; the single tile of the coarsest level is always resident.
+    `virtual_texture.glsl` has the function that reads it.
+"""
+
+from . import mgl
+from . import np
+from .Profiler import Profiler
+from collections import OrderedDict
+import math
+
+from . import TYPE_CHECKING
+if TYPE_CHECKING:
+    from .Texture import DecodedImage
+
+
+def get_levels(decoded: 'DecodedImage', tileSize: int) -> list[np.ndarray]:
+    """
+        The image's levels as (height, width, 4) arrays, down to the first that fits in one tile.
+    """
+    width, height = decoded.size
+    level = np.frombuffer(decoded.data, dtype=np.uint8).reshape(height, width, 4)
+    levels = [level]
+    while level.shape[0] > tileSize or level.shape[1] > tileSize:
+        level = downsample(level)
+        levels.append(level)
+    return levels
+
+
+def downsample(level: np.ndarray) -> np.ndarray:
+    """The next mip level: each texel is the mean of a 2x2 block (an odd last row or column is dropped)"""
+    height, width, components = level.shape
+    block_height = 2 if height > 1 else 1
+    block_width = 2 if width > 1 else 1
+    new_height, new_width = height // block_height, width // block_width
+    blocks = level[:new_height * block_height, :new_width * block_width].astype(np.float32)
+    blocks = blocks.reshape(new_height, block_height, new_width, block_width, components)
+    return (blocks.mean(axis=(1, 3)) + 0.5).astype(np.uint8)
+
+
+class VirtualTexture:
+    def __init__(self, ctxRef: mgl.Context, levels: list[np.ndarray], tileSize=256, border=2, cacheSlots=(16, 16), maxUploadsPerUpdate=8):
+        self.ctx_ref = ctxRef
+        self.levels = levels
+        self.size = (levels[0].shape[1], levels[0].shape[0])
+        self.tile_size = tileSize
+        #   Texels around each tile copied from its neighbours, for linear filtering at its edges
+        self.border = border
+        self.slot_size = tileSize + 2 * border
+        max_size = ctxRef.info['GL_MAX_TEXTURE_SIZE']
+        self.cache_slots = (min(cacheSlots[0], max_size // self.slot_size), min(cacheSlots[1], max_size // self.slot_size))
+        #   Uploads are spread over frames so a new view never stalls one
+        self.max_uploads = maxUploadsPerUpdate
+        self.coarsest_level = len(levels) - 1
+        #   The tile grid of the full image; the indirection has a texel per tile
+        self.grid = self.get_tile_counts(0)
+
+        #   (level, tile x, tile y) -> its slot, least recently needed first
+        self.resident: OrderedDict[tuple[int, int, int], tuple[int, int]] = OrderedDict()
+        #   Per level, the slot of each of its tiles, or -1: (tiles y, tiles x, 2)
+        self.slot_maps = [np.full((*self.get_tile_counts(level)[::-1], 2), -1, dtype=np.int32) for level in range(len(levels))]
+        self.free_slots = [(x, y) for y in range(self.cache_slots[1]) for x in range(self.cache_slots[0])][::-1]
+
+        self.cache_texture = ctxRef.texture((self.cache_slots[0] * self.slot_size, self.cache_slots[1] * self.slot_size), 4)
+        self.cache_texture.filter = (mgl.LINEAR, mgl.LINEAR)
+        #   The last row describes the texture to shaders: image size, tile size and border, then the cache size
+        self.indirection = np.zeros((self.grid[1] + 1, max(self.grid[0], 2), 4), dtype=np.float32)
+        self.indirection[-1, 0] = (*self.size, tileSize, border)
+        self.indirection[-1, 1] = (*self.cache_texture.size, 0.0, 0.0)
+        self.indirection_texture = ctxRef.texture(self.indirection.shape[1::-1], 4, dtype='f4')
+        self.indirection_texture.filter = (mgl.NEAREST, mgl.NEAREST)
+
+        self.output_size = self.size
+        #   u, v, width, height of the part of the image in view
+        self.visible_rect = (0.0, 0.0, 1.0, 1.0)
+        self.shown_level = -1
+        self.upload_tile((self.coarsest_level, 0, 0), set())
+        self.write_indirection(self.coarsest_level)
+
+    def get_level_size(self, level: int) -> tuple[int, int]:
+        return self.levels[level].shape[1], self.levels[level].shape[0]
+
+    def get_tile_counts(self, level: int) -> tuple[int, int]:
+        width, height = self.get_level_size(level)
+        return math.ceil(width / self.tile_size), math.ceil(height / self.tile_size)
+
+    def set_view(self, outputSize: tuple[int, int], visibleRect: tuple[float, float, float, float] = (0.0, 0.0, 1.0, 1.0)) -> None:
+        """`outputSize` is the pixels the `visibleRect` of the image is drawn over"""
+        self.output_size = outputSize
+        self.visible_rect = visibleRect
+
+    def select_level(self) -> int:
+        """
+            The level with about one texel per output pixel, or a coarser one
+            when its tiles in view would not all fit in the cache.
+        """
+        u, v, width, height = self.visible_rect
+        texels_per_pixel = max(self.size[0] * width / max(self.output_size[0], 1),
+                               self.size[1] * height / max(self.output_size[1], 1))
+        level = min(int(math.floor(math.log2(max(texels_per_pixel, 1.0)))), self.coarsest_level)
+        #   One slot always holds the coarsest tile
+        while level < self.coarsest_level and len(self.get_visible_tiles(level)) > self.cache_slots[0] * self.cache_slots[1] - 1:
+            level += 1
+        return level
+
+    def get_visible_tiles(self, level: int) -> list[tuple[int, int, int]]:
+        u, v, width, height = self.visible_rect
+        level_width, level_height = self.get_level_size(level)
+        tiles_x, tiles_y = self.get_tile_counts(level)
+        x0 = min(max(int(u * level_width // self.tile_size), 0), tiles_x - 1)
+        y0 = min(max(int(v * level_height // self.tile_size), 0), tiles_y - 1)
+        x1 = min(max(math.ceil((u + width) * level_width / self.tile_size), x0 + 1), tiles_x)
+        y1 = min(max(math.ceil((v + height) * level_height / self.tile_size), y0 + 1), tiles_y)
+        return [(level, x, y) for y in range(y0, y1) for x in range(x0, x1)]
+
+    def update(self) -> None:
+        """Uploads some of the tiles in view that are missing; called once a frame by the TextureManager"""
+        level = self.select_level()
+        needed = self.get_visible_tiles(level)
+        for key in needed:
+            if key in self.resident:
+                self.resident.move_to_end(key)
+        missing = [key for key in needed if key not in self.resident]
+        if not missing and level == self.shown_level:
+            return
+        kept = set(needed)
+        for key in missing[:self.max_uploads]:
+            self.upload_tile(key, kept)
+        self.write_indirection(level)
+
+    def upload_tile(self, key: tuple[int, int, int], kept: set) -> None:
+        """Into a free slot, or the slot of the least recently needed tile not in `kept`"""
+        if self.free_slots:
+            slot = self.free_slots.pop()
+        else:
+            evicted = next(k for k in self.resident if k not in kept and k[0] != self.coarsest_level)
+            slot = self.resident.pop(evicted)
+            self.slot_maps[evicted[0]][evicted[2], evicted[1]] = -1
+        level, tile_x, tile_y = key
+        self.cache_texture.write(self.get_tile_pixels(level, tile_x, tile_y),
+                                 viewport=(slot[0] * self.slot_size, slot[1] * self.slot_size, self.slot_size, self.slot_size))
+        Profiler().count('texture_uploads')
+        self.resident[key] = slot
+        self.slot_maps[level][tile_y, tile_x] = slot
+
+    def get_tile_pixels(self, level: int, tileX: int, tileY: int) -> np.ndarray:
+        """The tile with its border; past the image's edges its edge texels are repeated"""
+        image = self.levels[level]
+        height, width = image.shape[:2]
+        x0 = tileX * self.tile_size - self.border
+        y0 = tileY * self.tile_size - self.border
+        x1, y1 = x0 + self.slot_size, y0 + self.slot_size
+        region = image[max(y0, 0):min(y1, height), max(x0, 0):min(x1, width)]
+        return np.pad(region, ((max(0, -y0), max(0, y1 - height)), (max(0, -x0), max(0, x1 - width)), (0, 0)), mode='edge')
+
+    def write_indirection(self, level: int) -> None:
+        """
+            Points every tile of the full image at the finest resident tile covering its centre,
+            from `level` up. virtual_texture.glsl finds that tile from the centre the same way.
+        """
+        grid_x, grid_y = self.grid
+        centre_u = (np.arange(grid_x) + 0.5) * self.tile_size / self.size[0]
+        centre_v = (np.arange(grid_y) + 0.5) * self.tile_size / self.size[1]
+        entries = self.indirection[:grid_y, :grid_x]
+        found = np.zeros((grid_y, grid_x), dtype=bool)
+        for coarser_level in range(level, self.coarsest_level + 1):
+            level_width, level_height = self.get_level_size(coarser_level)
+            tiles_x, tiles_y = self.get_tile_counts(coarser_level)
+            tile_x = np.minimum((centre_u * level_width // self.tile_size).astype(np.int32), tiles_x - 1)
+            tile_y = np.minimum((centre_v * level_height // self.tile_size).astype(np.int32), tiles_y - 1)
+            slots = self.slot_maps[coarser_level][tile_y[:, None], tile_x[None, :]]
+            hit = (slots[..., 0] >= 0) & ~found
+            entries[hit, 0] = slots[hit, 0]
+            entries[hit, 1] = slots[hit, 1]
+            entries[hit, 2] = coarser_level
+            entries[hit, 3] = 1.0
+            found |= hit
+        self.indirection_texture.write(self.indirection.tobytes())
+        self.shown_level = level
+
+    def get_cache_bytes(self) -> int:
+        """The VRAM it takes, whatever the image's size"""
+        return self.cache_texture.width * self.cache_texture.height * 4 + self.indirection.nbytes
+
+    def release(self) -> None:
+        self.cache_texture.release()
+        self.indirection_texture.release()
@@ -16,8 +16,9 @@
 from .. import np
 from .. import pg
 from .. import mgl
-from ..scripts_core.shader_core.VertexBuffer import BaseVertexBufferObject
+from ..scripts_core.shader_core.VertexBuffer import BaseVertexBufferObject, InstanceBuffer
 from ..scripts_core.Scripts import Script
+from ..Profiler import Profiler
 
 # from .. import TYPE_CHECKING
 # if TYPE_CHECKING:
@@ -34,76 +35,160 @@ class ShaderEntity(BaseVertexBufferObject):
         self.vao_manager_ref = scriptRef.canvas_ref.vao_manager
         self.vbo_manager_ref = self.vao_manager_ref.vbo_manager
         self.shaders_program_ref = scriptRef.canvas_ref.vao_manager.shader_programs
+        self.shader_watcher_ref = scriptRef.canvas_ref.shader_watcher
         # self.program = self.vao_manager_ref
+        replaced = self.vbo_manager_ref.vertex_buffer_objects.get(modelName)
         #   This creates the entity's vbo and adds it to the vbo manager.
         super().__init__(self.ctx_ref, modelName, self.vbo_manager_ref, format, attributes, isDynamic)
+        if replaced is not None and replaced.vbo is not self.vbo:
+            #   The VBO it replaced was released; so are the VAOs made from it
+            self.vao_manager_ref.forget_layouts(buffer=replaced.vbo)
+            self.vao_manager_ref.release_cached_vaos(modelName)
         #   Now the program also is created, and the vao_manager knows this.
-        self.shaders_program_ref.add_program(shadersProgramName, vertexShaderName, fragmentShaderName)
+        #   Through the watcher, so other Entities of the program are moved to it if it changed
+        self.shader_watcher_ref.add_program(shadersProgramName, vertexShaderName, fragmentShaderName)
+        scriptRef.program_names.append(shadersProgramName)
+        scriptRef.entities.append(self)
         #   Finally, the vao manager is created
         self.vao_manager_ref.add_vao(
             modelName, shadersProgramName
         )
         self.model_name = modelName
+        #   The program drawn with; a variant of the base program after `set_variant`
         self.shaders_name = shadersProgramName
+        self.base_shaders_name = shadersProgramName
+        #   Variants already added by this Entity
+        self.variant_names: set[str] = {shadersProgramName}
         # self.textureName = ""
         #   This is the vao program that refers to the shaders; with it I can
         #   make uniforms, and such
         self.entity_program = self.vao_manager_ref.vertex_array_objects[modelName].program
 
         self.texture_manager_ref = scriptRef.canvas_ref.textures_manager
-        self.print_count = 0
+        self.texture_units_ref = scriptRef.canvas_ref.designer_ref.engine_ref.texture_units
+        self.profiler_ref = Profiler()
+        #   Uniform writes wait here until the Entity is drawn; see flush_uniforms
+        self.program_uniforms = self.shaders_program_ref.get_uniforms(shadersProgramName)
+        self.uniform_values: dict[str, tuple[object, bool]] = {}
+        self.pending_uniforms: set[str] = set()
+        #   Each is only warned about once
+        self.unknown_uniforms: set[str] = set()
+        #   Rebound whenever the program is replaced
+        self.bound_textures: list[str] = []
+        #   Its program is recompiled when its shader files are saved
+        self.shader_watcher_ref.watch(self)
 
     def reload_shader(self, vertexShaderName, fragmentShaderName, isDynamic=False, texturesForRebind=[]) -> None:
         """
             Code to Reload Shader Dynamically!
             Added: 1st December - 5th December, 2025
+
+            Nothing is done when the shader sources have not changed.
+            Shader files are also reloaded on their own when saved; see the ShaderWatcher.
+            Only the program and VAO are replaced, so `isDynamic` is no longer used.
+            The new sources are validated out of process first, so the reload lands a few frames later;
+            on a compile error the last good program is kept.
         """
-        #   delete already existing shader and vao using vao_manager!
-        #   vao_manager deletes the shader too!
-        self.vao_manager_ref.destroy(self.model_name, self.shaders_name)
-        #   delete texture
-        # if len(texturesForRebind) > 0:
-        #     self.texture_manager_ref.release_these(texturesForRebind)
-        
-        #   create new vbo
-        self.vbo: mgl.Buffer = self.create_vbo(isDynamic)
-        self.vbo_manager_ref.add_vbo(self.model_name, self)
-        
-        #   create new shader, recompiling it
-        self.shaders_program_ref.add_program(self.shaders_name,
-                                            vertexShaderName=vertexShaderName,
-                                            fragmentShaderName=fragmentShaderName)
+        self.shader_watcher_ref.request_reload(self.shaders_name, vertexShaderName, fragmentShaderName, texturesForRebind)
 
-        #   create new vao
-        self.vao_manager_ref.add_vao(self.model_name, self.shaders_name)
+    def on_program_changed(self, texturesForRebind: list[str] = []) -> None:
+        """Called by the ShaderWatcher once this Entity's VAO has a new program"""
         self.entity_program = self.vao_manager_ref.vertex_array_objects[self.model_name].program
-
-        #   rebind textures from list of names - 5th December 2025
-        if len(texturesForRebind) > 0:
-            for tex_name in texturesForRebind:
+        self.program_uniforms = self.shaders_program_ref.get_uniforms(self.shaders_name)
+        self.unknown_uniforms.clear()
+        #   The new program starts with default values; give it the ones this Entity last set
+        self.pending_uniforms = {name for name in self.uniform_values if name in self.program_uniforms.handles}
+        for tex_name in dict.fromkeys([*self.bound_textures, *texturesForRebind]):
+            if tex_name in self.texture_manager_ref.textures and tex_name in self.program_uniforms.handles:
                 self.set_texture_uniform(tex_name)
 
 
+    def set_variant(self, defines: dict = None, constants: dict = None) -> None:
+        """
+            Draws with a variant of the Entity's program: `defines` are added as `#define`s
+            and `constants` turn those uniforms into constants, e.g. quality or iteration counts
+            that never change in a session, so the driver can fold them and unroll their loops.
+            Each variant is compiled the first time it is used; switching between them rebuilds nothing.
+            `set_variant()` goes back to the base program.
+        """
+        program_name = self.shaders_program_ref.get_variant_name(self.base_shaders_name, defines, constants)
+        if program_name == self.shaders_name:
+            return
+        if program_name not in self.variant_names:
+            try:
+                self.shader_watcher_ref.add_variant(self.base_shaders_name, defines, constants)
+            except Exception as e:
+                print("Shader Error in variant '{}', keeping the current program:\n{}".format(program_name, str(e)))
+                return
+            self.parent_script.program_names.append(program_name)
+            self.variant_names.add(program_name)
+
+        self.vao_manager_ref.switch_program(self.model_name, program_name)
+        self.shaders_name = program_name
+        self.on_program_changed()
+        #   Scripts may still set the uniforms that became constants; that is not an error
+        self.unknown_uniforms.update(constants or {})
+
     def set_uniform(self, uName, uValue):
-        try:
-            self.entity_program[uName] = uValue
-        except KeyError as e:
-            if self.print_count <= 0:
-                print("Uniform Error: ", str(e))
-            if (self.print_count <= 1):
-                self.print_count += 1
+        """The value is written when the Entity is next drawn, and only if it changed"""
+        if uName not in self.program_uniforms.handles:
+            self.warn_unknown_uniform(uName)
+            return
+        self.uniform_values[uName] = (uValue, False)
+        self.pending_uniforms.add(uName)
 
     def get_uniform_location(self, uName):
-        return self.entity_program[uName].location
+        return self.program_uniforms.handles[uName].location
 
     def set_complex_uniform(self, uName, uValue):
+        """For values written as bytes, like glm matrices"""
+        if uName not in self.program_uniforms.handles:
+            self.warn_unknown_uniform(uName)
+            return
+        self.uniform_values[uName] = (uValue, True)
+        self.pending_uniforms.add(uName)
+
+    def warn_unknown_uniform(self, uName):
+        if uName not in self.unknown_uniforms:
+            self.unknown_uniforms.add(uName)
+            print("Uniform Error: '{}' is not an active uniform of '{}'".format(uName, self.shaders_name))
+
+    def flush_uniforms(self):
+        """
+            Writes the uniforms set since the Entity was last drawn.
+            Values the program already holds are skipped; the program may be shared,
+            so they are compared against what was last written to it, by anyone.
+            When another Entity wrote to it since, all of this Entity's values are written
+            again, or it would be drawn with the values the other one set.
+        """
+        handles = self.program_uniforms.handles
+        written = self.program_uniforms.values
+        if self.program_uniforms.last_writer is not self:
+            self.pending_uniforms = {name for name in self.uniform_values if name in handles}
+            self.program_uniforms.last_writer = self
+        for uName in self.pending_uniforms:
+            value, is_complex = self.uniform_values[uName]
+            if is_complex:
+                value = bytes(value)
+            elif isinstance(value, list):
+                #   A copy, in case the Script changes the list in place
+                value = tuple(value)
+            if uName in written and self.is_same_value(written[uName], value):
+                continue
+            if is_complex:
+                handles[uName].write(value)
+            else:
+                handles[uName].value = value
+            written[uName] = value
+        self.pending_uniforms.clear()
+
+    @staticmethod
+    def is_same_value(a, b) -> bool:
         try:
-            self.entity_program[uName].write(uValue)
-        except KeyError as e:
-            if self.print_count <= 0:
-                print("Uniform Error: ", str(e))
-            if (self.print_count <= 1):
-                self.print_count += 1
+            return bool(a == b)
+        except ValueError:
+            #   e.g. NumPy arrays; just write them
+            return False
 
 
     def order_vertex_data(self):...
@@ -112,8 +197,35 @@ class ShaderEntity(BaseVertexBufferObject):
     #     return super().create_vbo()
 
     def render(self):...
+
+    def render_vao(self, **kwargs):
+        """
+            Every Entity's render goes through this, so that its
+            draw call is counted and its GPU time measured when profiling.
+        """
+        self.bind_textures()
+        self.flush_uniforms()
+        with self.profiler_ref.gpu_scope(self.model_name):
+            self.vao_manager_ref.vertex_array_objects[self.model_name].render(**kwargs)
+        self.profiler_ref.count('draw_calls')
     
+    def bind_textures(self):
+        """
+            Binds the Entity's textures to their units before it is drawn, since other Entities
+            may have bound theirs since; those still bound are skipped by the TextureUnits.
+        """
+        textures = self.texture_manager_ref.textures
+        for texture_name in self.bound_textures:
+            texture = textures.get(texture_name)
+            if texture is None:
+                continue
+            unit = self.texture_units_ref.bind(texture_name, texture)
+            if self.uniform_values.get(texture_name) != (unit, False):
+                self.set_uniform(texture_name, unit)
+
     def destroy(self):
+        self.shader_watcher_ref.unwatch(self)
+        self.vao_manager_ref.forget_layouts(buffer=self.vbo)
         super().destroy() # Releases its mgl.Buffer (vbo) memory
         # self.texture_manager_ref.release(self.textureName)
         # self.vao_manager_ref.destroy(self.model_name, self.shaders_name)
@@ -122,11 +234,56 @@ class ShaderEntity(BaseVertexBufferObject):
         self.texture_manager_ref.add_texture(textureName, texturePath, mode=mode, vFlip=vFlip)
         self.set_texture_uniform(textureName)
 
+    def add_texture_async(self, textureName: str, texturePath: str, mode=1, vFlip=True):
+        """
+            The image is decoded off the main thread; a placeholder is bound until it is uploaded.
+            Returns the TextureHandle, e.g. to read the image size once it is ready.
+        """
+        handle = self.texture_manager_ref.load_texture_async(textureName, texturePath, mode=mode, vFlip=vFlip)
+        self.set_texture_uniform(textureName)
+        handle.on_ready(lambda handle: self.set_texture_uniform(textureName))
+        return handle
+
+    def add_texture_cube_async(self, textureName: str, texturePath: str):
+        handle = self.texture_manager_ref.load_texture_cube_async(textureName, texturePath)
+        handle.on_ready(lambda handle: self.set_texture_uniform(textureName))
+        return handle
+
     def add_texture_from_pg_surface(self, textureName: str, surface: pg.Surface):
         """This is for Pygame Surfaces turned Moderngl Textures """
         self.texture_manager_ref.pg_surface_to_mg_texture(textureName, surface)
         self.set_texture_uniform(textureName)
     
+    def write_texture_from_pg_surface(self, textureName: str, surface: pg.Surface, dirtyRects: list[pg.Rect] = None):
+        """
+            For Pygame Surfaces drawn on every frame: the texture is made once and then rewritten,
+            only where `dirtyRects` say it changed. Nothing needs removing after rendering.
+        """
+        if self.texture_manager_ref.write_streaming_texture(textureName, surface, dirtyRects):
+            self.set_texture_uniform(textureName)
+
+    def add_atlas_texture(self, atlasName: str, imageName: str, texturePath: str, vFlip=True) -> int:
+        """
+            Packs the image into the atlas, whose texture and "<atlas name>_lookup" are bound
+            however many images it holds. Returns the index shaders read the image at.
+        """
+        region = self.texture_manager_ref.add_to_atlas(atlasName, imageName, texturePath, vFlip=vFlip)
+        self.set_texture_uniform(atlasName)
+        self.set_texture_uniform(atlasName + "_lookup")
+        return region.index
+
+    def add_virtual_texture(self, textureName: str, texturePath: str, vFlip=True, tileSize=256):
+        """
+            For images larger than a texture can be: only the tiles in view are uploaded,
+            at the level the Canvas's resolution needs. Shaders read it with `vt_texture`
+            from virtual_texture.glsl. Returns the VirtualTexture, e.g. to `set_view` when zooming.
+        """
+        virtual_texture = self.texture_manager_ref.add_virtual_texture(
+            textureName, texturePath, self.parent_script.canvas_ref.dimensions, vFlip=vFlip, tileSize=tileSize)
+        self.set_texture_uniform(textureName)
+        self.set_texture_uniform(textureName + "_indirection")
+        return virtual_texture
+
     def add_texture_cube(self, textureName: str, texturePath:str, vFlip=True):
         self.texture_manager_ref.add_texture_cube(textureName, texturePath)
         self.set_texture_uniform(textureName)
@@ -136,13 +293,18 @@ class ShaderEntity(BaseVertexBufferObject):
             This can be called continually if the texture changes during runtime
             but is ideally called once
         """
-        loc = self.get_uniform_location(textureName)
-        self.set_uniform(textureName, loc)
-        self.texture_manager_ref.textures[textureName].use(location=loc)
+        texture = self.texture_manager_ref.textures[textureName]
+        #   The unit is the texture's own, from the TextureUnits, so other Entities cannot take it
+        self.set_uniform(textureName, self.texture_units_ref.bind(textureName, texture))
+        if textureName not in self.bound_textures:
+            self.bound_textures.append(textureName)
 
 
     def remove_texture(self, textureName: str):
         self.texture_manager_ref.release(textureName)
+        self.texture_units_ref.free(textureName)
+        if textureName in self.bound_textures:
+            self.bound_textures.remove(textureName)
         
 
 """
@@ -169,7 +331,7 @@ class MglSurfaceEntity(ShaderEntity):
     
 
     def render(self):
-        self.vao_manager_ref.vertex_array_objects[self.model_name].render()
+        self.render_vao()
 
 
     def prepare_vertex_data(self):
@@ -209,7 +371,7 @@ class MglCubeEntity(ShaderEntity):
     
     
     def render(self):
-        self.vao_manager_ref.vertex_array_objects[self.model_name].render()
+        self.render_vao()
         
 
     @staticmethod
@@ -224,6 +386,11 @@ class MglCubeEntity(ShaderEntity):
             of Entity.
             It is basically a square surface that renders a Texture.
         """
+        return self.get_cube_data(self.with_normals, self.with_texture)
+
+    @classmethod
+    def get_cube_data(cls, withNormals=False, withTexture=False):
+        """The cube's vertex data; the instanced Entity draws it by default too"""
         ##  Cube's points' coordinates
         vertices = [(-1, -1, 1), (1, -1, 1), (1, 1, 1), (-1, 1, 1),
                     (-1, 1, -1), (-1, -1, -1), (1, -1, -1), (1, 1, -1)]
@@ -236,7 +403,7 @@ class MglCubeEntity(ShaderEntity):
                    (3, 7, 4), (3, 2, 7),
                    (0, 6, 1), (0, 5, 6)]
 
-        vertex_data = self.get_data(vertices, indices)
+        vertex_data = cls.get_data(vertices, indices)
         #   Texture coordinates
         tex_coord_vertices = [(0, 0), (1, 0), (1, 1), (0, 1)]
         ##  All 12 triangles from which the cube model formed
@@ -246,7 +413,7 @@ class MglCubeEntity(ShaderEntity):
                              (2, 3, 0), (2, 0, 1),
                              (0, 2, 3), (0, 1, 2),
                              (3, 1, 2), (3, 0, 1)]
-        tex_coord_data = self.get_data(tex_coord_vertices, tex_coord_indices)
+        tex_coord_data = cls.get_data(tex_coord_vertices, tex_coord_indices)
 
         ##  Because cubes have 6 faces, they have 6 normals:
         #   Because each face has 3 triangles, each triangle has 3 vertices
@@ -259,15 +426,15 @@ class MglCubeEntity(ShaderEntity):
                 (0, -1, 0) * 6]
         normals = np.array(normals, dtype='f4').reshape(36, 3)
 
-        if self.with_normals and self.with_texture:
+        if withNormals and withTexture:
             #   stacked horizontally in order vertex data, normals, tex_coord
             #   3f 3f 2f
             vertex_data = np.hstack([vertex_data, normals])
             #  Combine vertex and texture coordinate data
             vertex_data = np.hstack([vertex_data, tex_coord_data])
-        elif self.with_texture:
+        elif withTexture:
             vertex_data = np.hstack([vertex_data, tex_coord_data])
-        elif self.with_normals:
+        elif withNormals:
             vertex_data = np.hstack([vertex_data, normals])
 
         return vertex_data
@@ -289,7 +456,7 @@ class MglAdvancedSkyBox(ShaderEntity):
 
     
     def render(self):
-        self.vao_manager_ref.vertex_array_objects[self.model_name].render()
+        self.render_vao()
  
     
     def prepare_vertex_data(self):
@@ -306,3 +473,48 @@ class MglAdvancedSkyBox(ShaderEntity):
         vertex_data = np.array(vertex_data, dtype='f4')
         return vertex_data
     
+
+
+class MglInstancedEntity(ShaderEntity):
+    """
+        Draws many copies of one mesh with a single instanced draw call.
+        Each copy's own values, like its model matrix and color, are per-instance attributes
+        in the InstanceBuffer, not uniforms; the vertex shader declares them as inputs:
+            in mat4 a_ModelMat;
+            in vec4 a_Color;
+        `set_instances` rewrites them all from a NumPy array, one row per instance.
+        The mesh is a cube unless `vertexData` is given with its `v_format` and `attributes`.
+    """
+    def __init__(self, scriptRef: Script, modelName: str, shadersProgamName: str, v_format="", attributes:list[str] = [], vertexShaderName="", fragmentShaderName="", isDynamic=False, vertexData: np.ndarray = None, instanceFormat="16f 4f", instanceAttributes: list[str] = []):
+        self.format = v_format if v_format else "3f 2f"
+        self.attributes = attributes if len(attributes) > 0 else ["a_VertexPosition", "a_TexturePosition"]
+        self.vertex_data = vertexData if vertexData is not None else MglCubeEntity.get_cube_data(withTexture=True)
+        self.instance_buffer = InstanceBuffer(scriptRef.canvas_ref.ctx_ref, instanceFormat,
+                                              instanceAttributes if len(instanceAttributes) > 0 else ["a_ModelMat", "a_Color"])
+        #   The VAO is made in the super's __init__, so it has to know about the buffer first
+        scriptRef.canvas_ref.vao_manager.set_extra_buffers(modelName, [self.instance_buffer])
+        super().__init__(scriptRef, modelName, shadersProgamName, self.format, self.attributes, isDynamic=isDynamic, vertexShaderName=vertexShaderName, fragmentShaderName=fragmentShaderName)
+
+
+    def set_instances(self, instances: np.ndarray):
+        """
+            One row per instance, in the instance format; with the default '16f 4f' that is
+            a (count, 20) float32 array: the model matrix, column by column, then the color.
+            Written in one go; only the instances written are drawn.
+        """
+        self.instance_buffer.write(instances)
+
+    def render(self):
+        if self.instance_buffer.instance_count > 0:
+            self.render_vao(instances=self.instance_buffer.instance_count)
+
+
+    def prepare_vertex_data(self):
+        return self.vertex_data
+
+    def destroy(self):
+        self.vao_manager_ref.forget_layouts(buffer=self.instance_buffer.vbo)
+        if self.vao_manager_ref.extra_buffers.get(self.model_name) == [self.instance_buffer]:
+            self.vao_manager_ref.extra_buffers.pop(self.model_name)
+        self.instance_buffer.destroy()
+        super().destroy()
@@ -186,13 +186,20 @@ class HeavenlyLights:
         # self.mover = Mover(designer, 300, 150, 50)
         self.movers = [Mover(designer, pg.Vector2(rnd.uniform(0, self.designer_ref.HEIGHT),
                                                    rnd.uniform(0, self.designer_ref.HEIGHT)), rnd.uniform(50, 70)) for i in range(10)]
+        #   The movers move at the Engine's fixed update rate, whatever the frame rate
+        self.designer_ref.engine_ref.add_fixed_update(self.update_lights)
     
+    def update_lights(self, deltaTime=0):
+        """The movement only; a fixed update of the Engine"""
+        for mover in self.movers:
+            mover.update()
+            self.attractor.attract(mover)
+
     def generate_lights(self):
+        """The drawing only; the movers were moved by `update_lights`"""
         self.designer_ref.window.blit(self.alpha_surface, (0, 0))
         for mover in self.movers:
-            mover.update()
             mover.create()
-            self.attractor.attract(mover)
         self.attractor.create()
 
 class SpinningLights:
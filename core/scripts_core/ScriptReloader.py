@@ -0,0 +1,118 @@
+"""
+    This is the ScriptReloader; it hot reloads the Python modules of Scripts.
+
+    When the source file of a Script's module changes, the module is reloaded with importlib,
+    the Script is made again, from the new class and with the arguments it was first made with,
+    and it takes the old one's place in the Scene.
+
+    It is made while the Canvas is retaining resources, so the Entities the new Script
+    creates take up the textures, VBOs, programs and VAOs the old one already uploaded
+    (when they have the same names, sources and data) instead of making them all again.
+    The old Script's Entities the new one did not make again are then destroyed, and its programs
+    released, so only what the new Script uses stays.
+    If the new module fails to import or the Script fails to be made,
+    the error is printed and the old Script keeps running.
+"""
+
+from .. import TYPE_CHECKING
+import importlib
+import os
+import sys
+import time
+import traceback
+
+if TYPE_CHECKING:
+    from ..Scene import Scene
+    from .Scripts import Script
+
+
+class ScriptReloader:
+    def __init__(self, sceneRef: 'Scene', pollInterval=0.5):
+        self.scene_ref = sceneRef
+        self.poll_interval = pollInterval
+        self.last_poll_time = 0.0
+        #   module name -> mtime of its source file when last loaded
+        self.module_mtimes: dict[str, float] = {}
+
+    def get_module_path(self, moduleName: str) -> str:
+        module = sys.modules.get(moduleName)
+        return getattr(module, '__file__', None) or ""
+
+    def track(self, script: 'Script') -> None:
+        module_name = type(script).__module__
+        path = self.get_module_path(module_name)
+        if path and module_name not in self.module_mtimes:
+            self.module_mtimes[module_name] = os.path.getmtime(path)
+
+    def poll(self) -> None:
+        """Checks the Scripts' sources, at most every `poll_interval` seconds"""
+        now = time.monotonic()
+        if now - self.last_poll_time < self.poll_interval:
+            return
+        self.last_poll_time = now
+
+        for script in self.scene_ref.scripts.values():
+            self.track(script)
+
+        for module_name, mtime in list(self.module_mtimes.items()):
+            path = self.get_module_path(module_name)
+            if not path or not os.path.exists(path):
+                continue
+            new_mtime = os.path.getmtime(path)
+            if new_mtime != mtime:
+                self.module_mtimes[module_name] = new_mtime
+                self.reload_module(module_name)
+
+    def destroy_entities(self, script: 'Script', newScript: 'Script') -> None:
+        """Destroys the old Script's Entities whose models the new Script does not have"""
+        vao_manager = self.scene_ref.canvas_ref.vao_manager
+        kept_models = {entity.model_name for entity in newScript.entities}
+        for entity in script.entities:
+            if entity.model_name in kept_models:
+                continue
+            entity.shader_watcher_ref.unwatch(entity)
+            if vao_manager.vbo_manager.vertex_buffer_objects.get(entity.model_name) is entity:
+                #   Its VAOs, then its VBO through the Entity's own destroy
+                vao_manager.destroy(modelName=entity.model_name)
+        script.entities.clear()
+
+    def release_programs(self, script: 'Script') -> None:
+        """One `destroy` for each `add_program` of the Script's Entities"""
+        shader_programs = self.scene_ref.canvas_ref.vao_manager.shader_programs
+        for program_name in script.program_names:
+            if program_name in shader_programs.name_ref_counts:
+                shader_programs.destroy(program_name)
+        script.program_names.clear()
+
+    def reload_module(self, moduleName: str) -> None:
+        started = time.perf_counter()
+        try:
+            module = importlib.reload(sys.modules[moduleName])
+        except Exception:
+            print("Script Reload Error in {}; keeping the running Scripts:".format(moduleName))
+            traceback.print_exc()
+            return
+
+        canvas = self.scene_ref.canvas_ref
+        for script_name, script in list(self.scene_ref.scripts.items()):
+            if type(script).__module__ != moduleName:
+                continue
+            new_class = getattr(module, type(script).__name__, None)
+            if new_class is None:
+                print("Script Reload: {} no longer defines {}; keeping the old one".format(moduleName, type(script).__name__))
+                continue
+            args, kwargs = getattr(script, 'init_args', ((), {'canvasRef': canvas}))
+            try:
+                with canvas.retaining_resources():
+                    new_script = new_class(*args, **kwargs)
+            except Exception:
+                print("Script Reload Error making {}; keeping the old one:".format(script_name))
+                traceback.print_exc()
+                continue
+            self.scene_ref.add_script(script_name, new_script)
+            #   After the new Script is made, so the programs it adds again are not recompiled;
+            #   before its init phase, which runs on its first frame
+            self.destroy_entities(script, new_script)
+            self.release_programs(script)
+
+        print("Reloaded {} in {:.1f} ms".format(moduleName, (time.perf_counter() - started) * 1000))
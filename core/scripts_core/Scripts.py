@@ -9,10 +9,59 @@
 """
 
 from .. import TYPE_CHECKING
+from ..Profiler import Profiler
+import inspect
 
 if TYPE_CHECKING:
     from ..Canvas import Canvas
 
+
+"""
+    The phases of a frame, in the order they are run.
+    `init` methods run once, on a Script's first frame.
+"""
+PHASES = ('init', 'update', 'render', 'post_render')
+
+
+def script_method(phase: str = 'render', priority: int = 0):
+    """
+        Declares the phase a Script method runs in and its priority in that phase.
+        Lower priorities run first; methods of the same priority run in alphabetical order.
+        Can be used as `@script_method` or `@script_method('update', priority=-1)`.
+    """
+    if callable(phase):
+        return script_method()(phase)
+    if phase not in PHASES:
+        raise ValueError("Unknown Script phase '{}'; it must be one of {}".format(phase, PHASES))
+
+    def decorate(func):
+        func._script_phase = phase
+        func._script_priority = priority
+        return func
+    return decorate
+
+
+def _phase_decorator(phase: str):
+    def decorator(func=None, *, priority: int = 0):
+        if func is None:
+            return script_method(phase, priority)
+        return script_method(phase, priority)(func)
+    decorator.__name__ = "on_{}".format(phase)
+    decorator.__doc__ = "Runs the method in the '{}' phase; use with or without `(priority=...)`".format(phase)
+    return decorator
+
+on_init = _phase_decorator('init')
+on_update = _phase_decorator('update')
+on_render = _phase_decorator('render')
+on_post_render = _phase_decorator('post_render')
+
+
+def excluded(func):
+    """The method is never called by `run_all`; it is just a helper of the Script"""
+    func._script_excluded = True
+    return func
+
+
 class Script:
     """
         You can define as many methods in a script as
@@ -21,43 +70,99 @@ class Script:
         the reference to the canvas, and several methods that contain
         the code to produce a desired art.
 
-        Any method can be appended to the `excluded` list. These methods hence run once. In it you can specify anythin that
+        Methods are run in phases: see `PHASES`. Decorate them with `on_init`, `on_update`,
+        `on_render` or `on_post_render` to choose their phase and priority; undecorated methods
+        are in the render phase, in alphabetical order, as they always were.
+        `on_init` methods run once. In them you can specify anything that
         you want done that cannot be done in the __init__ method due to semantic reasons.
+
+        Helper methods that should not be run are marked with `@excluded`.
+        (Names in `excluded_methods` are also skipped, but only those there before the Script's
+        first frame, since the dispatch table is built then.)
     """
     excluded_methods = ['__init__', 'run_all']
     canvas_ref = None
+    #   Set by the Scene before the update phase; see Scene.FrameState
+    frame_state = None
+
+    def __new__(cls, *args, **kwargs):
+        instance = super().__new__(cls)
+        #   Remembered so the ScriptReloader can make the Script again
+        instance.init_args = (args, kwargs)
+        #   Its Entities and the programs they added, released when it is hot reloaded
+        instance.entities = []
+        instance.program_names = []
+        return instance
 
     def __init__(self, canvasReference: 'Canvas'):
         """Every Script should have access to these"""
         self.canvas_ref = canvasReference
+        self.has_run_init = False
+
+    @classmethod
+    def get_dispatch_table(cls) -> dict[str, list[tuple[str, str]]]:
+        """
+            For every phase, the (method name, profiler label) pairs to call, in order.
+            It is built once per Script class, on its first frame, and cached on that class.
+        """
+        table = cls.__dict__.get('_dispatch_table')
+        if table is not None:
+            return table
+
+        entries = {phase: [] for phase in PHASES}
+        for name in dir(cls):
+            #   Script's own methods, dunders and excluded names are never dispatched
+            if name.startswith('__') or hasattr(Script, name) or name in cls.excluded_methods:
+                continue
+            static_attr = inspect.getattr_static(cls, name)
+            func = static_attr.__func__ if isinstance(static_attr, classmethod) else static_attr
+            if not inspect.isfunction(func) or getattr(func, '_script_excluded', False):
+                continue
+            phase = getattr(func, '_script_phase', 'render')
+            priority = getattr(func, '_script_priority', 0)
+            entries[phase].append((priority, name))
+
+        table = {
+            phase: [(name, "{}.{}".format(cls.__name__, name)) for _, name in sorted(phase_entries)]
+            for phase, phase_entries in entries.items()
+        }
+        cls._dispatch_table = table
+        return table
+
+    def run_phase(self, phase: str):
+        """Calls, in order, the methods of one phase"""
+        profiler = Profiler()
+        for method, label in self.get_dispatch_table()[phase]:
+            #   call the method, timing it when profiling
+            with profiler.cpu_scope(label):
+                getattr(self, method)()
+
+    def run_init(self):
+        """Runs the init phase, but only the first time it is called"""
+        if not getattr(self, 'has_run_init', False):
+            self.has_run_init = True
+            self.run_phase('init')
 
-    
     def run_all(self):
         """
-            This looks at every method defined here
-            and calls it, effectively rendering whatever is in them.
+            This calls every method defined in the Script,
+            effectively rendering whatever is in them.
             The methods it calls must not have any parameters or take any argument besides self
 
             How it works:
-                For every attribute in this Class's instance...
-                if the value of that attribute, which is gotten by `getattr(A, B)` --- given that A is the instance
-                of the class, B is the member attribute and `getattr(A, B)` is equivalent to doing A.B
-                to access the value of that attribute with name B --- is a function object, meaning that
-                its class signature has the built-in attribute '__func__' (Note that all a class's members can be
-                printed out using `dir()` function), and the attribute name of this class is not '__init__' and is not
-                this function itself 'run_all', lest it causes recursion, then add the name of that attribute.
-                It is certainly a method. 
+                The first time a Script of this class runs, every method it defines is found and
+                put in the dispatch table under its phase (see `get_dispatch_table`).
+                After that, each frame just runs the phases in order; there is no looking
+                through `dir()` every frame.
             
             Furthermore:
-                The methods are arranged in the list in alphabetical order.
-                Hence, I am to ensure that methods I want to be run first are prefixed
-                appropriately to indicate the order.
+                Within a phase, methods are ordered by priority, then alphabetically.
+                So undecorated methods still run in alphabetical order, and
+                prefixes like `a_run_render` still work to make them run first.
         """
-        #   Get all methods' names
-        methods = [attr for attr in dir(self) if '__func__' in dir(getattr(self, attr)) and attr not in self.excluded_methods]
-        for method in methods:
-            #   call the method
-            getattr(self, method)()
+        self.run_init()
+        for phase in PHASES[1:]:
+            self.run_phase(phase)
 
 
 
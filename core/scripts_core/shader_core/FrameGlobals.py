@@ -0,0 +1,74 @@
+"""
+    This is the uniform block every program can share: the time, the frame index,
+    the resolution, the mouse and the camera.
+    The Engine writes it once per frame into one buffer, so they need not be set on every Entity.
+
+    A shader gets it with `#include "frame_globals.glsl"`; programs that declare the block
+    are bound to it when they are compiled.
+"""
+
+from ... import mgl
+from ... import np
+import os
+
+class FrameGlobals:
+    block_name: str = "FrameGlobals"
+    binding: int = 0
+    include_dir: str = os.path.join(os.path.dirname(__file__), "shader_include")
+    #   std140 offsets, in 4 byte words, of each member of the block
+    layout: dict[str, slice] = {
+        'time': slice(0, 1),
+        'index': slice(1, 2),
+        'resolution': slice(2, 4),
+        'mouse': slice(4, 6),
+        'view': slice(8, 24),
+        'proj': slice(24, 40),
+        'inv_proj_view': slice(40, 56),
+        'camera_position': slice(56, 60),
+    }
+    size: int = 60 * 4
+
+    def __init__(self, ctxRef: mgl.Context):
+        self.ctx_ref = ctxRef
+        self.data = np.zeros(self.size // 4, dtype='f4')
+        #   The frame index is an int; it is written through this view of the same memory
+        self.int_data = self.data.view('i4')
+        identity = np.identity(4, dtype='f4').reshape(-1)
+        for name in ('view', 'proj', 'inv_proj_view'):
+            self.data[self.layout[name]] = identity
+        self.buffer = self.ctx_ref.buffer(reserve=self.size, dynamic=True)
+
+    @classmethod
+    def bind_program(cls, program: mgl.Program) -> None:
+        """Points the program's FrameGlobals block, if it has one, at the shared buffer"""
+        block = program.get(cls.block_name, None)
+        if isinstance(block, mgl.UniformBlock):
+            block.binding = cls.binding
+
+    def set_camera(self, view, proj, position=(0.0, 0.0, 0.0)) -> None:
+        """
+            `view` and `proj` are 4x4 matrices in column-major order, as glm keeps them.
+            Call it whenever the camera moves; it is uploaded with the rest of the frame.
+        """
+        #   Read as rows, column-major matrices come out transposed: Vt and Pt
+        view_t = np.asarray(view, dtype='f4').reshape(4, 4)
+        proj_t = np.asarray(proj, dtype='f4').reshape(4, 4)
+        #   (P V)t = Vt Pt, and the inverse of a transpose is the transpose of the inverse
+        inv_proj_view_t = np.linalg.inv(view_t @ proj_t)
+        self.data[self.layout['view']] = view_t.reshape(-1)
+        self.data[self.layout['proj']] = proj_t.reshape(-1)
+        self.data[self.layout['inv_proj_view']] = inv_proj_view_t.reshape(-1)
+        self.data[self.layout['camera_position']] = (*tuple(position)[:3], 1.0)
+
+    def update(self, time: float, frameIndex: int, resolution: tuple, mouse: tuple) -> None:
+        """Called by the Engine once per frame, before anything is rendered"""
+        self.data[self.layout['time']] = time
+        self.int_data[self.layout['index']] = frameIndex
+        self.data[self.layout['resolution']] = resolution
+        self.data[self.layout['mouse']] = mouse
+        self.buffer.write(self.data)
+        #   Something else may have used the binding point since
+        self.buffer.bind_to_uniform_block(self.binding)
+
+    def release(self) -> None:
+        self.buffer.release()
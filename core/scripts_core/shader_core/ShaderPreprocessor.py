@@ -0,0 +1,246 @@
+"""
+    This is the ShaderPreprocessor; it lets shaders `#include` other files.
+
+        #include "noise.glsl"
+        #include <sdf/shapes.glsl>
+
+    Includes are looked for in the shader scripts directory first, then next to the
+    file including them. Every file is only included once per shader, like `#pragma once`,
+    and an `#version` line in an included file is dropped.
+    `#include` lines inside `/* */` comments are left alone. Conditionals are not evaluated,
+    though: an `#include` in an inactive `#if 0` or `#ifdef` block is still included.
+
+    The expanded source of a shader is cached, per search directories, and only expanded
+    again when any file in its include tree changes (their mtimes are checked).
+    Files are read once per session, however many shaders include them.
+
+    Every expanded source carries a line map, so the line numbers in the compiler's
+    errors can be mapped back to the file and line they came from.
+
+    An expanded source can also be specialized: `#define`s are put right after its
+    `#version`, and chosen uniforms are turned into constants.
+"""
+
+import os
+import re
+
+
+class ExpandedSource:
+    def __init__(self, source: str, lineMap: list[tuple[str, int]], fileMtimes: dict[str, float]):
+        self.source = source
+        #   line_map[i] is the (file, line) of line i + 1 of `source`
+        self.line_map = lineMap
+        self.file_mtimes = fileMtimes
+
+    def map_line(self, lineNumber: int) -> tuple[str, int] | None:
+        if 1 <= lineNumber <= len(self.line_map):
+            return self.line_map[lineNumber - 1]
+        return None
+
+
+class ShaderPreprocessor:
+    include_pattern = re.compile(r'^\s*#\s*include\s+["<]([^">]+)[">]')
+    version_pattern = re.compile(r'^\s*#\s*version\b')
+    #   `uniform highp float u_x;`, with or without a `layout(...)` or a precision
+    uniform_pattern = re.compile(r'^(?P<indent>\s*)(?:layout\s*\([^)]*\)\s*)?uniform\s+'
+                                 r'(?:(?P<precision>highp|mediump|lowp)\s+)?(?P<type>\w+)\s+(?P<name>\w+)\s*;')
+    #   Mesa: `0:12(5): error`, NVIDIA: `0(12) : error`, others: `ERROR: 0:12: `
+    error_line_patterns = [
+        re.compile(r'(?P<prefix>\b\d+:)(?P<line>\d+)(?P<suffix>\(\d+\))'),
+        re.compile(r'(?P<prefix>\b\d+\()(?P<line>\d+)(?P<suffix>\))'),
+        re.compile(r'(?P<prefix>ERROR: \d+:)(?P<line>\d+)(?P<suffix>:)'),
+    ]
+
+    def __init__(self):
+        #   path -> (mtime, lines)
+        self.file_lines: dict[str, tuple[float, list[str]]] = {}
+        #   (path, search directories) -> expanded source
+        self.expanded: dict[tuple[str, tuple[str, ...]], ExpandedSource] = {}
+
+    def read_lines(self, path: str) -> list[str]:
+        mtime = os.path.getmtime(path)
+        cached = self.file_lines.get(path)
+        if cached is not None and cached[0] == mtime:
+            return cached[1]
+        with open(path) as f_stream:
+            lines = f_stream.read().splitlines()
+        self.file_lines[path] = (mtime, lines)
+        return lines
+
+    def is_fresh(self, expandedSource: ExpandedSource) -> bool:
+        for path, mtime in expandedSource.file_mtimes.items():
+            if not os.path.exists(path) or os.path.getmtime(path) != mtime:
+                return False
+        return True
+
+    def resolve_include(self, includeName: str, includingPath: str, searchDirs: list[str]) -> str:
+        for directory in [*searchDirs, os.path.dirname(includingPath)]:
+            candidate = os.path.normpath(os.path.join(directory, includeName))
+            if os.path.isfile(candidate):
+                return candidate
+        raise FileNotFoundError("Cannot find '{}' included by {}; looked in {}".format(
+            includeName, includingPath, [*searchDirs, os.path.dirname(includingPath)]))
+
+    def get_expanded(self, path: str, searchDirs: list[str]) -> ExpandedSource | None:
+        """The last expansion of the file with these search directories, fresh or not"""
+        return self.expanded.get((os.path.normpath(path), tuple(searchDirs)))
+
+    def expand(self, path: str, searchDirs: list[str]) -> ExpandedSource:
+        path = os.path.normpath(path)
+        cached = self.get_expanded(path, searchDirs)
+        if cached is not None and self.is_fresh(cached):
+            return cached
+
+        out_lines: list[str] = []
+        line_map: list[tuple[str, int]] = []
+        file_mtimes: dict[str, float] = {}
+        self.expand_into(path, searchDirs, out_lines, line_map, file_mtimes, stack=[], isRoot=True)
+
+        expanded = ExpandedSource("\n".join(out_lines) + "\n", line_map, file_mtimes)
+        self.expanded[(path, tuple(searchDirs))] = expanded
+        return expanded
+
+    def expand_into(self, path: str, searchDirs: list[str], outLines: list[str], lineMap: list[tuple[str, int]], fileMtimes: dict[str, float], stack: list[str], isRoot=False) -> None:
+        if path in stack:
+            raise RecursionError("Shader include cycle: {}".format(" -> ".join(stack + [path])))
+        if path in fileMtimes:
+            #   Already included in this shader
+            return
+
+        lines = self.read_lines(path)
+        fileMtimes[path] = self.file_lines[path][0]
+        stack.append(path)
+        in_comment = False
+        for line_number, line in enumerate(lines, start=1):
+            match = None if in_comment else self.include_pattern.match(line)
+            in_comment = self.ends_in_comment(line, in_comment)
+            if match:
+                include_path = self.resolve_include(match.group(1), path, searchDirs)
+                self.expand_into(include_path, searchDirs, outLines, lineMap, fileMtimes, stack)
+                continue
+            if not isRoot and self.version_pattern.match(line):
+                continue
+            outLines.append(line)
+            lineMap.append((path, line_number))
+        stack.pop()
+
+    @staticmethod
+    def ends_in_comment(line: str, inComment: bool) -> bool:
+        """Whether a `/* */` comment is still open at the end of the line"""
+        position = 0
+        while True:
+            if inComment:
+                end = line.find("*/", position)
+                if end < 0:
+                    return True
+                inComment = False
+                position = end + 2
+            else:
+                start = line.find("/*", position)
+                line_comment = line.find("//", position)
+                if start < 0 or 0 <= line_comment < start:
+                    return False
+                inComment = True
+                position = start + 2
+
+    def specialize(self, expandedSource: ExpandedSource, defines: dict = None, constants: dict = None) -> ExpandedSource:
+        """
+            `defines` maps names to values; True defines the name alone and False leaves it out.
+            `constants` maps uniform names to the values they are fixed to.
+            Constants the source does not declare as uniforms are ignored,
+            since a variant applies to both the vertex and fragment shader;
+            `get_uniform_names` tells which ones it does declare.
+            A constant keeps the uniform's precision; its `layout(...)` is dropped.
+        """
+        lines = expandedSource.source.split("\n")
+        line_map = list(expandedSource.line_map)
+
+        if constants:
+            for index, line in enumerate(lines):
+                match = self.uniform_pattern.match(line)
+                if match and match.group('name') in constants:
+                    precision = "{} ".format(match.group('precision')) if match.group('precision') else ""
+                    lines[index] = "{}const {}{} {} = {};".format(
+                        match.group('indent'), precision, match.group('type'), match.group('name'),
+                        self.format_constant(match.group('type'), constants[match.group('name')]))
+
+        define_lines = []
+        for name, value in (defines or {}).items():
+            if value is False:
+                continue
+            define_lines.append("#define {}".format(name) if value is True else "#define {} {}".format(name, self.format_value(value)))
+        #   Right after the #version, which has to come first
+        insert_at = next((index + 1 for index, line in enumerate(lines) if self.version_pattern.match(line)), 0)
+        lines[insert_at:insert_at] = define_lines
+        line_map[insert_at:insert_at] = [("<variant>", number) for number in range(1, len(define_lines) + 1)]
+
+        return ExpandedSource("\n".join(lines), line_map, expandedSource.file_mtimes)
+
+    def get_uniform_names(self, expandedSource: ExpandedSource) -> set[str]:
+        """The uniforms declared in the source that `specialize` can turn into constants"""
+        names = set()
+        for line in expandedSource.source.split("\n"):
+            match = self.uniform_pattern.match(line)
+            if match:
+                names.add(match.group('name'))
+        return names
+
+    @staticmethod
+    def format_value(value) -> str:
+        if isinstance(value, bool):
+            return "true" if value else "false"
+        if isinstance(value, float):
+            return repr(value)
+        return str(value)
+
+    @classmethod
+    def format_constant(cls, glslType: str, value) -> str:
+        """A GLSL literal of `glslType`; vectors and matrices take any nesting of numbers"""
+        if glslType in ('float', 'double'):
+            return repr(float(value))
+        if glslType == 'int':
+            return str(int(value))
+        if glslType == 'uint':
+            return "{}u".format(int(value))
+        if glslType == 'bool':
+            return "true" if value else "false"
+
+        components = []
+        stack = [value]
+        while stack:
+            item = stack.pop()
+            if hasattr(item, '__iter__'):
+                stack.extend(reversed(list(item)))
+            else:
+                components.append(item)
+        component_type = {'i': 'int', 'u': 'uint', 'b': 'bool', 'd': 'double'}.get(glslType[0], 'float')
+        return "{}({})".format(glslType, ", ".join(cls.format_constant(component_type, c) for c in components))
+
+    def map_error(self, message: str, stageSources: dict[str, ExpandedSource]) -> str:
+        """
+            Rewrites the line numbers in a compiler error to `file:line`.
+            moderngl heads each stage's log with the stage name, e.g. `fragment_shader`;
+            that tells which source the numbers are in.
+        """
+        mapped_lines = []
+        stage = None
+        for line in message.splitlines():
+            stripped = line.strip()
+            if stripped in stageSources:
+                stage = stripped
+            expanded_source = stageSources.get(stage) if stage else None
+            if expanded_source is not None:
+                line = self.map_error_line(line, expanded_source)
+            mapped_lines.append(line)
+        return "\n".join(mapped_lines)
+
+    def map_error_line(self, line: str, expandedSource: ExpandedSource) -> str:
+        for pattern in self.error_line_patterns:
+            match = pattern.search(line)
+            if not match:
+                continue
+            origin = expandedSource.map_line(int(match.group('line')))
+            if origin is None:
+                return line
+            return "{} [{}:{}]".format(line, os.path.basename(origin[0]), origin[1])
+        return line
@@ -4,26 +4,64 @@
     It manages creating them and deleting them, storing them in a buffer.
     It is also a Singleton.
     it provides a neat way to clear them all.
+
+    Compiled programs are keyed by a hash of their final vertex and fragment source.
+    So programs of different names, or entities, with identical sources share one mgl.Program,
+    and adding a program whose sources have not changed compiles nothing.
+    Programs are reference counted: `destroy` only releases a program once nothing uses it.
+
+    Shader files go through the ShaderPreprocessor, so they can `#include` other files,
+    including the built in ones like `frame_globals.glsl`.
+
+    A program can have variants: the same shaders compiled with `#define`s and with
+    uniforms turned into constants. Each variant is a program of its own name,
+    compiled the first time it is added.
 """
 
 from ... import mgl
 from ... import singleton
+from .ShaderPreprocessor import ShaderPreprocessor, ExpandedSource
+from .FrameGlobals import FrameGlobals
+import hashlib
 import os
 
+class ProgramUniforms:
+    """
+        The uniforms of one compiled program, looked up once right after it is linked,
+        and the last value written to each, so that unchanged values are not written again.
+        It is shared by every Entity drawn with that program; `last_writer` is the last
+        Entity that wrote to it, so the others know to write all of their values again.
+    """
+    def __init__(self, program: mgl.Program):
+        self.handles: dict[str, mgl.Uniform] = {
+            name: program[name] for name in program if isinstance(program[name], mgl.Uniform)
+        }
+        self.values: dict[str, object] = {}
+        self.last_writer = None
+
 @singleton
 class ShaderProgramsManager:
     shader_scripts_dir: str = os.path.join(__file__, "..","shader_scripts")
     programs: dict[str, mgl.Program] = {}
+    #   program name -> source key, and how many times that name was added but not destroyed
+    program_keys: dict[str, str] = {}
+    name_ref_counts: dict[str, int] = {}
+    #   source key -> compiled program, and how many names use it
+    compiled_programs: dict[str, mgl.Program] = {}
+    key_ref_counts: dict[str, int] = {}
+    program_uniforms: dict[str, ProgramUniforms] = {}
+    #   program name -> the shader names it was added with, and the mtimes of every file
+    #   in its include trees when it was last compiled (or tried to be)
+    program_shader_names: dict[str, tuple[str, str]] = {}
+    program_file_mtimes: dict[str, dict[str, float]] = {}
+    #   variant program name -> the program it specializes, its defines and its constants
+    program_variants: dict[str, tuple[str, dict, dict]] = {}
     def __init__(self, ctxRef):
         self.ctx_ref = ctxRef
+        self.preprocessor = ShaderPreprocessor()
         
     
-    def add_program(self, shadersProgramName:str, vertexShaderName="", fragmentShaderName=""):
-        """
-            Creates a program from the corrsponding Vertex and Fragment shaders.
-            Ensure the vertex and fragment shaders have the same name.
-        """
-
+    def get_shader_paths(self, shadersProgramName:str, vertexShaderName="", fragmentShaderName="") -> tuple[str, str]:
         vert_path = os.path.join(self.shader_scripts_dir, shadersProgramName)
         frag_path = os.path.join(self.shader_scripts_dir, shadersProgramName)
         # print(path)
@@ -35,14 +73,31 @@ class ShaderProgramsManager:
             
         vert_path = f"{vert_path}.vert" if vert_path.find(".") == -1 else vert_path
         frag_path = f"{frag_path}.frag" if frag_path.find(".") == -1 else frag_path
+        return vert_path, frag_path
 
-        with open(vert_path) as f_stream:
-            vertex_shader = f_stream.read()
-        with open(frag_path) as f_stream:
-            fragment_shader = f_stream.read()
-        
-        program = self.ctx_ref.program(vertex_shader=vertex_shader, fragment_shader=fragment_shader)
-        self.programs[shadersProgramName] = program
+    def get_include_dirs(self) -> list[str]:
+        return [self.shader_scripts_dir, FrameGlobals.include_dir]
+
+    def read_sources(self, vertPath: str, fragPath: str) -> tuple[ExpandedSource, ExpandedSource]:
+        """The shaders with their includes expanded; cached until any of their files change"""
+        include_dirs = self.get_include_dirs()
+        return self.preprocessor.expand(vertPath, include_dirs), self.preprocessor.expand(fragPath, include_dirs)
+
+    @staticmethod
+    def get_source_key(vertexShader: str, fragmentShader: str) -> str:
+        return hashlib.sha1("{}\0{}".format(vertexShader, fragmentShader).encode()).hexdigest()
+
+    def add_program(self, shadersProgramName:str, vertexShaderName="", fragmentShaderName=""):
+        """
+            Creates a program from the corrsponding Vertex and Fragment shaders.
+            Ensure the vertex and fragment shaders have the same name.
+
+            Every call counts as one more user of `shadersProgramName`; call `destroy` once per call.
+        """
+        _, vertex_source, fragment_source = self.read_program_sources(shadersProgramName, vertexShaderName, fragmentShaderName)
+        self.program_shader_names[shadersProgramName] = (vertexShaderName, fragmentShaderName)
+        self.add_program_from_source(shadersProgramName, vertex_source.source, fragment_source.source,
+                                     stageSources={'vertex_shader': vertex_source, 'fragment_shader': fragment_source})
 
         #   It's not something exceptions can handle!
         # try:
@@ -56,15 +111,174 @@ class ShaderProgramsManager:
         #     program = self.ctx_ref.program(vertex_shader=vertex_shader, fragment_shader=fragment_shader)
         #     self.programs[shadersProgramName] = program
 
+    def add_program_from_source(self, shadersProgramName: str, vertexShader: str, fragmentShader: str, stageSources: dict[str, ExpandedSource] = None) -> mgl.Program:
+        """
+            `stageSources` are used to map compile errors back to the files the lines came from.
+
+            A name already in use cannot be added with other sources: the VAOs of its users
+            are made from its program. Move them all to the new sources first, with
+            `prepare_program` and `commit_program`; `ShaderWatcher.add_program` does that.
+        """
+        key = self.get_source_key(vertexShader, fragmentShader)
+        old_key = self.program_keys.get(shadersProgramName)
+
+        if old_key is None:
+            self.acquire(key, vertexShader, fragmentShader, stageSources)
+            self.program_keys[shadersProgramName] = key
+        elif old_key != key:
+            raise ValueError("The program '{}' is in use with other sources; its users must be moved to the new ones first".format(shadersProgramName))
+
+        self.name_ref_counts[shadersProgramName] = self.name_ref_counts.get(shadersProgramName, 0) + 1
+        self.programs[shadersProgramName] = self.compiled_programs[key]
+        return self.programs[shadersProgramName]
+
+    def has_changed(self, shadersProgramName: str) -> bool:
+        """
+            True when a file the program was last compiled from was saved since.
+            A missing file is taken as unchanged; editors briefly remove files when saving.
+        """
+        for path, mtime in self.program_file_mtimes.get(shadersProgramName, {}).items():
+            if os.path.exists(path) and os.path.getmtime(path) != mtime:
+                return True
+        return False
+
+    @staticmethod
+    def get_variant_name(shadersProgramName: str, defines: dict = None, constants: dict = None) -> str:
+        """The same defines and constants, in any order, give the same name"""
+        if not defines and not constants:
+            return shadersProgramName
+        parts = ["{}={}".format(name, value) for name, value in sorted((defines or {}).items())]
+        parts += ["const {}={}".format(name, value) for name, value in sorted((constants or {}).items())]
+        return "{}[{}]".format(shadersProgramName, ", ".join(parts))
+
+    def add_variant(self, shadersProgramName: str, defines: dict = None, constants: dict = None) -> str:
+        """
+            Adds a variant of a program that was already added, with the same shaders.
+            `defines` go in as `#define`s (True for just the name); `constants` maps uniforms
+            to fixed values, so the driver can fold them and unroll loops bounded by them.
+            Returns the variant's program name; like `add_program`, call `destroy` once per call.
+        """
+        variant_name = self.get_variant_name(shadersProgramName, defines, constants)
+        if variant_name == shadersProgramName:
+            vertex_shader_name, fragment_shader_name = self.program_shader_names[shadersProgramName]
+            self.add_program(shadersProgramName, vertex_shader_name, fragment_shader_name)
+            return variant_name
+
+        base_name = self.program_variants.get(shadersProgramName, (shadersProgramName,))[0]
+        vertex_shader_name, fragment_shader_name = self.program_shader_names[shadersProgramName]
+        self.program_variants[variant_name] = (base_name, dict(defines or {}), dict(constants or {}))
+        try:
+            self.add_program(variant_name, vertex_shader_name, fragment_shader_name)
+        except Exception:
+            if variant_name not in self.programs:
+                self.program_variants.pop(variant_name)
+                self.program_file_mtimes.pop(variant_name, None)
+            raise
+        return variant_name
+
+    def read_program_sources(self, shadersProgramName: str, vertexShaderName="", fragmentShaderName="") -> tuple[str, ExpandedSource, ExpandedSource]:
+        """The source key and sources the program would now be compiled from"""
+        base_name, defines, constants = self.program_variants.get(shadersProgramName, (shadersProgramName, None, None))
+        vert_path, frag_path = self.get_shader_paths(base_name, vertexShaderName, fragmentShaderName)
+        try:
+            vertex_source, fragment_source = self.read_sources(vert_path, frag_path)
+        finally:
+            #   Whether it compiles or not, this version of the files has been tried
+            self.program_file_mtimes[shadersProgramName] = self.get_file_mtimes(vert_path, frag_path)
+        if constants:
+            declared = self.preprocessor.get_uniform_names(vertex_source) | self.preprocessor.get_uniform_names(fragment_source)
+            for name in constants:
+                if name not in declared:
+                    print("The constant '{}' of '{}' is not a uniform of its vertex or fragment shader; it is ignored".format(name, shadersProgramName))
+        if defines or constants:
+            vertex_source = self.preprocessor.specialize(vertex_source, defines, constants)
+            fragment_source = self.preprocessor.specialize(fragment_source, defines, constants)
+        return self.get_source_key(vertex_source.source, fragment_source.source), vertex_source, fragment_source
+
+    def prepare_program(self, shadersProgramName: str, vertexShaderName="", fragmentShaderName="", programSources: tuple[str, ExpandedSource, ExpandedSource] = None) -> tuple[str, mgl.Program] | None:
+        """
+            Compiles the program's new sources without putting it in place of the current one;
+            `commit_program` or `release_key` it after. Returns None when the sources are unchanged.
+            A compile error is raised and leaves the current program untouched.
+
+            `programSources` are sources already got from `read_program_sources`.
+        """
+        key, vertex_source, fragment_source = programSources or self.read_program_sources(shadersProgramName, vertexShaderName, fragmentShaderName)
+        if key == self.program_keys.get(shadersProgramName):
+            return None
+        self.acquire(key, vertex_source.source, fragment_source.source,
+                     {'vertex_shader': vertex_source, 'fragment_shader': fragment_source})
+        return key, self.compiled_programs[key]
+
+    def commit_program(self, shadersProgramName: str, key: str, vertexShaderName="", fragmentShaderName="") -> None:
+        """Puts a program from `prepare_program` in place of the current one, which is released"""
+        old_key = self.program_keys.get(shadersProgramName)
+        self.program_keys[shadersProgramName] = key
+        self.programs[shadersProgramName] = self.compiled_programs[key]
+        self.program_shader_names[shadersProgramName] = (vertexShaderName, fragmentShaderName)
+        if old_key is not None:
+            self.release_key(old_key)
+
+    def get_file_mtimes(self, *paths: str) -> dict[str, float]:
+        """The mtimes of these files and of what they include, as far as they could be read"""
+        file_mtimes = {}
+        for path in paths:
+            expanded = self.preprocessor.get_expanded(path, self.get_include_dirs())
+            if expanded is not None:
+                file_mtimes.update(expanded.file_mtimes)
+            if os.path.exists(path):
+                file_mtimes[os.path.normpath(path)] = os.path.getmtime(path)
+        return file_mtimes
+
+    def acquire(self, key: str, vertexShader: str, fragmentShader: str, stageSources: dict[str, ExpandedSource] = None) -> None:
+        if key in self.compiled_programs:
+            self.key_ref_counts[key] += 1
+            return
+        try:
+            program = self.ctx_ref.program(vertex_shader=vertexShader, fragment_shader=fragmentShader)
+        except mgl.Error as e:
+            if not stageSources:
+                raise
+            raise mgl.Error(self.preprocessor.map_error(str(e), stageSources)) from None
+        FrameGlobals.bind_program(program)
+        self.compiled_programs[key] = program
+        self.key_ref_counts[key] = 1
+        self.program_uniforms[key] = ProgramUniforms(program)
+
+    def get_uniforms(self, shadersProgramName: str) -> ProgramUniforms:
+        return self.program_uniforms[self.program_keys[shadersProgramName]]
+
+    def release_key(self, key: str) -> None:
+        self.key_ref_counts[key] -= 1
+        if self.key_ref_counts[key] <= 0:
+            self.key_ref_counts.pop(key)
+            self.program_uniforms.pop(key)
+            self.compiled_programs.pop(key).release()
 
     def destroy_all(self):
-        [program.release() for program in self.programs.values()]
+        [program.release() for program in self.compiled_programs.values()]
+        self.compiled_programs.clear()
+        self.key_ref_counts.clear()
+        self.program_uniforms.clear()
         self.programs.clear()
-    
-    def destroy(self, programName):
-        """Destroy the shader program with the specified name"""
-        self.programs.pop(programName).release()
+        self.program_keys.clear()
+        self.name_ref_counts.clear()
+        self.program_shader_names.clear()
+        self.program_file_mtimes.clear()
+        self.program_variants.clear()
 
     def destroy(self, *programNames):
-        """Destroy the shader programs with the listed name"""
-        [self.programs.pop(program_name).release() for program_name in programNames]
\ No newline at end of file
+        """
+            Destroy the shader programs with the listed names.
+            A program is only released when it was its last user.
+        """
+        for program_name in programNames:
+            self.name_ref_counts[program_name] -= 1
+            if self.name_ref_counts[program_name] > 0:
+                continue
+            self.name_ref_counts.pop(program_name)
+            self.programs.pop(program_name)
+            self.program_shader_names.pop(program_name, None)
+            self.program_file_mtimes.pop(program_name, None)
+            self.program_variants.pop(program_name, None)
+            self.release_key(self.program_keys.pop(program_name))
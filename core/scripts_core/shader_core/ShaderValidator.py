@@ -0,0 +1,113 @@
+"""
+    This compiles shaders in a worker process, with its own standalone context,
+    before they are compiled for real on the Engine's context.
+
+    A shader that fails to compile, or even crashes the driver, only takes down the worker,
+    and the big raymarchers compile without stalling the frame.
+    Only sources the worker compiled are then compiled on the main context.
+"""
+
+from ... import mgl
+from dataclasses import dataclass
+from concurrent.futures import ProcessPoolExecutor, Future
+from concurrent.futures.process import BrokenProcessPool
+import multiprocessing
+
+
+@dataclass(frozen=True, slots=True)
+class ValidationResult:
+    ok: bool
+    diagnostics: str = ""
+    #   The program's active uniforms, and attributes with their locations
+    uniforms: tuple[str, ...] = ()
+    attributes: tuple[tuple[str, int], ...] = ()
+
+
+#   The worker's context; made the first time the worker validates something
+_worker_ctx: mgl.Context | None = None
+
+def _get_worker_context() -> mgl.Context:
+    global _worker_ctx
+    if _worker_ctx is None:
+        try:
+            _worker_ctx = mgl.create_context(standalone=True, require=330)
+        except Exception:
+            _worker_ctx = mgl.create_context(standalone=True, require=330, backend="egl")
+    return _worker_ctx
+
+def validate_sources(vertexShader: str, fragmentShader: str) -> ValidationResult:
+    """
+        Runs in the worker. Raises only when the worker has no context to compile with,
+        in which case nothing can be said about the sources.
+    """
+    ctx = _get_worker_context()
+    try:
+        program = ctx.program(vertex_shader=vertexShader, fragment_shader=fragmentShader)
+    except mgl.Error as e:
+        return ValidationResult(False, str(e))
+
+    uniforms = []
+    attributes = []
+    for name in program:
+        member = program[name]
+        if isinstance(member, mgl.Uniform):
+            uniforms.append(name)
+        elif isinstance(member, mgl.Attribute):
+            attributes.append((name, member.location))
+    program.release()
+    return ValidationResult(True, "", tuple(uniforms), tuple(attributes))
+
+
+class ShaderValidator:
+    def __init__(self, maxWorkers=1):
+        self.max_workers = maxWorkers
+        #   Made on first use; most sessions never reload a shader
+        self.executor: ProcessPoolExecutor | None = None
+        #   source key -> result, so sources seen before are not compiled again
+        self.results: dict[str, ValidationResult] = {}
+
+    def get_executor(self) -> ProcessPoolExecutor:
+        if self.executor is None:
+            #   A forked worker would inherit the parent's GL state; spawn a clean one
+            self.executor = ProcessPoolExecutor(max_workers=self.max_workers,
+                                                mp_context=multiprocessing.get_context("spawn"))
+        return self.executor
+
+    def submit(self, key: str, vertexShader: str, fragmentShader: str) -> Future:
+        """The Future's result is a ValidationResult"""
+        if key in self.results:
+            future = Future()
+            future.set_result(self.results[key])
+            return future
+        future = self.get_executor().submit(validate_sources, vertexShader, fragmentShader)
+        future.add_done_callback(lambda done: self.on_done(key, done))
+        return future
+
+    def on_done(self, key: str, future: Future) -> None:
+        if future.cancelled() or future.exception() is not None:
+            return
+        self.results[key] = future.result()
+
+    def get_result(self, future: Future) -> ValidationResult | None:
+        """
+            The result of a finished Future; None when the worker could not validate at all,
+            e.g. it has no standalone context, so the caller compiles without validation.
+        """
+        try:
+            return future.result()
+        except BrokenProcessPool:
+            #   The sources crashed the worker; they would have crashed the Engine
+            self.restart()
+            return ValidationResult(False, "The shader compiler crashed on these sources")
+        except Exception as e:
+            print("Shader validation unavailable, compiling without it: ", str(e))
+            return None
+
+    def restart(self) -> None:
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = None
+
+    def release(self) -> None:
+        self.restart()
+        self.results.clear()
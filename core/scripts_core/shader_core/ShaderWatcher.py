@@ -0,0 +1,161 @@
+"""
+    This watches the shader files of every Shader Entity's program,
+    and recompiles the programs whose files (or the files they include) were saved.
+
+    Only the program and the VAOs made from it are replaced; the VBOs are kept.
+    A program that fails to compile is reported and the last good one keeps rendering,
+    so a typo in a shader never stops the Engine.
+
+    New sources are first compiled by the ShaderValidator in a worker process;
+    only those it compiled are compiled on the Engine's context.
+"""
+
+from ... import mgl
+from .VertexArray import VertexArrayObjectsManager
+from .ShaderValidator import ShaderValidator
+from .ShaderPreprocessor import ExpandedSource
+from concurrent.futures import Future
+import time
+import traceback
+
+from ... import TYPE_CHECKING
+if TYPE_CHECKING:
+    from ...entities_core.ShaderEntities import ShaderEntity
+
+class ShaderWatcher:
+    def __init__(self, vaoManagerRef: VertexArrayObjectsManager, pollInterval=0.5):
+        self.vao_manager_ref = vaoManagerRef
+        self.shader_programs_ref = vaoManagerRef.shader_programs
+        #   Polling the files every frame is a lot of stat calls for nothing
+        self.poll_interval = pollInterval
+        self.last_poll = time.perf_counter()
+        self.enabled = True
+        #   model name -> the Entity drawn with it
+        self.entities: dict[str, 'ShaderEntity'] = {}
+        #   Set `validate` to False to compile reloads straight on the Engine's context
+        self.validate = True
+        self.validator = ShaderValidator()
+        #   program name -> the validation it waits on, and what to reload it with after
+        self.pending: dict[str, tuple[Future, tuple[str, ExpandedSource, ExpandedSource], str, str, list[str]]] = {}
+
+    def watch(self, entity: 'ShaderEntity') -> None:
+        self.entities[entity.model_name] = entity
+
+    def unwatch(self, entity: 'ShaderEntity') -> None:
+        if self.entities.get(entity.model_name) is entity:
+            self.entities.pop(entity.model_name)
+
+    def get_entities(self, shadersProgramName: str) -> list['ShaderEntity']:
+        return [entity for entity in self.entities.values() if entity.shaders_name == shadersProgramName]
+
+    def add_program(self, shadersProgramName: str, vertexShaderName="", fragmentShaderName="") -> None:
+        """
+            Adds one more user of the program, like `ShaderProgramsManager.add_program`.
+            When the name is in use and its files changed since, every Entity drawing with it
+            is moved to the new program first, so the old one is released only once unused.
+        """
+        if shadersProgramName in self.shader_programs_ref.programs:
+            self.reload_program(shadersProgramName, vertexShaderName, fragmentShaderName)
+        self.shader_programs_ref.add_program(shadersProgramName, vertexShaderName, fragmentShaderName)
+
+    def add_variant(self, shadersProgramName: str, defines: dict = None, constants: dict = None) -> str:
+        """`ShaderProgramsManager.add_variant`, moving the users of the variant first like `add_program`"""
+        variant_name = self.shader_programs_ref.get_variant_name(shadersProgramName, defines, constants)
+        if variant_name in self.shader_programs_ref.programs:
+            self.reload_program(variant_name, *self.shader_programs_ref.program_shader_names[variant_name])
+        return self.shader_programs_ref.add_variant(shadersProgramName, defines, constants)
+
+    def poll(self) -> None:
+        """Called once a frame; checks the files every `poll_interval` seconds"""
+        self.finish_validations()
+        now = time.perf_counter()
+        if not self.enabled or now - self.last_poll < self.poll_interval:
+            return
+        self.last_poll = now
+
+        program_names = {entity.shaders_name for entity in self.entities.values()}
+        for program_name in program_names:
+            if program_name in self.shader_programs_ref.programs and self.shader_programs_ref.has_changed(program_name):
+                vertex_shader_name, fragment_shader_name = self.shader_programs_ref.program_shader_names[program_name]
+                self.request_reload(program_name, vertex_shader_name, fragment_shader_name)
+
+    def request_reload(self, shadersProgramName: str, vertexShaderName="", fragmentShaderName="", texturesForRebind: list[str] = []) -> None:
+        """
+            Sends the program's new sources to be validated; it is reloaded once they are.
+            Nothing waits on it, so it can be called every frame.
+        """
+        if not self.validate:
+            self.reload_program(shadersProgramName, vertexShaderName, fragmentShaderName, texturesForRebind)
+            return
+        try:
+            program_sources = self.shader_programs_ref.read_program_sources(shadersProgramName, vertexShaderName, fragmentShaderName)
+        except Exception as e:
+            print("Shader Error in '{}', keeping the last good program:\n{}".format(shadersProgramName, str(e)))
+            return
+        key, vertex_source, fragment_source = program_sources
+        if key == self.shader_programs_ref.program_keys.get(shadersProgramName):
+            return
+        if shadersProgramName in self.pending and self.pending[shadersProgramName][1][0] == key:
+            return
+        if key in self.shader_programs_ref.compiled_programs:
+            #   Already compiled on the Engine's context, so it is known to be good
+            self.reload_program(shadersProgramName, vertexShaderName, fragmentShaderName, texturesForRebind, program_sources)
+            return
+        future = self.validator.submit(key, vertex_source.source, fragment_source.source)
+        self.pending[shadersProgramName] = (future, program_sources, vertexShaderName, fragmentShaderName, texturesForRebind)
+
+    def finish_validations(self) -> None:
+        """Reloads the programs whose sources were validated since the last frame"""
+        done = [name for name, (future, *_) in self.pending.items() if future.done()]
+        for program_name in done:
+            future, program_sources, vertex_shader_name, fragment_shader_name, textures = self.pending.pop(program_name)
+            if program_name not in self.shader_programs_ref.programs:
+                #   Destroyed while it was being validated
+                continue
+            result = self.validator.get_result(future)
+            if result is not None and not result.ok:
+                _, vertex_source, fragment_source = program_sources
+                diagnostics = self.shader_programs_ref.preprocessor.map_error(
+                    result.diagnostics, {'vertex_shader': vertex_source, 'fragment_shader': fragment_source})
+                print("Shader Error in '{}', keeping the last good program:\n{}".format(program_name, diagnostics))
+                continue
+            self.reload_program(program_name, vertex_shader_name, fragment_shader_name, textures, program_sources)
+
+    def reload_program(self, shadersProgramName: str, vertexShaderName="", fragmentShaderName="", texturesForRebind: list[str] = [], programSources: tuple[str, ExpandedSource, ExpandedSource] = None) -> bool:
+        """
+            Recompiles the program and gives every Entity using it a new VAO.
+            Returns whether anything was replaced; on any error nothing is.
+            This compiles on the Engine's context right away; see `request_reload`.
+        """
+        try:
+            prepared = self.shader_programs_ref.prepare_program(shadersProgramName, vertexShaderName, fragmentShaderName, programSources)
+        except Exception as e:
+            print("Shader Error in '{}', keeping the last good program:\n{}".format(shadersProgramName, str(e)))
+            return False
+        if prepared is None:
+            return False
+        key, program = prepared
+
+        entities = self.get_entities(shadersProgramName)
+        new_vaos: dict[str, mgl.VertexArray] = {}
+        try:
+            for entity in entities:
+                new_vaos[entity.model_name] = self.vao_manager_ref.create_model_vao(program, entity.model_name)
+        except Exception:
+            #   e.g. an attribute the VBO provides was removed from the vertex shader
+            print("Shader Error in '{}', keeping the last good program:".format(shadersProgramName))
+            traceback.print_exc()
+            [vao.release() for vao in new_vaos.values()]
+            self.shader_programs_ref.release_key(key)
+            return False
+
+        self.shader_programs_ref.commit_program(shadersProgramName, key, vertexShaderName, fragmentShaderName)
+        for entity in entities:
+            self.vao_manager_ref.replace_vao(entity.model_name, new_vaos[entity.model_name])
+            entity.on_program_changed(texturesForRebind)
+        print("Reloaded shader program '{}'".format(shadersProgramName))
+        return True
+
+    def release(self) -> None:
+        self.pending.clear()
+        self.validator.release()
@@ -7,13 +7,20 @@
     They, however, are not ShaderScripts because they only manage creating the VAO,
     liking the right program and VBO to create the final 'render object', the VAO
     for that specific Entity, and is used to destroying them.
+
+    The layout of each VAO comes from the program: attributes of the VBO that the program
+    does not use are skipped as padding, so one VBO can serve shaders that use only some of it.
+
+    A model can have extra buffers next to its VBO, like the InstanceBuffer of an instanced
+    Entity; every VAO made for the model binds them too.
 """
 from ... import singleton
 from ... import mgl
+import re
 
 from .ShaderPrograms import ShaderProgramsManager
 from .VertexBuffer import VertexBufferObjectsManager
-from .VertexBuffer import BaseVertexBufferObject
+from .VertexBuffer import BaseVertexBufferObject, InstanceBuffer
     
 
 # from ... import TYPE_CHECKING
@@ -22,34 +29,175 @@ from .VertexBuffer import BaseVertexBufferObject
 # @singleton
 class VertexArrayObjectsManager:
     vertex_array_objects: dict[str, mgl.VertexArray]= {}
+    #   The program and buffers each VAO was made from
+    vao_sources: dict[str, tuple[mgl.Program, mgl.Buffer, ...]] = {}
+    #   model name -> the buffers its VAOs bind after its VBO
+    extra_buffers: dict[str, list[InstanceBuffer]] = {}
+    #   The name of the program each VAO draws with
+    vao_program_names: dict[str, str] = {}
+    #   model name -> program name -> VAOs of programs the model switched away from
+    program_vaos: dict[str, dict[str, mgl.VertexArray]] = {}
+    #   (program, buffer) -> the VAO format and attributes for that pair
+    vao_layouts: dict[tuple[mgl.Program, mgl.Buffer], tuple[str, list[str]]] = {}
+    format_token_pattern = re.compile(r'^(?P<count>\d*)(?P<type>n?[fiu]|x)(?P<size>\d*)$')
+    #   See Canvas.retaining_resources
+    retain_existing: bool = False
     def __init__(self, ctxRef: mgl.Context):
         self.ctx_ref = ctxRef
         self.vbo_manager: VertexBufferObjectsManager = VertexBufferObjectsManager()
         self.shader_programs: ShaderProgramsManager = ShaderProgramsManager(ctxRef)
     
     def add_vao(self, modelName, shaderProgramName: str):
-        self.vertex_array_objects[modelName] = self.create_vao(
-            shaderProgram = self.shader_programs.programs[shaderProgramName],
-            vertexBufferObject = self.vbo_manager.vertex_buffer_objects[modelName]
-        )
+        program = self.shader_programs.programs[shaderProgramName]
+        sources = self.get_sources(program, modelName)
+
+        if modelName in self.vertex_array_objects:
+            if self.retain_existing and self.vao_sources.get(modelName) == sources:
+                return
+            #   Replaced; the old one is not needed anymore
+            self.vertex_array_objects[modelName].release()
+
+        self.vertex_array_objects[modelName] = self.create_model_vao(program, modelName)
+        self.vao_sources[modelName] = sources
+        self.vao_program_names[modelName] = shaderProgramName
+
+    def switch_program(self, modelName: str, shaderProgramName: str) -> mgl.VertexArray:
+        """
+            Makes the model draw with another program, e.g. a variant of its own.
+            The VAO switched away from is kept, so switching back builds nothing.
+        """
+        if self.vao_program_names.get(modelName) == shaderProgramName:
+            return self.vertex_array_objects[modelName]
+        program = self.shader_programs.programs[shaderProgramName]
+        cached_vaos = self.program_vaos.setdefault(modelName, {})
+        cached_vaos[self.vao_program_names[modelName]] = self.vertex_array_objects[modelName]
+
+        vao = cached_vaos.pop(shaderProgramName, None)
+        if vao is not None and vao.program is not program:
+            #   The program was reloaded since
+            self.forget_layouts(shaderProgram=vao.program)
+            vao.release()
+            vao = None
+        if vao is None:
+            vao = self.create_model_vao(program, modelName)
+
+        self.vertex_array_objects[modelName] = vao
+        self.vao_sources[modelName] = self.get_sources(program, modelName)
+        self.vao_program_names[modelName] = shaderProgramName
+        return vao
+
+    def release_cached_vaos(self, modelName="", programName="") -> None:
+        """Releases the kept VAOs of a model, or of a program, or all of them"""
+        for model_name, cached_vaos in self.program_vaos.items():
+            if modelName and model_name != modelName:
+                continue
+            for program_name in list(cached_vaos):
+                if not programName or program_name == programName:
+                    cached_vaos.pop(program_name).release()
     
-    def create_vao(self, shaderProgram, vertexBufferObject: BaseVertexBufferObject):
-        vao = self.ctx_ref.vertex_array(shaderProgram, [(
-                                    vertexBufferObject.vbo,
-                                    vertexBufferObject.format,
-                                    *vertexBufferObject.attributes
-                                    )])
+    def replace_vao(self, modelName: str, vao: mgl.VertexArray) -> None:
+        """Puts an already made VAO in place of the model's current one, which is released"""
+        old_vao = self.vertex_array_objects.get(modelName)
+        self.vertex_array_objects[modelName] = vao
+        self.vao_sources[modelName] = self.get_sources(vao.program, modelName)
+        if old_vao is not None and old_vao is not vao:
+            if old_vao.program is not vao.program:
+                self.forget_layouts(shaderProgram=old_vao.program)
+            old_vao.release()
+
+    def set_extra_buffers(self, modelName: str, buffers: list[InstanceBuffer]) -> None:
+        """Set before the model's VAO is made; see MglInstancedEntity"""
+        #   Those of an Entity made again under the same name are not needed anymore
+        for buffer in self.extra_buffers.get(modelName, []):
+            if buffer not in buffers:
+                self.forget_layouts(buffer=buffer.vbo)
+                buffer.destroy()
+        self.extra_buffers[modelName] = buffers
+
+    def get_sources(self, shaderProgram: mgl.Program, modelName: str) -> tuple:
+        return (shaderProgram, self.vbo_manager.vertex_buffer_objects[modelName].vbo,
+                *[buffer.vbo for buffer in self.extra_buffers.get(modelName, [])])
+
+    def create_model_vao(self, shaderProgram: mgl.Program, modelName: str) -> mgl.VertexArray:
+        """The model's VAO for the program, with its VBO and any extra buffers"""
+        return self.create_vao(shaderProgram, self.vbo_manager.vertex_buffer_objects[modelName],
+                               self.extra_buffers.get(modelName, []))
+
+    def create_vao(self, shaderProgram, vertexBufferObject: BaseVertexBufferObject, extraBuffers: list[InstanceBuffer] = []):
+        content = []
+        for buffer in [vertexBufferObject, *extraBuffers]:
+            layout_format, layout_attributes = self.get_layout(shaderProgram, buffer)
+            content.append((buffer.vbo, layout_format, *layout_attributes))
+        vao = self.ctx_ref.vertex_array(shaderProgram, content)
         return vao
+
+    def get_layout(self, shaderProgram: mgl.Program, vertexBufferObject: BaseVertexBufferObject | InstanceBuffer) -> tuple[str, list[str]]:
+        """
+            The VBO's format and attributes as this program can take them.
+            moderngl raises a KeyError for attributes the program does not use (the
+            compiler strips them), so those are turned into padding instead.
+        """
+        layout_key = (shaderProgram, vertexBufferObject.vbo)
+        layout = self.vao_layouts.get(layout_key)
+        if layout is None:
+            active_attributes = {name for name in shaderProgram if isinstance(shaderProgram[name], mgl.Attribute)}
+            layout = self.build_layout(active_attributes, vertexBufferObject.format, vertexBufferObject.attributes)
+            self.vao_layouts[layout_key] = layout
+        return layout
+
+    @classmethod
+    def build_layout(cls, activeAttributes: set[str], format: str, attributes: list[str]) -> tuple[str, list[str]]:
+        """e.g. '3f 3f 2f' with only the first and last attributes in use is '3f 3x4 2f'"""
+        #   A per instance or per render divisor, like '/i', applies to the whole buffer
+        format, divider, divisor = format.partition("/")
+        tokens = format.split()
+        if len(tokens) != len(attributes):
+            raise ValueError("The format '{}' has {} attributes but {} are named: {}".format(
+                format, len(tokens), len(attributes), attributes))
+
+        layout_tokens = []
+        layout_attributes = []
+        for token, attribute in zip(tokens, attributes):
+            if attribute in activeAttributes:
+                layout_tokens.append(token)
+                layout_attributes.append(attribute)
+                continue
+            match = cls.format_token_pattern.match(token)
+            if match is None:
+                raise ValueError("Cannot read the format '{}' of attribute {}".format(token, attribute))
+            count = int(match.group('count') or 1)
+            size = int(match.group('size') or (1 if match.group('type') == 'x' else 4))
+            layout_tokens.append("{}x{}".format(count, size))
+
+        return " ".join(layout_tokens) + divider + divisor, layout_attributes
+
+    def forget_layouts(self, shaderProgram: mgl.Program = None, buffer: mgl.Buffer = None) -> None:
+        """Drops the layouts of a program or buffer that is about to be released"""
+        for program, vbo in list(self.vao_layouts):
+            if program is shaderProgram or vbo is buffer:
+                self.vao_layouts.pop((program, vbo))
         
     def destroy_all(self):
         self.vbo_manager.destroy_all()
         self.shader_programs.destroy_all()
         [vao.release() for vao in self.vertex_array_objects.values()]
+        self.release_cached_vaos()
+        [buffer.destroy() for buffers in self.extra_buffers.values() for buffer in buffers]
+        self.extra_buffers.clear()
         self.vertex_array_objects.clear()
+        self.vao_sources.clear()
+        self.vao_program_names.clear()
+        self.program_vaos.clear()
+        self.vao_layouts.clear()
         print("Destroyed all.")
 
     def destroy(self, modelName="", programName=""):
+        self.forget_layouts(buffer=self.vbo_manager.vertex_buffer_objects[modelName].vbo)
         self.vertex_array_objects.pop(modelName).release()
+        self.vao_sources.pop(modelName, None)
+        self.vao_program_names.pop(modelName, None)
+        self.release_cached_vaos(modelName)
+        self.program_vaos.pop(modelName, None)
 
         if len(modelName) > 1 and len(programName) > 1:
             self.vbo_manager.destroy(modelName)
@@ -7,9 +7,16 @@
 
     It also provides the functionality to load the vertex data of models.
     This is the role of this VertextBuffer.py module.
+
+    Instanced Entities also have an InstanceBuffer: attributes that step once per instance
+    rather than once per vertex, rewritten whole from a NumPy array.
 """
 from ... import singleton
 from ... import mgl
+from ... import np
+from ...Profiler import Profiler
+import hashlib
+import re
 # from ... import TYPE_CHECKING
 
 # if TYPE_CHECKING:
@@ -26,6 +33,8 @@ class VertexBufferObjectsManager:
         the VAO for that object. 
     """
     vertex_buffer_objects: dict[str, 'BaseVertexBufferObject'] = {}
+    #   See Canvas.retaining_resources
+    retain_existing: bool = False
     def __init__(self):
         ...
     
@@ -68,7 +77,19 @@ class BaseVertexBufferObject:
             finally creating the Vertex Buffer object.
         """
         self.ctx_ref = ctxRef
-        self.vbo: mgl.Buffer = self.create_vbo(isDynamic)
+        vertex_data = self.prepare_vertex_data()
+        #   Compared when Scripts are hot reloaded, so edited vertex data is uploaded again
+        self.data_hash = self.get_data_hash(vertex_data)
+        existing = vboManagerReference.vertex_buffer_objects.get(modelName)
+        if vboManagerReference.retain_existing and existing is not None and existing.data_hash == self.data_hash \
+            and existing.format == format and existing.attributes == attributes:
+            #   Takes up the buffer already uploaded for this model
+            self.vbo: mgl.Buffer = existing.vbo
+        else:
+            self.vbo: mgl.Buffer = self.create_vbo(isDynamic, vertex_data)
+            if existing is not None:
+                #   Replaced, e.g. by a hot reloaded Script with other vertex data; nothing draws it anymore
+                existing.vbo.release()
         self.vbo_manager_ref = vboManagerReference
         self.vbo_manager_ref.add_vbo(modelName, self)
         self.model_name = modelName
@@ -78,10 +99,67 @@ class BaseVertexBufferObject:
     def prepare_vertex_data(self):
         ...
     
-    def create_vbo(self, isDynamic:bool) -> mgl.Buffer:
-        vertex_data = self.prepare_vertex_data()
+    @staticmethod
+    def get_data_hash(vertexData) -> str:
+        data = vertexData.tobytes() if hasattr(vertexData, 'tobytes') else bytes(vertexData)
+        return hashlib.sha1(data).hexdigest()
+
+    def create_vbo(self, isDynamic:bool, vertexData=None) -> mgl.Buffer:
+        vertex_data = self.prepare_vertex_data() if vertexData is None else vertexData
         vbo = self.ctx_ref.buffer(vertex_data, reserve=0, dynamic=isDynamic)
+        Profiler().count('buffer_writes')
         return vbo
 
     def destroy(self):
-        self.vbo.release()
\ No newline at end of file
+        self.vbo.release()
+
+
+class InstanceBuffer:
+    #   Like VertexArrayObjectsManager.format_token_pattern; e.g. '16f', '4f1', '3x4'
+    format_token_pattern = re.compile(r'^(?P<count>\d*)(?P<type>n?[fiu]|x)(?P<size>\d*)$')
+    def __init__(self, ctxRef: mgl.Context, format: str, attributes: list[str], reserveBytes=4096):
+        """
+            The per-instance attributes of an instanced Entity, e.g. '16f 4f' for
+            `in mat4 a_ModelMat;` and `in vec4 a_Color;`. The VAO Manager lays it out
+            next to the Entity's VBO, with the '/i' divisor.
+        """
+        self.ctx_ref = ctxRef
+        self.format: str = format + "/i"
+        self.attributes: list[str] = attributes
+        #   Bytes per instance
+        self.stride = self.get_stride(format)
+        self.vbo: mgl.Buffer = self.ctx_ref.buffer(reserve=reserveBytes, dynamic=True)
+        self.instance_count = 0
+
+    @classmethod
+    def get_stride(cls, format: str) -> int:
+        stride = 0
+        for token in format.split():
+            match = cls.format_token_pattern.match(token)
+            if match is None:
+                raise ValueError("Cannot read the format '{}' of the instance attributes".format(token))
+            count = int(match.group('count') or 1)
+            size = int(match.group('size') or (1 if match.group('type') == 'x' else 4))
+            stride += count * size
+        return stride
+
+    def write(self, instances: np.ndarray) -> None:
+        """
+            `instances` has a row per instance, laid out as the format says, or is those rows
+            flattened; the instances are counted by its bytes.
+            The whole buffer is written at once; it grows in place when it has to,
+            so the VAOs made with it stay valid.
+        """
+        data = np.ascontiguousarray(instances)
+        if data.nbytes % self.stride:
+            raise ValueError("{} bytes of instances are not a whole number of {} byte instances of '{}'".format(
+                data.nbytes, self.stride, self.format))
+        if data.nbytes > self.vbo.size:
+            self.vbo.orphan(max(data.nbytes, self.vbo.size * 2))
+        if data.nbytes > 0:
+            self.vbo.write(data)
+            Profiler().count('buffer_writes')
+        self.instance_count = data.nbytes // self.stride
+
+    def destroy(self):
+        self.vbo.release()
@@ -0,0 +1,14 @@
+//  The Engine's per-frame values, written once a frame; see FrameGlobals.py.
+//  `#include "frame_globals.glsl"` and read them as `frame.time`, `frame.view`...
+//  The layout must match FrameGlobals.layout.
+layout(std140) uniform FrameGlobals
+{
+    float time;
+    int index;
+    vec2 resolution;
+    vec2 mouse;
+    mat4 view;
+    mat4 proj;
+    mat4 inv_proj_view;
+    vec4 camera_position;
+} frame;
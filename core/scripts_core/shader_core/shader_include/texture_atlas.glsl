@@ -0,0 +1,36 @@
+//  Reading images packed by the TextureManager's atlases; see TextureAtlas.py.
+//  `#include "texture_atlas.glsl"`, bind the atlas and its "<atlas>_lookup" texture,
+//  and sample an image by its index with `atlas_texture(atlas, lookup, index, uv)`.
+//  Row 0 of the lookup is the image's uv offset and scale; row 1 its layer and size in texels.
+
+vec4 atlas_uv_rect(sampler2D lookup, int index)
+{
+    return texelFetch(lookup, ivec2(index, 0), 0);
+}
+
+int atlas_layer(sampler2D lookup, int index)
+{
+    return int(texelFetch(lookup, ivec2(index, 1), 0).x);
+}
+
+vec2 atlas_size(sampler2D lookup, int index)
+{
+    return texelFetch(lookup, ivec2(index, 1), 0).yz;
+}
+
+//  The image's own uv, clamped to it, to the atlas's uv
+vec2 atlas_uv(sampler2D lookup, int index, vec2 uv)
+{
+    vec4 uv_rect = atlas_uv_rect(lookup, index);
+    return uv_rect.xy + clamp(uv, 0.0, 1.0) * uv_rect.zw;
+}
+
+vec4 atlas_texture(sampler2D atlas, sampler2D lookup, int index, vec2 uv)
+{
+    return texture(atlas, atlas_uv(lookup, index, uv));
+}
+
+vec4 atlas_texture(sampler2DArray atlas, sampler2D lookup, int index, vec2 uv)
+{
+    return texture(atlas, vec3(atlas_uv(lookup, index, uv), float(atlas_layer(lookup, index))));
+}
@@ -0,0 +1,24 @@
+//  Reading a VirtualTexture; see VirtualTexture.py.
+//  `#include "virtual_texture.glsl"`, bind its page cache and its "<name>_indirection" texture,
+//  and read the image with `vt_texture(cache, indirection, uv)` as with `texture(image, uv)`.
+//  The last row of the indirection holds the image size, tile size and border, then the cache size.
+
+vec4 vt_texture(sampler2D cache, sampler2D indirection, highp vec2 uv)
+{
+    int params_row = textureSize(indirection, 0).y - 1;
+    highp vec4 params = texelFetch(indirection, ivec2(0, params_row), 0);
+    highp vec2 image_size = params.xy;
+    highp float tile = params.z;
+    highp float border = params.w;
+    highp vec2 cache_size = texelFetch(indirection, ivec2(1, params_row), 0).xy;
+
+    uv = clamp(uv, 0.0, 1.0);
+    highp vec2 cell = min(floor(uv * image_size / tile), ceil(image_size / tile) - 1.0);
+    //  The slot, and level, of the finest resident tile covering this cell's centre
+    highp vec4 entry = texelFetch(indirection, ivec2(cell), 0);
+    highp vec2 level_size = max(floor(image_size / exp2(entry.z)), 1.0);
+    highp vec2 centre_uv = (cell + 0.5) * tile / image_size;
+    highp vec2 tile_index = floor(centre_uv * level_size / tile);
+    highp vec2 local = clamp(uv * level_size - tile_index * tile, 0.5 - border, tile + border - 0.5);
+    return texture(cache, (entry.xy * (tile + 2.0 * border) + border + local) / cache_size);
+}